@@ -0,0 +1,9 @@
+"""Performance benchmarks for the Visitor Management System.
+
+Run from the repository root:
+
+    python -m benchmarks --tiers 10k,100k --out results.json
+    python -m benchmarks.compare old.json results.json
+    python -m benchmarks.connection
+    python -m benchmarks.loadtest --kiosks 20 --duration 10
+"""
@@ -0,0 +1,93 @@
+"""Run the benchmark suite and emit JSON results.
+
+Usage:
+    python -m benchmarks [--tiers 10k,100k] [--repeat 50] [--ui] [--out results.json]
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+
+from vms_core import DatabaseManager
+
+from .startup import run_startup_benchmarks
+from .storage import run_storage_benchmarks
+from .suite import run_db_benchmarks
+from .synthetic import TIERS, build_database
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Visitor Management System benchmarks")
+    parser.add_argument("--tiers", default="10k,100k",
+                        help=f"comma-separated tiers from {', '.join(TIERS)}")
+    parser.add_argument("--repeat", type=int, default=50, help="timed calls per case")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=".bench-data", help="where tier databases are cached")
+    parser.add_argument("--ui", action="store_true", help="also time the Tk refresh paths")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    tiers = [t.strip().lower() for t in args.tiers.split(",") if t.strip()]
+    unknown = [t for t in tiers if t not in TIERS]
+    if unknown:
+        parser.error(f"unknown tier(s): {', '.join(unknown)}")
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "tiers": {},
+    }
+
+    for tier in tiers:
+        rows = TIERS[tier]
+        print(f"[{tier}] preparing {rows:,} rows", file=sys.stderr)
+        started = time.perf_counter()
+        build_database(os.path.join(args.data_dir, f"visitors-{tier}.db"), rows, seed=args.seed)
+        results = {"setup_s": round(time.perf_counter() - started, 2)}
+
+        print(f"[{tier}] timing DatabaseManager", file=sys.stderr)
+        results["db"] = run_db_benchmarks(rows, args.repeat, seed=args.seed)
+        DatabaseManager.close()
+        results["storage"] = run_storage_benchmarks(os.path.join(args.data_dir, f"visitors-{tier}.db"))
+
+        print(f"[{tier}] timing cold starts", file=sys.stderr)
+        results["startup"] = run_startup_benchmarks(os.path.join(args.data_dir, f"visitors-{tier}.db"),
+                                                    max(3, args.repeat // 5))
+        if args.ui:
+            from .ui import run_ui_benchmarks
+            print(f"[{tier}] timing UI", file=sys.stderr)
+            results["ui"] = run_ui_benchmarks(max(3, args.repeat // 5))
+        report["tiers"][tier] = results
+        DatabaseManager.close()
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
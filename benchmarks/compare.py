@@ -0,0 +1,44 @@
+"""Compare two benchmark JSON files and flag regressions.
+
+Usage: python -m benchmarks.compare baseline.json candidate.json [--threshold 1.2]
+Exits with status 1 if any case's median got slower than the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def _cases(report):
+    for tier, sections in report["tiers"].items():
+        for section in ("db", "ui", "startup"):
+            for case, stats in sections.get(section, {}).items():
+                if isinstance(stats, dict) and "median_ms" in stats:
+                    yield (tier, section, case), stats["median_ms"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="candidate/baseline median ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = dict(_cases(json.load(f)))
+    with open(args.candidate) as f:
+        candidate = dict(_cases(json.load(f)))
+
+    regressions = 0
+    print(f"{'tier':<6}{'case':<40}{'baseline':>12}{'candidate':>12}{'ratio':>8}")
+    for key in sorted(baseline.keys() & candidate.keys()):
+        tier, _, case = key
+        ratio = candidate[key] / baseline[key] if baseline[key] else float("inf")
+        flag = "  REGRESSION" if ratio > args.threshold else ""
+        regressions += bool(flag)
+        print(f"{tier:<6}{case:<40}{baseline[key]:>10.3f}ms{candidate[key]:>10.3f}ms{ratio:>7.2f}x{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
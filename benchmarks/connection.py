@@ -0,0 +1,96 @@
+"""Per-call latency of DatabaseManager: connect-per-call vs. the pool.
+
+Usage: python -m benchmarks.connection [--rows N] [--calls N]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from vms_core import DatabaseManager
+
+SAMPLE = {
+    'fullname': "Bench Visitor",
+    'email': "bench@example.com",
+    'phone': "555-0100",
+    'address': "1 Bench St",
+    'meeting_with': "Reception",
+    'department': "Admin",
+    'purpose': "Benchmark",
+}
+
+
+class LegacyDatabaseManager:
+    """The original connect/teardown-per-call implementation, for comparison"""
+    DB_NAME = None
+
+    @staticmethod
+    def add_visitor(data):
+        conn = sqlite3.connect(LegacyDatabaseManager.DB_NAME)
+        cursor = conn.cursor()
+        cursor.execute(DatabaseManager.SQL_INSERT, DatabaseManager._visitor_params(data))
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def get_visitor_by_id(visitor_id):
+        conn = sqlite3.connect(LegacyDatabaseManager.DB_NAME)
+        cursor = conn.cursor()
+        cursor.execute(DatabaseManager.SQL_BY_ID, (visitor_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return row
+
+    @staticmethod
+    def get_stats():
+        conn = sqlite3.connect(LegacyDatabaseManager.DB_NAME)
+        cursor = conn.cursor()
+        cursor.execute(DatabaseManager.SQL_COUNT_ALL)
+        total = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM visitors WHERE date(created_at) = date('now', 'localtime')")
+        today_count = cursor.fetchone()[0]
+        conn.close()
+        return {"total": total, "today": today_count}
+
+
+def time_calls(fn, calls):
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples), statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000, help="rows to seed before timing")
+    parser.add_argument("--calls", type=int, default=500, help="calls per measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        DatabaseManager.DB_NAME = LegacyDatabaseManager.DB_NAME = os.path.join(tmp, "bench.db")
+        DatabaseManager.init_db()
+        with DatabaseManager.connection() as conn, conn:
+            conn.executemany(DatabaseManager.SQL_INSERT,
+                             [DatabaseManager._visitor_params(SAMPLE)] * args.rows)
+
+        cases = [
+            ("get_visitor_by_id", lambda m: (lambda i: m.get_visitor_by_id(i % args.rows + 1))),
+            ("get_stats", lambda m: (lambda i: m.get_stats())),
+            ("add_visitor", lambda m: (lambda i: m.add_visitor(SAMPLE))),
+        ]
+
+        print(f"{'operation':<20}{'legacy median':>16}{'pooled median':>16}{'speedup':>10}")
+        for name, make in cases:
+            legacy, _ = time_calls(make(LegacyDatabaseManager), args.calls)
+            pooled, _ = time_calls(make(DatabaseManager), args.calls)
+            print(f"{name:<20}{legacy:>13.1f} us{pooled:>13.1f} us{legacy / pooled:>9.1f}x")
+
+        DatabaseManager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Drive the JSON API with concurrent simulated kiosks.
+
+Usage:
+    python -m benchmarks.loadtest [--kiosks 20] [--duration 10] [--tier 10k] [--url http://host:8080]
+
+Without --url an in-process server is started on a synthetic tier
+database. Each kiosk is a thread with its own keep-alive connection that
+loops over a weighted mix of what a front desk does. Prints JSON with
+p50/p99 latency per operation and overall throughput.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from vms_api import ApiClient, make_api_server
+from vms_core import DatabaseManager, SiteTime
+
+from .synthetic import TIERS, build_database, generate_visitors
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _kiosk(client, seed, deadline, samples, errors):
+    rng = random.Random(seed)
+    visitors = generate_visitors(10 ** 6, seed=seed)
+    today = SiteTime.today()
+    first = datetime.strptime(today, "%Y-%m-%d") - timedelta(days=6)
+    week = {'from': first.strftime("%Y-%m-%d"), 'to': today}
+    added = []
+
+    def add():
+        added.append(client.add_visitor(next(visitors)))
+
+    def check_out():
+        if added:
+            client.check_out_visitor(added.pop(rng.randrange(len(added))))
+
+    operations = [
+        ("get_stats", 25, client.get_stats),
+        ("get_on_site", 10, client.get_on_site),
+        ("get_visitors_page", 25, lambda: client.get_visitors_page(week)),
+        ("search_visitors", 15, lambda: client.search_visitors(rng.choice(["jo", "sm", "an", "li"]))),
+        ("add_visitor", 15, add),
+        ("check_out_visitor", 5, check_out),
+        ("changes_since", 5, lambda: client.changes_since(max(0, client.change_version() - 20), week)),
+    ]
+    names = [name for name, _, _ in operations]
+    weights = [weight for _, weight, _ in operations]
+    calls = {name: fn for name, _, fn in operations}
+
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            calls[name]()
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+            continue
+        samples.append((name, (time.perf_counter() - started) * 1000))
+
+
+def run_load_test(url, kiosks, duration, token=None, seed=42):
+    samples, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = []
+    for i in range(kiosks):
+        client = ApiClient(url, token=token)
+        thread = threading.Thread(target=_kiosk, args=(client, seed + i, deadline, samples, errors), daemon=True)
+        threads.append(thread)
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    by_operation = {}
+    for name, ms in samples:
+        by_operation.setdefault(name, []).append(ms)
+    report = {}
+    for name, values in sorted(by_operation.items()):
+        values.sort()
+        report[name] = {
+            "n": len(values),
+            "p50_ms": round(_percentile(values, 0.50), 3),
+            "p99_ms": round(_percentile(values, 0.99), 3),
+            "max_ms": round(values[-1], 3),
+        }
+    everything = sorted(ms for _, ms in samples)
+    return {
+        "kiosks": kiosks,
+        "duration_s": duration,
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / duration, 1),
+        "p50_ms": round(_percentile(everything, 0.50), 3) if everything else None,
+        "p99_ms": round(_percentile(everything, 0.99), 3) if everything else None,
+        "errors": len(errors),
+        "first_errors": errors[:5],
+        "operations": report,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the VMS JSON API")
+    parser.add_argument("--url", help="existing server; default starts one in-process")
+    parser.add_argument("--token", default=os.environ.get("VMS_API_TOKEN"))
+    parser.add_argument("--kiosks", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--tier", default="10k", choices=sorted(TIERS), help="synthetic database size")
+    parser.add_argument("--data-dir", default=".bench-data")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        os.makedirs(args.data_dir, exist_ok=True)
+        # Kiosk writes land in a scratch copy so the cached tier stays reusable
+        source = build_database(os.path.join(args.data_dir, f"visitors-{args.tier}.db"), TIERS[args.tier],
+                                seed=args.seed)
+        DatabaseManager.close()
+        scratch = os.path.join(args.data_dir, "loadtest.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(scratch + suffix):
+                os.remove(scratch + suffix)
+        shutil.copyfile(source, scratch)  # closed above, so the WAL is checkpointed
+        DatabaseManager.DB_NAME = scratch
+        DatabaseManager.upgrade()
+        server = make_api_server("127.0.0.1", 0, token=args.token)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        print(f"[loadtest] serving {args.tier} tier on {url}", file=sys.stderr)
+
+    try:
+        report = run_load_test(url, args.kiosks, args.duration, token=args.token, seed=args.seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            DatabaseManager.close()
+    print(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Cold-start timings of the command line and the GUI module.
+
+Each case runs in a fresh interpreter, so module imports and schema
+checks are paid every time, as they are for a cron job. Bytecode caching
+is forced on, as in an installed copy, even if PYTHONDONTWRITEBYTECODE is
+set. gui_import only imports vms_app; gui_first_window goes on until the
+login window has been drawn, and is skipped without a display.
+"""
+import os
+import subprocess
+import sys
+import time
+
+from .timing import summarize
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What run_gui() does before mainloop(), plus one update() so the window is drawn
+FIRST_WINDOW = """
+import sys, tkinter as tk, vms_app
+vms_app.DatabaseManager.DB_NAME = sys.argv[1]
+root = tk.Tk()
+app = vms_app.VMSApplication(root)
+root.update()
+app.db_executor.shutdown()
+"""
+
+
+def _environment():
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def _run(argv, env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable] + argv, cwd=REPO_ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - started) * 1000
+
+
+def run_startup_benchmarks(db_path, repeat):
+    cases = {
+        "python_bare": ["-c", "pass"],
+        "cli_help": ["-m", "vms_cli", "--help"],
+        "cli_stats": ["-m", "vms_cli", "--db", os.path.abspath(db_path), "stats"],
+        "gui_import": ["-c", "import vms_app"],
+        "gui_first_window": ["-c", FIRST_WINDOW, os.path.abspath(db_path)],
+    }
+    results = {}
+    from .ui import _start_xvfb
+    display = os.environ.get("DISPLAY")
+    xvfb = _start_xvfb()
+    env = _environment()
+    try:
+        for name, argv in cases.items():
+            try:
+                _run(argv, env)  # warm the OS file cache and __pycache__
+            except subprocess.CalledProcessError:
+                if name != "gui_first_window":
+                    raise
+                results[name] = {"skipped": "no display available"}
+                continue
+            results[name] = summarize([_run(argv, env) for _ in range(repeat)])
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+            # The UI benchmarks start their own display
+            if display is None:
+                os.environ.pop("DISPLAY", None)
+    results["tkinter_loaded_by_cli"] = subprocess.run(
+        [sys.executable, "-c", "import sys, vms_cli; print('tkinter' in sys.modules)"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True).stdout.strip() == "True"
+    return results
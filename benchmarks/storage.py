@@ -0,0 +1,34 @@
+"""On-disk size of the check-in time index.
+
+idx_visitors_created_ts (integer epochs) is measured against the
+created_at text index it replaced. That one is built inside a
+transaction that is rolled back, so the tier file is left as it was.
+Sizes come from SQLite's dbstat table; without it the case is skipped.
+"""
+import sqlite3
+
+
+def _index_bytes(conn, name):
+    return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)).fetchone()[0] or 0
+
+
+def run_storage_benchmarks(db_path):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        try:
+            created_ts = _index_bytes(conn, "idx_visitors_created_ts")
+        except sqlite3.OperationalError as e:
+            return {"skipped": f"dbstat not available ({e})"}
+        conn.execute("BEGIN")
+        try:
+            conn.execute("CREATE INDEX bench_visitors_created_at ON visitors(created_at)")
+            created_at = _index_bytes(conn, "bench_visitors_created_at")
+        finally:
+            conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+    return {
+        "idx_created_ts_mb": round(created_ts / 2**20, 2),
+        "idx_created_at_mb": round(created_at / 2**20, 2),
+        "ratio": round(created_ts / created_at, 3) if created_at else None,
+    }
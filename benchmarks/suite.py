@@ -0,0 +1,61 @@
+"""DatabaseManager benchmarks over the synthetic tiers"""
+import random
+from datetime import datetime, timedelta
+
+from vms_core import DatabaseManager, VisitorReports
+
+from .synthetic import generate_visitors
+from .timing import measure
+
+RANGES = {"1d": 0, "7d": 6, "30d": 29, "365d": 364}
+
+
+def _range(days_back):
+    today = datetime.now()
+    return {'from': (today - timedelta(days=days_back)).strftime("%Y-%m-%d"),
+            'to': today.strftime("%Y-%m-%d")}
+
+
+def run_db_benchmarks(rows, repeat, seed=42):
+    """Time the DatabaseManager API against the currently configured DB"""
+    results = {}
+    rng = random.Random(seed)
+    # Time the queries themselves; the read cache gets its own entries below
+    DatabaseManager.set_read_cache(False)
+
+    for label, days in RANGES.items():
+        filters = _range(days)
+        results[f"get_visitors[{label}]"] = measure(lambda: DatabaseManager.get_visitors(filters),
+                                                    max(3, repeat // 10))
+        results[f"get_visitors_page[{label}]"] = measure(lambda: DatabaseManager.get_visitors_page(filters),
+                                                         repeat)
+        results[f"count_visitors[{label}]"] = measure(lambda: DatabaseManager.count_visitors(filters), repeat)
+        results[f"traffic_report[{label}]"] = measure(
+            lambda: VisitorReports.traffic(filters['from'], filters['to']), repeat)
+
+    results["get_visitor_by_id"] = measure(lambda: DatabaseManager.get_visitor_by_id(rng.randint(1, rows)),
+                                           repeat)
+
+    def cold_stats():
+        DatabaseManager.invalidate_caches()
+        DatabaseManager.get_stats()
+
+    results["get_stats[cold]"] = measure(cold_stats, repeat)
+    results["get_stats[cached]"] = measure(DatabaseManager.get_stats, repeat)
+
+    DatabaseManager.set_read_cache(True)
+    week = _range(6)
+    results["get_visitors_page[7d,cached]"] = measure(lambda: DatabaseManager.get_visitors_page(week), repeat)
+    results["count_visitors[7d,cached]"] = measure(lambda: DatabaseManager.count_visitors(week), repeat)
+    visitor_id = rng.randint(1, rows)
+    results["get_visitor_by_id[cached]"] = measure(lambda: DatabaseManager.get_visitor_by_id(visitor_id), repeat)
+
+    # Writes are undone afterwards so a cached tier database stays reusable
+    new_rows = list(generate_visitors(repeat + 1, seed=seed + 1))
+    added = []
+    samples = iter(new_rows)
+    results["add_visitor"] = measure(lambda: added.append(DatabaseManager.add_visitor(next(samples))), repeat)
+    for visitor_id in added:
+        DatabaseManager.delete_visitor(visitor_id)
+
+    return results
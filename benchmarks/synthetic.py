@@ -0,0 +1,122 @@
+"""Deterministic synthetic visitor history.
+
+The same (count, seed) always produces the same rows, so result files
+from different versions are comparable. Traffic follows a weekday-heavy
+calendar with morning and early-afternoon peaks, departments have
+skewed popularity, and each department has a handful of hosts of which
+a few receive most of the visits.
+"""
+import math
+import os
+import random
+from datetime import datetime, timedelta
+
+from vms_core import DatabaseManager, TimestampBackfill, utc_text
+
+TIERS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+DEPARTMENTS = [
+    ("Sales", 25), ("Engineering", 20), ("Operations", 15), ("HR", 10),
+    ("Finance", 10), ("Facilities", 10), ("IT", 5), ("Executive", 5),
+]
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
+    "David", "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Wei", "Aisha", "Carlos", "Priya", "Kenji", "Fatima",
+    "Olga", "Mateo", "Amara", "Liam", "Noor", "Sofia", "Ivan", "Chloe",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Thomas", "Taylor",
+    "Moore", "Jackson", "Martin", "Lee", "Chen", "Patel", "Kim", "Nguyen",
+    "Okafor", "Ivanova", "Sato", "Haddad", "Silva", "Kowalski", "Murphy", "Novak",
+]
+PURPOSES = ["Meeting", "Interview", "Delivery", "Maintenance", "Audit", "Training", "Demo", "Contractor work"]
+COMPANIES = ["acme", "globex", "initech", "umbrella", "hooli", "stark", "wayne", "tyrell"]
+
+# Relative traffic by weekday, Monday first
+WEEKDAY_WEIGHT = (1.0, 1.1, 1.1, 1.0, 0.8, 0.15, 0.05)
+VISITORS_PER_DAY = 300
+
+
+def _hosts(rng):
+    """A few hosts per department, with Zipf-like popularity"""
+    hosts = {}
+    for dept, _ in DEPARTMENTS:
+        names = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(rng.randint(6, 15))]
+        hosts[dept] = (names, [1.0 / (rank + 1) for rank in range(len(names))])
+    return hosts
+
+
+def _time_of_day(rng):
+    """Seconds after midnight: 60% morning peak, 40% early afternoon peak"""
+    if rng.random() < 0.6:
+        hours = rng.gauss(9.5, 1.0)
+    else:
+        hours = rng.gauss(14.0, 1.5)
+    return int(min(max(hours, 7.0), 19.0) * 3600)
+
+
+def generate_visitors(count, seed=42, end=None, per_day=VISITORS_PER_DAY):
+    """Yield `count` visitor dicts in chronological order ending on `end`.
+
+    The history spans as many days as needed for `per_day` visitors on an
+    average weekday, so larger tiers reach further back in time.
+    """
+    rng = random.Random(seed)
+    hosts = _hosts(rng)
+    departments = [d for d, _ in DEPARTMENTS]
+    dept_weights = [w for _, w in DEPARTMENTS]
+
+    end = (end or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    avg_weight = sum(WEEKDAY_WEIGHT) / 7
+    # One day short of the average, so the remainder lands on `end` itself
+    day = end - timedelta(days=max(0, math.ceil(count / (per_day * avg_weight)) - 1))
+
+    produced = 0
+    while produced < count:
+        expected = per_day * WEEKDAY_WEIGHT[day.weekday()]
+        todays = min(count - produced, max(0, int(rng.gauss(expected, expected ** 0.5))))
+        if day >= end:
+            todays = count - produced  # whatever is left lands on the last day
+        for offset in sorted(_time_of_day(rng) for _ in range(todays)):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            dept = rng.choices(departments, dept_weights)[0]
+            names, weights = hosts[dept]
+            yield {
+                'fullname': f"{first} {last}",
+                'email': f"{first}.{last}@{rng.choice(COMPANIES)}.com".lower(),
+                'phone': f"555-{rng.randint(0, 9999999):07d}",
+                'address': f"{rng.randint(1, 9999)} Main St",
+                'meeting_with': rng.choices(names, weights)[0],
+                'department': dept,
+                'purpose': rng.choice(PURPOSES),
+                'created_at': (day + timedelta(seconds=offset)).strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        produced += todays
+        day += timedelta(days=1)
+
+
+def build_database(path, count, seed=42):
+    """Create (or reuse) a database at `path` holding exactly `count` rows"""
+    DatabaseManager.close()
+    DatabaseManager.DB_NAME = path
+    if os.path.exists(path):
+        DatabaseManager.upgrade()
+        # History ends today, so a file generated on an earlier day is stale
+        latest = DatabaseManager.get_visitors_page(limit=1)
+        if (DatabaseManager.count_visitors() == count and latest
+                and utc_text(latest[0][4]).startswith(datetime.now().strftime("%Y-%m-%d"))):
+            # Measure the finished schema, not one still being backfilled
+            TimestampBackfill.run(pause=0)
+            return path
+        DatabaseManager.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    DatabaseManager.upgrade()
+    records = enumerate(generate_visitors(count, seed=seed), 1)
+    DatabaseManager.bulk_import(records, chunk_size=20000, defer_indexes=True)
+    TimestampBackfill.run(pause=0)  # nothing to fill in; finishes the migration
+    return path
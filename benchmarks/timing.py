@@ -0,0 +1,26 @@
+"""Small timing helpers shared by the benchmark modules"""
+import statistics
+import time
+
+
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        "n": len(ordered),
+        "min_ms": round(ordered[0], 4),
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+    }
+
+
+def measure(fn, repeat, warmup=1):
+    """Call fn() `repeat` times after `warmup` untimed calls"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
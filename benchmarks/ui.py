@@ -0,0 +1,99 @@
+"""Headless timings of the Tk refresh paths.
+
+Runs against a withdrawn root window. When no display is available and
+Xvfb is installed, a private virtual display is started for the run.
+"""
+import os
+import shutil
+import subprocess
+import time
+
+from .timing import measure
+
+
+def _start_xvfb():
+    if os.environ.get("DISPLAY") or not shutil.which("Xvfb"):
+        return None
+    display = ":%d" % (90 + os.getpid() % 100)
+    proc = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ["DISPLAY"] = display
+    return proc
+
+
+def _wait_until(root, done, timeout=60.0):
+    """Pump the Tk event loop until done() is true"""
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("UI did not settle")
+        root.update()
+        time.sleep(0.001)
+
+
+def _count_widgets(widget):
+    return 1 + sum(_count_widgets(child) for child in widget.winfo_children())
+
+
+def run_ui_benchmarks(repeat):
+    """Return {case: stats}, or {"skipped": reason} without a display"""
+    import tkinter as tk
+    from vms_app import VMSApplication
+
+    xvfb = _start_xvfb()
+    try:
+        try:
+            root = tk.Tk()
+        except tk.TclError as e:
+            return {"skipped": f"no display available ({e})"}
+        root.withdraw()
+        app = VMSApplication(root)
+        app.current_user = "admin"
+        results = {}
+
+        def switch(show):
+            def run():
+                show()
+                root.update_idletasks()
+            return run
+
+        results["show_dashboard"] = measure(switch(app.show_dashboard), repeat)
+        results["show_new_visitor"] = measure(switch(app.show_new_visitor), repeat)
+        results["show_manage_visitors"] = measure(switch(app.show_manage_visitors), repeat)
+
+        def navigation_cycle():
+            app.show_dashboard()
+            app.show_new_visitor()
+            app.show_manage_visitors()
+            root.update_idletasks()
+
+        # Every screen exists by now, so a full cycle should create nothing
+        root.update()
+        widgets_before = _count_widgets(root)
+        results["navigation_cycle"] = measure(navigation_cycle, repeat)
+        results["navigation_cycle"]["widgets_created"] = _count_widgets(root) - widgets_before
+
+        manage = app.show_manage_visitors()
+
+        def first_page():
+            manage.load_table_data()
+            _wait_until(root, lambda: manage.table_loaded or manage.table_exhausted)
+            root.update_idletasks()
+
+        results["load_table_data[first page]"] = measure(first_page, repeat)
+
+        def dashboard_settled():
+            app.show_dashboard()
+            _wait_until(root, lambda: not app.db_executor.is_busy("dashboard.stats"))
+            root.update_idletasks()
+
+        results["show_dashboard[stats loaded]"] = measure(dashboard_settled, repeat)
+
+        app.db_executor.shutdown()
+        root.destroy()
+        return results
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
@@ -0,0 +1,27 @@
+"""Shared fixtures: every test gets its own database file."""
+import pytest
+
+from vms_core import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    """DatabaseManager pointed at a fresh, migrated file under tmp_path"""
+    previous = DatabaseManager.DB_NAME
+    DatabaseManager.DB_NAME = str(tmp_path / "vms.db")
+    DatabaseManager.upgrade()
+    yield DatabaseManager
+    DatabaseManager.close()
+    DatabaseManager.invalidate_caches()
+    DatabaseManager.DB_NAME = previous
+
+
+@pytest.fixture
+def visitor():
+    """Factory for visitor dicts as the GUI submits them"""
+    def make(fullname="Ada Lovelace", **fields):
+        data = dict.fromkeys(("email", "phone", "address", "meeting_with", "department", "purpose"), "")
+        data.update(fullname=fullname, phone="555-0100")
+        data.update(fields)
+        return data
+    return make
@@ -0,0 +1,55 @@
+"""The in-memory on-site set and writes from other connections."""
+import sqlite3
+from contextlib import closing
+
+from vms_core import VisitorArchive
+
+
+def _on_site(db):
+    return sorted(row[1] for row in db.get_on_site())
+
+
+def test_own_writes_reach_the_set(db, visitor):
+    leaving = db.add_visitor(visitor("Grace Hopper"))
+    db.add_visitor(visitor("Alan Turing"))
+    assert _on_site(db) == ["Alan Turing", "Grace Hopper"]
+
+    db.check_out_visitor(leaving)
+    assert _on_site(db) == ["Alan Turing"]
+
+
+def test_another_connections_commits_reach_the_set(db, visitor):
+    leaving, renamed = db.add_visitor(visitor("Grace Hopper")), db.add_visitor(visitor("Alan Turing"))
+    assert len(db.get_on_site()) == 2
+
+    with closing(sqlite3.connect(db.DB_NAME)) as other:
+        other.execute("UPDATE visitors SET checked_out_at = CURRENT_TIMESTAMP WHERE id = ?", (leaving,))
+        other.execute("UPDATE visitors SET fullname = 'Alan M. Turing' WHERE id = ?", (renamed,))
+        other.execute("INSERT INTO visitors (fullname) VALUES ('Walk-in')")
+        other.commit()
+
+    assert _on_site(db) == ["Alan M. Turing", "Walk-in"]
+
+
+def test_a_commit_the_change_log_does_not_explain_reloads_the_set(db, visitor):
+    db.add_visitor(visitor("Grace Hopper"))
+    assert len(db.get_on_site()) == 1
+
+    with closing(sqlite3.connect(db.DB_NAME)) as other:
+        other.execute("DELETE FROM visitor_changes")
+        other.execute("UPDATE visitors SET checked_out_at = CURRENT_TIMESTAMP")
+        other.execute("DELETE FROM visitor_changes")
+        other.commit()
+
+    assert db.get_on_site() == []
+
+
+def test_archiving_forgotten_check_outs_empties_the_set(db, visitor):
+    db.add_visitor(visitor("Grace Hopper"))
+    with closing(sqlite3.connect(db.DB_NAME)) as other:
+        other.execute("INSERT INTO visitors (fullname, created_at) VALUES ('Forgot To Leave', '2020-01-05 09:00:00')")
+        other.commit()
+    assert len(db.get_on_site()) == 2
+
+    assert VisitorArchive.run(retention_days=30) == 1
+    assert _on_site(db) == ["Grace Hopper"]
@@ -0,0 +1,44 @@
+"""Request validation in the HTTP API."""
+import threading
+
+import pytest
+
+from vms_api import ApiClient, ApiError, make_api_server
+
+
+@pytest.fixture
+def client(db):
+    server = make_api_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield ApiClient(f"http://127.0.0.1:{server.server_address[1]}")
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.mark.parametrize("body, message", [
+    (["check_out"], "JSON object"),
+    ({"action": "check_out", "filters": ["search", "grace"]}, "filters must be an object"),
+    ({"action": "check_out", "filters": "grace"}, "filters must be an object"),
+    ({"action": "delete", "ids": "12"}, "ids must be a list"),
+    ({"action": "delete"}, "needs ids"),
+])
+def test_malformed_bulk_requests_are_refused(client, db, visitor, body, message):
+    db.add_visitor(visitor("Grace Hopper"))
+
+    with pytest.raises(ApiError, match=message) as refused:
+        client.request("POST", "/visitors/bulk", body=body)
+
+    assert refused.value.status == 400
+    assert len(db.get_on_site()) == 1
+
+
+def test_bulk_request_by_filter(client, db, visitor):
+    db.add_visitor(visitor("Grace Hopper"))
+    db.add_visitor(visitor("Alan Turing"))
+
+    result = client.request("POST", "/visitors/bulk", body={"action": "check_out", "filters": {"search": "grace"}})
+
+    assert len(result["ids"]) == 1
+    assert [row[1] for row in db.get_on_site()] == ["Alan Turing"]
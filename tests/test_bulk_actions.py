@@ -0,0 +1,77 @@
+"""Bulk check-out, delete and reassignment over a selection or a filter."""
+import pytest
+
+from vms_core import DatabaseManager
+
+
+@pytest.fixture
+def visits(db, visitor):
+    """Two on-site Graces, one already checked out, and Alan"""
+    ids = {name: db.add_visitor(visitor(name)) for name in ("Grace Hopper", "Grace Kelly", "Grace Jones",
+                                                            "Alan Turing")}
+    db.check_out_visitor(ids["Grace Jones"])
+    return ids
+
+
+def _on_site(db):
+    return sorted(row[1] for row in db.get_on_site())
+
+
+def _logged(db, version):
+    with db.connection() as conn:
+        return sorted(conn.execute("SELECT visitor_id, op FROM visitor_changes WHERE version > ?", (version,)))
+
+
+def test_check_out_by_filter_touches_only_matching_visitors_still_on_site(db, visits):
+    version = db.change_version()
+
+    result = db.bulk_action("check_out", filters={"search": "grace"})
+
+    assert sorted(result["ids"]) == sorted([visits["Grace Hopper"], visits["Grace Kelly"]])
+    assert (result["before"], result["after"]) == (version, db.change_version())
+    assert _logged(db, version) == sorted((visitor_id, "U") for visitor_id in result["ids"])
+    assert _on_site(db) == ["Alan Turing"]
+    checked_out = {row[0]: row[7] for row in db.get_visitors()}
+    assert all(checked_out[visitor_id] == result["value"] for visitor_id in result["ids"])
+
+
+def test_delete_by_selection(db, visits):
+    version = db.change_version()
+    chosen = [visits["Grace Kelly"], visits["Grace Jones"]]
+
+    result = db.bulk_action("delete", ids=chosen)
+
+    assert result["ids"] == sorted(chosen)
+    assert _logged(db, version) == sorted((visitor_id, "D") for visitor_id in chosen)
+    assert sorted(row[1] for row in db.get_visitors()) == ["Alan Turing", "Grace Hopper"]
+    assert _on_site(db) == ["Alan Turing", "Grace Hopper"]
+    assert db.get_stats()["total"] == 2
+
+
+def test_reassignment_updates_the_on_site_rows(db, visits):
+    db.bulk_action("department", ids=[visits["Alan Turing"], visits["Grace Jones"]], value=" Bletchley ")
+
+    assert {row[1]: row[3] for row in db.get_on_site()}["Alan Turing"] == "Bletchley"
+    assert {row[1]: row[6] for row in db.get_visitors()}["Grace Jones"] == "Bletchley"
+
+
+def test_a_filter_matching_nothing_changes_nothing(db, visits):
+    version = db.change_version()
+    filters = {"search": "nobody"}
+    assert db.count_bulk_targets(filters) == 0
+
+    result = db.bulk_action("delete", filters=filters)
+
+    assert result["ids"] == []
+    assert result["before"] == result["after"] == version
+    assert len(db.get_visitors()) == 4
+    assert _on_site(db) == ["Alan Turing", "Grace Hopper", "Grace Kelly"]
+
+
+@pytest.mark.parametrize("filters", [None, {}, {"search": "  "}, {"from": "2026-03-01"}])
+def test_an_empty_scope_is_refused_unless_all_rows_is_explicit(db, visits, filters):
+    with pytest.raises(ValueError, match="needs ids"):
+        DatabaseManager.submit_bulk_action("check_out", filters=filters)
+
+    assert len(db.bulk_action("check_out", filters=filters, all_rows=True)["ids"]) == 3
+    assert db.get_on_site() == []
@@ -0,0 +1,39 @@
+"""Metrics recording for instrumented DatabaseManager calls."""
+import pytest
+
+from vms_core import Metrics
+
+
+@pytest.fixture
+def metrics():
+    Metrics.reset()
+    Metrics.enable()
+    yield Metrics
+    Metrics.enable(False)
+    Metrics.reset()
+
+
+def _series(name):
+    return Metrics.snapshot()["series"][name]
+
+
+def test_list_results_record_their_row_count(db, visitor, metrics):
+    for n in range(3):
+        db.add_visitor(visitor(f"Visitor {n}"))
+
+    db.get_visitors()
+
+    assert _series("db.get_visitors")["rows"] == 3
+
+
+@pytest.mark.parametrize("name", ["iter_visitors", "iter_list_rows"])
+def test_row_iterators_are_timed_until_exhausted(db, visitor, metrics, name):
+    for n in range(5):
+        db.add_visitor(visitor(f"Visitor {n}"))
+
+    batches = list(getattr(db, name)(batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    series = _series(f"db.{name}")
+    assert series["count"] == 1
+    assert series["rows"] == 5
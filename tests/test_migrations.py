@@ -0,0 +1,190 @@
+"""Schema migrations and PRAGMA user_version."""
+import sqlite3
+import threading
+from contextlib import closing
+
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import vms_core
+from vms_core import MIGRATIONS, DatabaseManager, SiteTime, TimestampBackfill, utc_seconds, utc_text
+
+LATEST = MIGRATIONS[-1][0]
+
+# The table the application created before it had migrations (user_version 0)
+LEGACY_SCHEMA = """
+    CREATE TABLE visitors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fullname TEXT NOT NULL,
+        email TEXT,
+        phone TEXT,
+        address TEXT,
+        meeting_with TEXT,
+        department TEXT,
+        purpose TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    """DatabaseManager pointed at an unmigrated file holding two visits"""
+    path = str(tmp_path / "legacy.db")
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute(LEGACY_SCHEMA)
+        conn.executemany("INSERT INTO visitors (fullname, email, phone, department, created_at)"
+                         " VALUES (?, ?, ?, ?, ?)",
+                         [("Old Visit", " Ada@Example.com\t", "555 0100", "Sales", "2020-01-05 09:00:00"),
+                          ("Older Visit", "", "555-0199", "IT", "2019-12-31 23:30:00")])
+        conn.commit()
+    previous = DatabaseManager.DB_NAME
+    DatabaseManager.DB_NAME = path
+    yield DatabaseManager
+    DatabaseManager.close()
+    DatabaseManager.invalidate_caches()
+    DatabaseManager.DB_NAME = previous
+
+
+def _version(db):
+    with db.connection() as conn:
+        return db.schema_version(conn)
+
+
+def test_versions_only_go_up():
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert versions[0] == 1
+
+
+def test_fresh_file_reaches_the_latest_version(db):
+    assert _version(db) == LATEST
+    # Running again finds nothing to do
+    assert db.upgrade() == []
+    assert _version(db) == LATEST
+
+
+def test_legacy_file_is_upgraded_in_place(legacy):
+    assert legacy.upgrade() == [version for version, _, _ in MIGRATIONS]
+    assert _version(legacy) == LATEST
+
+    with legacy.connection() as conn:
+        rows = conn.execute("SELECT fullname, email_norm, phone_norm, checked_out_at, created_ts"
+                            " FROM visitors ORDER BY id").fetchall()
+        total = conn.execute(legacy.SQL_STATS).fetchone()[0]
+    assert total == 2
+    # Visits from before check-out tracking count as checked out at check-in;
+    # created_ts waits for the background backfill
+    assert rows == [("Old Visit", "ada@example.com", "5550100", "2020-01-05 09:00:00", None),
+                    ("Older Visit", None, "5550199", "2019-12-31 23:30:00", None)]
+
+    assert TimestampBackfill.run(pause=0) == 2
+    with legacy.connection() as conn:
+        stamps = [row[0] for row in conn.execute("SELECT created_ts FROM visitors ORDER BY id")]
+    assert stamps == [utc_seconds("2020-01-05 09:00:00"), utc_seconds("2019-12-31 23:30:00")]
+    assert legacy.created_ts_ready()
+    assert [row[1] for row in legacy.get_visitors_page()] == ["Old Visit", "Older Visit"]
+
+
+@pytest.mark.parametrize("zone", ["Etc/GMT-14", "Etc/GMT+12"])
+def test_visits_from_before_check_out_tracking_are_split_on_the_sites_midnight(tmp_path, monkeypatch, zone):
+    monkeypatch.setattr(SiteTime, "zone", ZoneInfo(zone))
+    midnight = SiteTime.day_start(SiteTime.today())
+    path = str(tmp_path / "offset.db")
+    with closing(sqlite3.connect(path)) as conn:
+        local = utc_seconds(conn.execute("SELECT date('now', 'localtime') || ' 00:00:00'").fetchone()[0])
+        # Either side of the site's midnight and of the machine's, which migration 5 went by
+        times = sorted(utc_text(edge + step) for edge in (midnight, local) for step in (-1, 0))
+        conn.execute(LEGACY_SCHEMA)
+        conn.executemany("INSERT INTO visitors (fullname, created_at) VALUES ('Visit', ?)", [(t,) for t in times])
+        conn.commit()
+    monkeypatch.setattr(DatabaseManager, "DB_NAME", path)
+    try:
+        DatabaseManager.upgrade()
+        with DatabaseManager.connection() as conn:
+            rows = conn.execute("SELECT created_at, checked_out_at FROM visitors ORDER BY created_at").fetchall()
+    finally:
+        DatabaseManager.close()
+        DatabaseManager.invalidate_caches()
+
+    assert rows == [(t, t if t < utc_text(midnight) else None) for t in times]
+
+
+def _backfill_state(db):
+    with db.connection() as conn:
+        pending = conn.execute(TimestampBackfill.SQL_PENDING).fetchone()
+        stamped = conn.execute("SELECT COUNT(*) FROM visitors WHERE created_ts IS NOT NULL").fetchone()[0]
+        index = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_visitors_created_at'").fetchone()
+        return pending and pending[0], stamped, index is not None, db._time_column(conn)[0]
+
+
+def test_backfill_resumes_where_it_stopped_and_switches_reads_over(legacy, monkeypatch):
+    legacy.upgrade()
+    assert _backfill_state(legacy) == (0, 0, True, "created_at")
+
+    # A chunk that fails midway rolls back with its cursor
+    monkeypatch.setattr(TimestampBackfill, "SQL_ADVANCE", "UPDATE no_such_table SET next_id = ?")
+    with pytest.raises(sqlite3.OperationalError):
+        TimestampBackfill.run(chunk_size=1, pause=0)
+    monkeypatch.undo()
+    assert _backfill_state(legacy) == (0, 0, True, "created_at")
+
+    stop = threading.Event()
+    assert TimestampBackfill.run(chunk_size=1, pause=0, progress=lambda filled: stop.set(), stop=stop) == 1
+    assert _backfill_state(legacy) == (1, 1, True, "created_at")
+    assert not legacy.created_ts_ready()
+
+    # The next run picks up at the saved id; its last chunk finishes the job
+    assert TimestampBackfill.run(chunk_size=1, pause=0) == 1
+    assert _backfill_state(legacy) == (None, 2, False, "created_ts")
+    assert legacy.created_ts_ready()
+    assert TimestampBackfill.run(pause=0) == 0
+
+
+def test_failed_migration_leaves_the_previous_version(db, monkeypatch):
+    broken = (LATEST + 1, "broken", ["CREATE TABLE half_done (x)", "SELECT * FROM no_such_table"])
+    monkeypatch.setattr(vms_core, "MIGRATIONS", MIGRATIONS + [broken])
+
+    with pytest.raises(sqlite3.OperationalError):
+        db.upgrade()
+
+    assert _version(db) == LATEST
+    with db.connection() as conn:
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+
+
+def _schema(db):
+    with db.connection() as conn:
+        return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'visitors'"))
+
+
+def test_indexes_dropped_by_an_interrupted_import_come_back_on_upgrade(db, visitor, monkeypatch):
+    db.add_visitor(visitor("Grace Hopper", department="Navy"))
+    schema = _schema(db)
+    # The process dies before the import's own restore runs
+    monkeypatch.setattr(DatabaseManager, "_restore_deferred", staticmethod(lambda conn: False))
+    db.bulk_import([(1, dict(visitor("Ada Lovelace", department="Maths"), created_at="2026-03-02 09:00:00"))],
+                   defer_indexes=True)
+    assert len(_schema(db)) < len(schema)
+    monkeypatch.undo()
+
+    assert db.upgrade() == []
+    assert _schema(db) == schema
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM visitor_deferred").fetchone()[0] == 0
+        departments = conn.execute("SELECT department, SUM(total) FROM visitor_rollups GROUP BY 1 ORDER BY 1")
+        assert departments.fetchall() == [("Maths", 1), ("Navy", 1)]
+    assert [row[1] for row in db.search_visitors("ada")] == ["Ada Lovelace"]
+
+
+def test_migration_needing_a_newer_sqlite_stops_before_it(legacy, monkeypatch):
+    monkeypatch.setattr(sqlite3, "sqlite_version_info", (3, 34, 1))
+
+    with pytest.raises(sqlite3.NotSupportedError, match="needs SQLite 3.35.0"):
+        legacy.upgrade()
+
+    assert _version(legacy) == 11
+    with legacy.connection() as conn:
+        # Still the plain trim() of migration 10
+        assert conn.execute("SELECT email_norm FROM visitors ORDER BY id").fetchall() == [("ada@example.com\t",), (None,)]
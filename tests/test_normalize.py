@@ -0,0 +1,41 @@
+"""phone_norm/email_norm columns against normalize_phone()/normalize_email()."""
+import pytest
+
+from vms_core import normalize_email, normalize_phone
+
+EMAILS = ["ada@example.com", " Ada@Example.COM ", "\tada@example.com\r\n", "ADA@EXAMPLE.COM\t",
+          "Zoë@Example.com", "a.b+tag@sub.example.org", "", "   ", "not an email", "@example.com"]
+PHONES = ["555-0100", "+1 (555) 010-0199", "555.0100.22", "555/0100", " 5550100 ", "555\t0100",
+          "12-34", "", "(+)", "phone: 5550100"]
+
+
+@pytest.fixture
+def stored(db, visitor):
+    """(email, phone) -> (email_norm, phone_norm) as SQLite computes them"""
+    # Stored as is, past the form's validation
+    db.bulk_import(enumerate((visitor(f"Visitor {n}") for n in range(len(EMAILS))), 1))
+    with db.connection() as conn, conn:
+        conn.executemany("UPDATE visitors SET email = ?, phone = ? WHERE id = ?",
+                         [(email, phone, n) for n, (email, phone) in enumerate(zip(EMAILS, PHONES), 1)])
+    with db.connection() as conn:
+        return {(email, phone): (email_norm, phone_norm) for email, phone, email_norm, phone_norm
+                in conn.execute("SELECT email, phone, email_norm, phone_norm FROM visitors")}
+
+
+def test_python_keys_match_the_indexed_columns(stored):
+    for (email, phone), (email_norm, phone_norm) in stored.items():
+        # The Python side also refuses keys too partial to look up; any key it does give must match
+        assert normalize_email(email) in (None, email_norm), email
+        assert normalize_phone(phone) in (None, phone_norm), phone
+
+
+def test_only_complete_values_get_a_key():
+    assert [bool(normalize_email(email)) for email in EMAILS] == [True] * 6 + [False] * 4
+    assert [bool(normalize_phone(phone)) for phone in PHONES] == [True] * 6 + [False] * 3 + [True]
+
+
+def test_returning_visitor_is_found_by_any_spelling(db, visitor):
+    db.add_visitor(visitor("Grace Hopper", email="Grace@Navy.mil", phone="+1 (555) 010-0199"))
+
+    assert db.find_returning_visitor(email="\tgrace@navy.MIL ")["fullname"] == "Grace Hopper"
+    assert db.find_returning_visitor(phone="1555-010-0199")["fullname"] == "Grace Hopper"
@@ -0,0 +1,102 @@
+"""Keyset paging on (check-in time, id) and the change feed."""
+import pytest
+
+from vms_core import DatabaseManager, TimestampBackfill, VisitorArchive
+
+# Check-ins that share a second, so page boundaries fall inside ties
+SECONDS = ["2026-03-02 09:00:00", "2026-03-02 09:00:01", "2026-03-02 09:00:01", "2026-03-02 09:00:01",
+           "2026-03-01 17:30:00", "2026-03-01 17:30:00", "2026-03-02 09:00:00", "2026-03-01 08:00:00"]
+
+
+@pytest.fixture(params=["created_at", "created_ts"])
+def tied(request, db, visitor):
+    """Visits with tied check-in times, read through either time column"""
+    db.bulk_import(enumerate((dict(visitor(f"Visitor {n}"), created_at=created_at)
+                              for n, created_at in enumerate(SECONDS * 3)), 1))
+    if request.param == "created_ts":
+        TimestampBackfill.run(pause=0)
+    with db.connection() as conn:
+        assert db._time_column(conn)[0] == request.param
+    return db
+
+
+def _all_pages(db, limit, filters=None):
+    pages, after = [], None
+    while True:
+        page = db.get_visitors_page(filters, after=after, limit=limit)
+        pages.append(page)
+        if len(page) < limit:
+            return pages
+        after = db.page_key(page[-1])
+
+
+@pytest.mark.parametrize("limit", [1, 4, 5, 24])
+def test_pages_cover_every_row_once_newest_first(tied, limit):
+    pages = _all_pages(tied, limit)
+    rows = [row for page in pages for row in page]
+
+    assert rows == tied.get_visitors()
+    assert len({row[0] for row in rows}) == len(SECONDS) * 3
+    keys = [tied.page_key(row) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+    # A total that is a multiple of the limit ends on an empty page
+    assert len(pages[-1]) == len(rows) % limit
+
+
+def test_paging_continues_from_hot_rows_into_archived_months(db, visitor):
+    db.bulk_import(enumerate([dict(visitor(f"Archived {n}"), created_at="2020-01-05 09:00:00") for n in range(3)]
+                             + [dict(visitor(f"Archived {n}"), created_at="2020-02-05 09:00:00")
+                                for n in range(3, 6)], 1))
+    for n in range(4):
+        db.add_visitor(visitor(f"Hot {n}"))
+    assert VisitorArchive.run(retention_days=30) == 6
+
+    rows = [row for page in _all_pages(db, 3) for row in page]
+
+    assert [row[1] for row in rows] == [f"Hot {n}" for n in (3, 2, 1, 0)] + [f"Archived {n}" for n in (5, 4, 3, 2, 1, 0)]
+
+
+def test_change_feed_reports_edits_deletes_and_rows_leaving_the_filter(db, visitor):
+    kept = db.add_visitor(visitor("Grace Hopper"))
+    renamed = db.add_visitor(visitor("Grace Kelly"))
+    deleted = db.add_visitor(visitor("Grace Jones"))
+    version = db.change_version()
+    assert db.changes_since(version) == (version, [], [])
+
+    db.update_visitor(kept, visitor("Grace Hopper", department="Navy"))
+    db.update_visitor(renamed, visitor("Princess Kelly"))
+    db.delete_visitor(deleted)
+    added = db.add_visitor(visitor("Grace Darling"))
+
+    latest, rows, removed = db.changes_since(version, {"search": "grace"})
+    assert latest == db.change_version() > version
+    assert {row[0]: row[6] for row in rows} == {kept: "Navy", added: ""}
+    assert sorted(removed) == sorted([renamed, deleted])
+    # Rows come in the page layout, so they slot into a paged table
+    assert all(db.page_key(row) == (row[4], row[0]) for row in rows)
+
+
+def test_change_feed_asks_for_a_reload_past_its_limit(db, visitor, monkeypatch):
+    version = db.change_version()
+    for n in range(3):
+        db.add_visitor(visitor(f"Visitor {n}"))
+    monkeypatch.setattr(DatabaseManager, "CHANGE_FEED_LIMIT", 2)
+
+    assert db.changes_since(version) is None
+    assert db.changes_since(version + 1) is not None
+
+
+def test_search_reaches_archived_months_like_the_list_does(db, visitor):
+    db.bulk_import(enumerate([dict(visitor(f"Pat Archived {n}"), created_at="2020-01-05 09:00:00") for n in range(3)]
+                             + [dict(visitor("Sam Archived"), created_at="2020-02-05 09:00:00")], 1))
+    db.add_visitor(visitor("Pat Hot"))
+    db.add_visitor(visitor("Sam Hot"))
+    assert VisitorArchive.run(retention_days=30) == 4
+
+    found = db.search_visitors("pat")
+    assert sorted(row[1] for row in found) == ["Pat Archived 0", "Pat Archived 1", "Pat Archived 2", "Pat Hot"]
+    assert len(found) == db.count_visitors({"search": "pat"})
+    assert sorted(found) == sorted(db.get_visitors({"search": "pat"}))
+    # A search filter narrows the archived matches as it does the hot ones
+    assert [row[1] for row in db.search_visitors("archived", {"search": "sam"})] == ["Sam Archived"]
+    assert len(db.search_visitors("pat", limit=2)) == 2
@@ -0,0 +1,100 @@
+"""LRUCache epochs and DatabaseManager read-cache invalidation."""
+import sqlite3
+from contextlib import closing
+
+from vms_core import LRUCache
+
+
+def test_least_recently_used_entry_goes_first():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # now "b" is the oldest
+    cache.put("c", 3)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_value_read_before_an_invalidation_is_not_stored():
+    cache = LRUCache(8)
+    for invalidate in (lambda: cache.discard(["other"]), cache.clear):
+        epoch = cache.epoch
+        invalidate()  # a write lands while the reader is querying
+        cache.put("key", "stale", epoch)
+        assert cache.get("key") is None
+
+    cache.put("key", "fresh", cache.epoch)
+    assert cache.get("key") == "fresh"
+
+
+def test_discard_keeps_unrelated_entries():
+    cache = LRUCache(8)
+    cache.put(1, "one")
+    cache.put(2, "two")
+    cache.discard([1])
+    assert (cache.get(1), cache.get(2)) == (None, "two")
+
+
+def test_byte_bound_refuses_a_value_bigger_than_the_cache():
+    cache = LRUCache(8, max_bytes=1000)
+    cache.put("small", "x")
+    cache.put("huge", "x" * 5000)
+    assert cache.get("huge") is None
+    assert cache.get("small") == "x"
+
+
+def test_own_writes_drop_the_cached_record(db, visitor):
+    visitor_id = db.add_visitor(visitor("Ada Lovelace"))
+    assert db.get_visitor_by_id(visitor_id)[1] == "Ada Lovelace"
+    hits = db.cache_stats()["records"]["hits"]
+    db.get_visitor_by_id(visitor_id)
+    assert db.cache_stats()["records"]["hits"] == hits + 1
+
+    db.update_visitor(visitor_id, visitor("Ada King"))
+    assert db.get_visitor_by_id(visitor_id)[1] == "Ada King"
+
+
+def test_another_connections_commit_drops_only_what_it_changed(db, visitor):
+    changed, untouched = db.add_visitor(visitor("Grace Hopper")), db.add_visitor(visitor("Alan Turing"))
+    for visitor_id in (changed, untouched):
+        db.get_visitor_by_id(visitor_id)
+    assert db.count_visitors() == 2
+
+    with closing(sqlite3.connect(db.DB_NAME)) as other:
+        other.execute("UPDATE visitors SET fullname = 'Grace Brewster Hopper' WHERE id = ?", (changed,))
+        other.execute("INSERT INTO visitors (fullname) VALUES ('Walk-in')")
+        other.commit()
+
+    assert db.get_visitor_by_id(changed)[1] == "Grace Brewster Hopper"
+    assert db.count_visitors() == 3
+    # The change log named the changed row; the other record stayed cached
+    hits = db.cache_stats()["records"]["hits"]
+    assert db.get_visitor_by_id(untouched)[1] == "Alan Turing"
+    assert db.cache_stats()["records"]["hits"] == hits + 1
+
+
+def test_commit_the_change_log_does_not_explain_clears_everything(db, visitor):
+    visitor_id = db.add_visitor(visitor("Grace Hopper"))
+    db.get_visitor_by_id(visitor_id)
+    assert db.cache_stats()["records"]["entries"] == 1
+
+    with closing(sqlite3.connect(db.DB_NAME)) as other:
+        # created_ts is bookkeeping: no change-log entry
+        other.execute("UPDATE visitors SET created_ts = created_ts + 0")
+        other.commit()
+
+    db.count_visitors()  # any cached read notices the commit
+    assert db.cache_stats()["records"]["entries"] == 0
+
+
+def test_read_racing_a_write_is_not_cached(db, visitor):
+    visitor_id = db.add_visitor(visitor("Ada Lovelace"))
+
+    def load():
+        stale = ("stale",)
+        db.update_visitor(visitor_id, visitor("Ada King"))  # commits while this read is running
+        return stale
+
+    assert db._cached(db._records, visitor_id, load) == ("stale",)
+    assert db.get_visitor_by_id(visitor_id)[1] == "Ada King"
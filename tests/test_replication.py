@@ -0,0 +1,107 @@
+"""Replicator between two local database files."""
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from vms_core import ConnectionPool, DatabaseManager, Replicator, VisitorArchive
+
+
+@pytest.fixture
+def central(tmp_path):
+    return str(tmp_path / "central.db")
+
+
+def _open(path):
+    conn = ConnectionPool.open(path)
+    conn.isolation_level = None  # as Replicator.sync() uses them
+    return conn
+
+
+def _central_rows(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return {row[0]: row[1:] for row in conn.execute("SELECT uuid, fullname, department FROM visitors")}
+
+
+def _row(db, visitor_id):
+    """(columns, values) of one visit as change sets carry it"""
+    with db.connection() as conn:
+        columns = Replicator._columns(conn)
+        values = conn.execute(f"SELECT {', '.join(columns)} FROM visitors WHERE id = ?", (visitor_id,)).fetchone()
+        return columns, list(values), Replicator.site_id(conn)
+
+
+def _upsert(site, columns, values, **changes):
+    values = dict(zip(columns, values), **changes)
+    return Replicator._payload(site, 0, None, columns, [[values[column] for column in columns]], [])
+
+
+def test_first_sync_sends_every_visit_including_archived_months(db, visitor, central):
+    db.bulk_import(enumerate([dict(visitor("Old One"), created_at="2020-01-05 09:00:00"),
+                              dict(visitor("Old Two"), created_at="2020-02-05 09:00:00")], 1))
+    db.add_visitor(visitor("Today"))
+    assert VisitorArchive.run(retention_days=30) == 2
+
+    # One row per change set: the snapshot spans the hot table and both archive files
+    totals = Replicator.sync(db.DB_NAME, central, batch_size=1)
+
+    assert sorted(name for name, _ in _central_rows(central).values()) == ["Old One", "Old Two", "Today"]
+    assert totals["inserted"] == 3
+    assert totals["seq"] == db.change_version()
+
+
+def test_resent_change_set_is_skipped(db, visitor, central):
+    db.add_visitor(visitor("First"))
+    acked = Replicator.sync(db.DB_NAME, central)["seq"]
+    visitor_id = db.add_visitor(visitor("Second"))
+    db.update_visitor(visitor_id, visitor("Second", department="Sales"))
+
+    with closing(_open(db.DB_NAME)) as source:
+        payloads = [payload for _, payload in Replicator.change_sets(source, acked)]
+    assert len(payloads) == 1
+    with closing(_open(central)) as target:
+        assert Replicator.apply(target, payloads[0])["inserted"] == 1
+        again = Replicator.apply(target, payloads[0])
+
+    assert again == {"inserted": 0, "updated": 0, "deleted": 0, "skipped": 1}
+    assert sorted(_central_rows(central).values()) == [("First", ""), ("Second", "Sales")]
+
+
+@pytest.mark.parametrize("newer_first", [False, True])
+def test_later_update_wins_whatever_the_arrival_order(db, visitor, central, newer_first):
+    columns, values, site = _row(db, db.add_visitor(visitor("Grace")))
+    older = _upsert(site, columns, values, updated_at="2026-01-01 10:00:00", department="Old")
+    newer = _upsert(site, columns, values, updated_at="2026-01-01 11:00:00", department="New")
+    # Same updated_at: the larger row content wins, on every target alike
+    tie_low = _upsert(site, columns, values, updated_at="2026-01-01 11:00:00", department="Mid")
+    tie_high = _upsert(site, columns, values, updated_at="2026-01-01 11:00:00", department="Zed")
+
+    with closing(_open(central)) as target:
+        DatabaseManager.migrate(target)
+        for payload in ([newer, older] if newer_first else [older, newer]):
+            Replicator.apply(target, payload)
+        assert [department for _, department in _central_rows(central).values()] == ["New"]
+        for payload in ([tie_high, tie_low] if newer_first else [tie_low, tie_high]):
+            Replicator.apply(target, payload)
+
+    assert [department for _, department in _central_rows(central).values()] == ["Zed"]
+
+
+def test_delete_propagates_and_a_stale_update_cannot_resurrect_it(db, visitor, central):
+    visitor_id = db.add_visitor(visitor("Gone Soon"))
+    Replicator.sync(db.DB_NAME, central)
+    columns, values, site = _row(db, visitor_id)
+
+    db.delete_visitor(visitor_id)
+    totals = Replicator.sync(db.DB_NAME, central)
+
+    assert totals["deleted"] == 1
+    assert _central_rows(central) == {}
+    with closing(sqlite3.connect(central)) as conn:
+        tombstones = conn.execute("SELECT uuid FROM replication_tombstones").fetchall()
+    assert tombstones == [(values[columns.index("uuid")],)]
+
+    with closing(_open(central)) as target:
+        stats = Replicator.apply(target, _upsert(site, columns, values))
+    assert stats["skipped"] == 1
+    assert _central_rows(central) == {}
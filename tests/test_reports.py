@@ -0,0 +1,77 @@
+"""Rollup triggers and traffic() against a GROUP BY over visitors."""
+import random
+import sqlite3
+from collections import Counter
+from contextlib import closing
+from datetime import datetime, timezone
+
+import pytest
+
+from vms_core import SiteTime, VisitorArchive, VisitorReports
+
+DEPARTMENTS = ["Sales", "IT", ""]
+HOSTS = ["Ann", "Bob", "Cy", ""]
+# Partial months at both ends and February whole, so all three grains are read
+FIRST, LAST = "2026-01-20", "2026-03-10"
+
+
+@pytest.fixture
+def utc(monkeypatch):
+    monkeypatch.setattr(SiteTime, "zone", timezone.utc)
+
+
+def _when(rnd):
+    return datetime.fromtimestamp(rnd.randrange(1768780800, 1773360000), timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _expected(db):
+    """traffic() for FIRST..LAST computed straight from visitors"""
+    with db.connection() as conn:
+        rows = conn.execute("SELECT created_at, department, meeting_with FROM visitors"
+                            " WHERE date(created_at) BETWEEN ? AND ?", (FIRST, LAST)).fetchall()
+        by_department = dict(conn.execute(
+            "SELECT COALESCE(NULLIF(department, ''), '(none)'), COUNT(*) FROM visitors"
+            " WHERE date(created_at) BETWEEN ? AND ? GROUP BY 1", (FIRST, LAST)))
+    hours = Counter(int(created_at[11:13]) for created_at, _, _ in rows)
+    days = Counter(created_at[:10] for created_at, _, _ in rows)
+    hosts = Counter((host or "(none)") for _, _, host in rows)
+    return len(rows), [hours[hour] for hour in range(24)], days, by_department, hosts
+
+
+def _reported(db):
+    report = VisitorReports.traffic(FIRST, LAST, top_hosts=len(HOSTS))
+    days = Counter({day: count for day, count in report["by_day"] if count})
+    return (report["total"], report["by_hour"], days, dict(report["by_department"]), Counter(dict(report["by_host"])))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rollups_follow_inserts_edits_and_deletes(db, visitor, utc, seed):
+    rnd = random.Random(seed)
+    db.bulk_import(enumerate((dict(visitor(f"Visitor {n}"), department=rnd.choice(DEPARTMENTS),
+                                   meeting_with=rnd.choice(HOSTS), created_at=_when(rnd)) for n in range(60)), 1))
+    ids = [row[0] for row in db.get_visitors()]
+    assert _reported(db) == _expected(db)
+
+    for visitor_id in rnd.sample(ids, 10):
+        db.update_visitor(visitor_id, visitor(f"Edited {visitor_id}", department=rnd.choice(DEPARTMENTS),
+                                              meeting_with=rnd.choice(HOSTS)))
+    with closing(sqlite3.connect(db.DB_NAME)) as other:
+        other.executemany("UPDATE visitors SET created_at = ? WHERE id = ?",
+                          [(_when(rnd), visitor_id) for visitor_id in rnd.sample(ids, 10)])
+        other.commit()
+    for visitor_id in rnd.sample(ids, 10):
+        db.delete_visitor(visitor_id)
+
+    assert _reported(db) == _expected(db)
+
+
+def test_archiving_leaves_the_rollups_alone(db, visitor, utc):
+    rnd = random.Random(1)
+    db.bulk_import(enumerate((dict(visitor(f"Visitor {n}"), department=rnd.choice(DEPARTMENTS),
+                                   meeting_with=rnd.choice(HOSTS), created_at=_when(rnd)) for n in range(40)), 1))
+    before = _expected(db)
+
+    assert VisitorArchive.run(retention_days=30) == 40
+    assert _expected(db)[0] == 0  # nothing left in the hot table
+
+    assert _reported(db) == before
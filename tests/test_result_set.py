@@ -0,0 +1,77 @@
+"""ColumnarResultSet updates against a view rebuilt from scratch."""
+import random
+
+import pytest
+
+from vms_core import ColumnarResultSet
+
+NAMES = ["ann", "Ann", "bob", "Cy", None, "", "Eve"]
+DEPARTMENTS = ["Sales", "IT", "it", None]
+TIMES = [1700000000, 1700003600, 1700090000]
+
+
+def _row(rnd, visitor_id):
+    return (visitor_id, rnd.choice(NAMES), rnd.choice(NAMES), "555-0100", rnd.choice(TIMES), "Host",
+            rnd.choice(DEPARTMENTS), rnd.choice([None, 1700100000]))
+
+
+def _rebuilt(rows, arrangement):
+    fresh = ColumnarResultSet()
+    fresh.extend(rows)
+    return [fresh.ids[index] for index in fresh.arrange(*arrangement)[1]]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_edits_turn_the_shown_view_into_a_fresh_sort(seed):
+    rnd = random.Random(seed)
+    rows = {visitor_id: _row(rnd, visitor_id) for visitor_id in range(1, 31)}
+    result = ColumnarResultSet()
+    result.extend(rows.values())
+    result.order("department", True)  # orders built before the changes are kept up to date too
+    arrangement = (rnd.choice([None, "id", "fullname", "created_at", "department", "checked_out_at"]),
+                   rnd.random() < 0.5, rnd.choice([{}, {"fullname": "AN"}, {"created_at": "2023-11-15"}]))
+    version, view = result.arrange(*arrangement)
+    shown = list(view)
+
+    for step in range(6):
+        if step % 3 == 0:
+            changed = [_row(rnd, visitor_id) for visitor_id in rnd.sample(range(1, 40), 4)]
+            removed = rnd.sample(sorted(set(rows) - {row[0] for row in changed}), 2)
+            rows.update((row[0], row) for row in changed)
+            edited = result.update(changed, removed)
+        elif step % 3 == 1:
+            removed = rnd.sample(sorted(rows), 2)
+            edited = result.remove(removed)
+        else:
+            ids = rnd.sample(sorted(rows), 5)
+            for visitor_id in ids:
+                rows[visitor_id] = rows[visitor_id][:6] + ("IT",) + rows[visitor_id][7:]
+            edited = result.set_value(ids, "department", "IT")
+            removed = []
+        for visitor_id in removed:
+            rows.pop(visitor_id, None)
+
+        version, view, edits = edited
+        for action, position, index in edits:
+            if action == "delete":
+                assert shown.pop(position) == index
+            elif action == "insert":
+                shown.insert(position, index)
+            else:
+                assert shown[position] == index
+        assert shown == list(view)
+        assert [result.ids[index] for index in view] == _rebuilt(rows.values(), arrangement)
+        assert len(result) == len(rows)
+
+
+def test_a_large_change_rebuilds_the_view():
+    result = ColumnarResultSet()
+    result.extend((visitor_id, "Ann", "", "", 1700000000 + visitor_id, None, "IT", None)
+                  for visitor_id in range(1, 3001))
+    result.arrange("department")
+
+    version, view, edits = result.set_value(range(1, 2001), "department", "Sales")
+
+    assert edits is None
+    assert [result.ids[index] for index in view[:2]] == [3000, 2999]
+    assert result.row(view[-1])[6] == "Sales"
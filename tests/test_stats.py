@@ -0,0 +1,46 @@
+"""Dashboard counters kept by triggers."""
+import sqlite3
+from contextlib import closing
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from vms_core import SiteTime
+
+# 2026-03-02 in Kathmandu (UTC+05:45) runs from 18:15 UTC the day before
+EDGES = {"2026-03-01 18:14:59": "yesterday", "2026-03-01 18:15:00": "today",
+         "2026-03-02 12:00:00": "today", "2026-03-02 18:14:59": "today", "2026-03-02 18:15:00": "tomorrow"}
+
+
+@pytest.fixture
+def kathmandu(monkeypatch):
+    monkeypatch.setattr(SiteTime, "zone", ZoneInfo("Asia/Kathmandu"))
+    monkeypatch.setattr(SiteTime, "today", classmethod(lambda cls: "2026-03-02"))
+
+
+def _import(db, visitor, times):
+    db.bulk_import(enumerate((dict(visitor(f"Visitor {n}"), created_at=created_at)
+                              for n, created_at in enumerate(times)), 1))
+
+
+def test_today_is_the_sites_day(db, visitor, kathmandu):
+    _import(db, visitor, EDGES)
+
+    assert db.get_stats() == {"total": 5, "today": 3}
+
+
+def test_counters_follow_edits_and_deletes(db, visitor, kathmandu):
+    _import(db, visitor, ["2026-03-02 12:00:00", "2026-03-02 12:00:00", "2026-03-01 09:00:00"])
+    moved, deleted, _ = [row[0] for row in db.get_visitors()]
+
+    with closing(sqlite3.connect(db.DB_NAME)) as other:
+        other.execute("UPDATE visitors SET created_at = '2026-03-01 09:00:00' WHERE id = ?", (moved,))
+        other.commit()
+    db.delete_visitor(deleted)
+
+    assert db.get_stats() == {"total": 2, "today": 0}
+    with db.connection() as conn:
+        counted = conn.execute("SELECT quarter * 900, total FROM visitor_quarter_counts WHERE total > 0").fetchall()
+        held = conn.execute("SELECT CAST(strftime('%s', created_at) AS INTEGER) / 900 * 900, COUNT(*)"
+                            " FROM visitors GROUP BY 1").fetchall()
+    assert sorted(counted) == sorted(held)
@@ -0,0 +1,114 @@
+"""WriteQueue group commit, savepoint isolation and busy backoff."""
+import sqlite3
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import closing
+
+import pytest
+
+from vms_core import WriteQueue
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "queue.db")
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT NOT NULL)")
+        conn.commit()
+    return path
+
+
+@pytest.fixture
+def writer(path):
+    commits = []
+    writer = WriteQueue(path, on_commit=commits.append)
+    writer.commits = commits
+    yield writer
+    writer.close()
+
+
+def _insert(conn, body):
+    return conn.execute("INSERT INTO notes (body) VALUES (?)", (body,)).lastrowid
+
+
+def _bodies(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return [row[0] for row in conn.execute("SELECT body FROM notes ORDER BY id")]
+
+
+def test_writes_queued_during_a_commit_share_the_next_one(writer, path):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(conn):
+        started.set()
+        release.wait(5)
+        return _insert(conn, "first")
+
+    first = writer.submit(slow)
+    assert started.wait(5)
+    queued = [writer.submit(_insert, f"note {n}") for n in range(50)]
+    release.set()
+
+    assert first.result(5) == 1
+    assert [future.result(5) for future in queued] == list(range(2, 52))
+    # One transaction for the slow write, one for everything behind it
+    assert [len(values) for values in writer.commits] == [1, 50]
+    assert len(_bodies(path)) == 51
+
+
+def test_a_failing_write_rolls_back_alone(writer, path):
+    hold, release = threading.Event(), threading.Event()
+    writer.submit(lambda conn: hold.set() or release.wait(5))
+    assert hold.wait(5)
+
+    def fail(conn):
+        _insert(conn, "half written")
+        raise ValueError("rejected")
+
+    before = writer.submit(_insert, "before")
+    failing = writer.submit(fail)
+    after = writer.submit(_insert, "after")
+    release.set()
+
+    assert before.result(5) and after.result(5)
+    with pytest.raises(ValueError, match="rejected"):
+        failing.result(5)
+    assert _bodies(path) == ["before", "after"]
+    assert [len(values) for values in writer.commits] == [1, 2]
+
+
+def test_busy_file_is_retried_with_backoff(path, monkeypatch):
+    monkeypatch.setattr(WriteQueue, "BUSY_TIMEOUT_MS", 10)
+    monkeypatch.setattr(WriteQueue, "BACKOFF_START", 0.02)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    writer = WriteQueue(path)
+    try:
+        future = writer.submit(_insert, "waited")
+        # Locked out well past the busy timeout: the writer backs off and retries
+        with pytest.raises(FutureTimeout):
+            future.result(0.3)
+        other.execute("COMMIT")
+        assert future.result(5) == 1
+    finally:
+        other.close()
+        writer.close()
+    assert _bodies(path) == ["waited"]
+
+
+def test_busy_file_fails_after_the_last_retry(path, monkeypatch):
+    monkeypatch.setattr(WriteQueue, "BUSY_TIMEOUT_MS", 10)
+    monkeypatch.setattr(WriteQueue, "BACKOFF_START", 0.01)
+    monkeypatch.setattr(WriteQueue, "MAX_RETRIES", 2)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    writer = WriteQueue(path)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            writer.submit(_insert, "never").result(5)
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+        writer.close()
+    assert _bodies(path) == []
@@ -0,0 +1,444 @@
+"""JSON API for the Visitor Management System.
+
+VisitorAPIHandler serves a database over HTTP so several kiosks can share
+it, and ApiClient is the matching backend for the GUI. Kept apart from
+vms_core so that commands which never talk HTTP do not import it.
+"""
+import hmac
+import http.client
+import json
+import re
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from vms_core import VISITOR_FIELDS, DatabaseManager, Metrics
+
+# ==========================================
+# API SERVER
+# ==========================================
+class ApiError(Exception):
+    """An API request failed; `status` is the HTTP status code"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class VisitorAPIHandler(BaseHTTPRequestHandler):
+    """JSON endpoints over DatabaseManager for kiosks running ApiClient.
+
+    Every request thread shares the process-wide connection pool and the
+    single WriteQueue writer, so concurrent kiosk writes are group
+    committed instead of fighting over the file lock.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive: one TCP connection per kiosk thread
+    # Headers and body go out in separate writes; without TCP_NODELAY the
+    # body waits for the client's delayed ACK (~40 ms on Linux).
+    disable_nagle_algorithm = True
+    server_version = "VMS/1.0"
+    MAX_LIMIT = 1000
+
+    ROUTES = [(method, re.compile(pattern), name) for method, pattern, name in (
+        ("GET", r"/health$", "health"),
+        ("GET", r"/stats$", "stats"),
+        ("GET", r"/diagnostics$", "diagnostics"),
+        ("GET", r"/on-site$", "on_site"),
+        ("GET", r"/changes$", "changes"),
+        ("GET", r"/reports/traffic$", "traffic"),
+        ("GET", r"/visitors$", "list_visitors"),
+        ("GET", r"/visitors/count$", "count_visitors"),
+        ("GET", r"/visitors/bulk/count$", "count_bulk_targets"),
+        ("GET", r"/visitors/search$", "search_visitors"),
+        ("GET", r"/visitors/lookup$", "find_returning_visitor"),
+        ("GET", r"/visitors/export$", "export_visitors"),
+        ("GET", r"/visitors/(\d+)$", "get_visitor"),
+        ("POST", r"/visitors$", "add_visitor"),
+        ("POST", r"/visitors/bulk$", "bulk_action"),
+        ("PUT", r"/visitors/(\d+)$", "update_visitor"),
+        ("DELETE", r"/visitors/(\d+)$", "delete_visitor"),
+        ("POST", r"/visitors/(\d+)/check-out$", "check_out_visitor"),
+    )]
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def dispatch(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        try:
+            # Read the body first so a rejected request leaves the stream clean
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            token = self.server.token
+            if token and not hmac.compare_digest(self.headers.get("X-API-Token", ""), token):
+                raise ApiError(401, "Invalid or missing API token")
+            for route_method, pattern, name in self.ROUTES:
+                match = pattern.match(url.path)
+                if match and route_method == method:
+                    args = [int(group) for group in match.groups()]
+                    result = getattr(self, "api_" + name)(query, body, *args)
+                    break
+            else:
+                raise ApiError(404, f"No route for {method} {url.path}")
+        except ApiError as e:
+            self.send_json(e.status, {"error": str(e)})
+        except (ValueError, TypeError, KeyError) as e:
+            self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            if result is not None:
+                self.send_json(200, result)
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def filters(query):
+        return {key: query[key] for key in ("from", "to", "search") if query.get(key)} or None
+
+    @classmethod
+    def limit(cls, query, default):
+        return min(int(query.get("limit") or default), cls.MAX_LIMIT)
+
+    @staticmethod
+    def visitor_data(body):
+        if not isinstance(body, dict):
+            raise ApiError(400, "Expected a JSON object")
+        data = {field: (body.get(field) or "").strip() for field in VISITOR_FIELDS}
+        error = DatabaseManager.validate_visitor(data)
+        if error:
+            raise ApiError(400, error)
+        return data
+
+    # ---- endpoints: api_<name>(query, body, *path_args) ----
+    def api_health(self, query, body):
+        with DatabaseManager.connection() as conn:
+            return {"ok": True, "schema": DatabaseManager.schema_version(conn)}
+
+    def api_stats(self, query, body):
+        return DatabaseManager.get_stats()
+
+    def api_diagnostics(self, query, body):
+        return dict(Metrics.snapshot(), caches=DatabaseManager.cache_stats())
+
+    def api_on_site(self, query, body):
+        return DatabaseManager.get_on_site()
+
+    def api_changes(self, query, body):
+        if "since" not in query:
+            return {"version": DatabaseManager.change_version()}
+        changes = DatabaseManager.changes_since(int(query["since"]), self.filters(query))
+        if changes is None:
+            return {"reload": True}
+        version, rows, removed = changes
+        return {"version": version, "rows": rows, "removed": removed}
+
+    def api_traffic(self, query, body):
+        return DatabaseManager.get_traffic(query["from"], query["to"])
+
+    def api_list_visitors(self, query, body):
+        after = None
+        if query.get("after_created") and query.get("after_id"):
+            after = (int(query["after_created"]), int(query["after_id"]))
+        return DatabaseManager.get_visitors_page(self.filters(query), after=after,
+                                                 limit=self.limit(query, DatabaseManager.PAGE_SIZE))
+
+    def api_count_visitors(self, query, body):
+        return {"count": DatabaseManager.count_visitors(self.filters(query))}
+
+    def api_count_bulk_targets(self, query, body):
+        return {"count": DatabaseManager.count_bulk_targets(self.filters(query))}
+
+    def api_search_visitors(self, query, body):
+        return DatabaseManager.search_visitors(query.get("q", ""), self.filters(query),
+                                               limit=self.limit(query, DatabaseManager.SEARCH_LIMIT))
+
+    def api_find_returning_visitor(self, query, body):
+        # Wrapped because a miss is an ordinary answer, not a 404
+        return {"visitor": DatabaseManager.find_returning_visitor(query.get("phone"), query.get("email"))}
+
+    def api_export_visitors(self, query, body):
+        """Stream export rows as JSON lines using chunked transfer encoding"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for batch in DatabaseManager.iter_visitors(self.filters(query)):
+                chunk = "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in batch).encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        except Exception:
+            # Headers are gone; dropping the connection without the final
+            # chunk tells the client the stream is incomplete.
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def api_get_visitor(self, query, body, visitor_id):
+        row = DatabaseManager.get_visitor_by_id(visitor_id)
+        if row is None:
+            raise ApiError(404, f"No visitor {visitor_id}")
+        return row
+
+    def api_add_visitor(self, query, body):
+        return {"id": DatabaseManager.add_visitor(self.visitor_data(body))}
+
+    def api_bulk_action(self, query, body):
+        if not isinstance(body, dict):
+            raise ApiError(400, "Expected a JSON object")
+        ids, filters = body.get("ids"), body.get("filters")
+        if ids is not None and not isinstance(ids, list):
+            raise ApiError(400, "ids must be a list")
+        if filters is not None and not isinstance(filters, dict):
+            raise ApiError(400, "filters must be an object")
+        return DatabaseManager.bulk_action(body.get("action"), ids, filters, body.get("value"),
+                                           all_rows=body.get("all") is True)
+
+    def api_update_visitor(self, query, body, visitor_id):
+        DatabaseManager.update_visitor(visitor_id, self.visitor_data(body))
+        return {"id": visitor_id}
+
+    def api_delete_visitor(self, query, body, visitor_id):
+        DatabaseManager.delete_visitor(visitor_id)
+        return {"id": visitor_id}
+
+    def api_check_out_visitor(self, query, body, visitor_id):
+        DatabaseManager.check_out_visitor(visitor_id)
+        return {"id": visitor_id}
+
+
+def make_api_server(host="127.0.0.1", port=8080, token=None, verbose=False):
+    """Create (but do not start) a threaded API server on host:port"""
+    server = ThreadingHTTPServer((host, port), VisitorAPIHandler)
+    server.daemon_threads = True
+    server.token = token
+    server.verbose = verbose
+    return server
+
+# ==========================================
+# API CLIENT
+# ==========================================
+@Metrics.instrumented("api", skip=("close",))
+class ApiClient:
+    """VMSApplication backend that talks to a VMS server instead of SQLite.
+
+    Mirrors the DatabaseManager calls the UI makes. Each thread keeps its
+    own keep-alive HTTP connection, and writes run on a small pool so the
+    submit_* methods return Futures just like the local ones.
+    """
+    PAGE_SIZE = DatabaseManager.PAGE_SIZE
+    TIMEOUT = 10.0
+    page_key = staticmethod(DatabaseManager.page_key)
+    validate_visitor = staticmethod(DatabaseManager.validate_visitor)
+
+    def __init__(self, url, token=None):
+        parts = urllib.parse.urlsplit(url)
+        self.connection_class = (http.client.HTTPSConnection if parts.scheme == "https"
+                                 else http.client.HTTPConnection)
+        self.netloc = parts.netloc
+        self.base_path = parts.path.rstrip("/")
+        self.token = token
+        self._local = threading.local()
+        self._writes = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vms-api-write")
+        # Bumped after each of our writes, like DatabaseManager's
+        self._write_generation = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.connection_class(self.netloc, timeout=self.TIMEOUT)
+        return conn
+
+    def _send(self, method, path, params=None, body=None):
+        url = self.base_path + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["X-API-Token"] = self.token
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+
+        # A kept-alive connection the server has since closed fails on
+        # first use; reconnect once before giving up.
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.request(method, url, body=data, headers=headers)
+                return conn.getresponse()
+            except (ConnectionError, http.client.BadStatusLine, http.client.CannotSendRequest):
+                conn.close()
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+
+    def request(self, method, path, params=None, body=None):
+        response = self._send(method, path, params, body)
+        payload = json.loads(response.read() or b"null")
+        if response.status >= 400:
+            raise ApiError(response.status, (payload or {}).get("error", response.reason))
+        return payload
+
+    @staticmethod
+    def _filter_params(filters, **extra):
+        params = {key: value for key, value in (filters or {}).items() if value}
+        params.update((key, value) for key, value in extra.items() if value is not None)
+        return params
+
+    def init_db(self):
+        try:
+            self.request("GET", "/health")
+        except (OSError, http.client.HTTPException, ApiError) as e:
+            raise ConnectionError(f"Cannot reach {self.netloc}: {e}") from e
+
+    def close(self):
+        self._writes.shutdown(wait=True)
+
+    # ---- reads ----
+    def get_stats(self):
+        return self.request("GET", "/stats")
+
+    def get_on_site(self):
+        return self.request("GET", "/on-site")
+
+    def get_traffic(self, date_from, date_to):
+        return self.request("GET", "/reports/traffic", {"from": date_from, "to": date_to})
+
+    def get_visitors_page(self, filters=None, after=None, limit=None):
+        extra = {"limit": limit}
+        if after is not None:
+            extra.update(after_created=after[0], after_id=after[1])
+        return self.request("GET", "/visitors", self._filter_params(filters, **extra))
+
+    def count_visitors(self, filters=None):
+        return self.request("GET", "/visitors/count", self._filter_params(filters))["count"]
+
+    def count_bulk_targets(self, filters=None):
+        return self.request("GET", "/visitors/bulk/count", self._filter_params(filters))["count"]
+
+    def search_visitors(self, text, filters=None, limit=None):
+        return self.request("GET", "/visitors/search", self._filter_params(filters, q=text, limit=limit))
+
+    def find_returning_visitor(self, phone=None, email=None):
+        return self.request("GET", "/visitors/lookup",
+                            self._filter_params(None, phone=phone, email=email))["visitor"]
+
+    def get_visitor_by_id(self, visitor_id):
+        try:
+            return self.request("GET", f"/visitors/{visitor_id:d}")
+        except ApiError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def iter_visitors(self, filters=None, batch_size=1000):
+        """Yield export rows in batches from the server's JSON-lines stream"""
+        response = self._send("GET", "/visitors/export", self._filter_params(filters))
+        if response.status >= 400:
+            raise ApiError(response.status, json.loads(response.read()).get("error", response.reason))
+        try:
+            batch = []
+            for line in response:
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            # An abandoned stream cannot be reused for the next request
+            if not response.isclosed():
+                self._connection().close()
+                self._local.conn = None
+
+    def change_version(self):
+        return self.request("GET", "/changes")["version"]
+
+    # The server's change-log version moves on every write from any kiosk
+    data_version = change_version
+
+    def iter_list_rows(self, filters=None, batch_size=None):
+        """Yield list rows in batches, paging the server's keyset API"""
+        limit, after = VisitorAPIHandler.MAX_LIMIT, None
+        while True:
+            rows = self.get_visitors_page(filters, after, limit)
+            if rows:
+                yield rows
+            if len(rows) < limit:
+                return
+            after = self.page_key(rows[-1])
+
+    def changes_since(self, version, filters=None):
+        result = self.request("GET", "/changes", self._filter_params(filters, since=version))
+        if result.get("reload"):
+            return None
+        return result["version"], result["rows"], result["removed"]
+
+    # ---- writes ----
+    def _submit(self, method, path, body=None):
+        def send():
+            result = self.request(method, path, body=body)
+            self._write_generation += 1
+            return result["id"]
+
+        return self._writes.submit(send)
+
+    def submit_add_visitor(self, data):
+        return self._submit("POST", "/visitors", data)
+
+    def submit_update_visitor(self, visitor_id, data):
+        return self._submit("PUT", f"/visitors/{visitor_id:d}", data)
+
+    def submit_delete_visitor(self, visitor_id):
+        return self._submit("DELETE", f"/visitors/{visitor_id:d}")
+
+    def submit_check_out_visitor(self, visitor_id):
+        return self._submit("POST", f"/visitors/{visitor_id:d}/check-out")
+
+    def submit_bulk_action(self, action, ids=None, filters=None, value=None, all_rows=False):
+        # Refuse here, not when the queued request comes back 400
+        DatabaseManager.check_bulk_action(action, ids, filters, all_rows)
+        body = {"action": action, "ids": None if ids is None else list(ids), "filters": filters, "value": value,
+                "all": all_rows}
+
+        def send():
+            result = self.request("POST", "/visitors/bulk", body=body)
+            self._write_generation += 1
+            return result
+
+        return self._writes.submit(send)
+
+    def add_visitor(self, data):
+        return self.submit_add_visitor(data).result()
+
+    def update_visitor(self, visitor_id, data):
+        self.submit_update_visitor(visitor_id, data).result()
+
+    def delete_visitor(self, visitor_id):
+        self.submit_delete_visitor(visitor_id).result()
+
+    def check_out_visitor(self, visitor_id):
+        self.submit_check_out_visitor(visitor_id).result()
+
+    def bulk_action(self, action, ids=None, filters=None, value=None, all_rows=False):
+        return self.submit_bulk_action(action, ids, filters, value, all_rows).result()
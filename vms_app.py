@@ -1,8 +1,14 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import sqlite3
-from datetime import datetime
-import hashlib
+from tkinter import ttk, messagebox, filedialog, simpledialog
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from vms_core import (ColumnarResultSet, DatabaseManager, ExportCancelled, Metrics, SiteTime,
+                      VisitorReports, WEEKDAYS, export_visitors, normalize_email, normalize_phone)
 
 # ==========================================
 # CONFIGURATION & THEME
@@ -32,112 +38,89 @@ class Theme:
     FONT_SMALL = ("Segoe UI", 9)
 
 # ==========================================
-# DATABASE MANAGER
+# BACKGROUND QUERY EXECUTOR
 # ==========================================
-class DatabaseManager:
-    """Handles all database interactions"""
-    DB_NAME = "vms.db"
+class QueryExecutor:
+    """Runs DatabaseManager calls on worker threads.
 
-    @staticmethod
-    def init_db():
-        try:
-            conn = sqlite3.connect(DatabaseManager.DB_NAME)
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS visitors (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fullname TEXT NOT NULL,
-                    email TEXT,
-                    phone TEXT,
-                    address TEXT,
-                    meeting_with TEXT,
-                    department TEXT,
-                    purpose TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            messagebox.showerror("Database Error", f"Init failed: {e}")
+    Results come back to the Tk thread through `root.after` polling, so the
+    on_done/on_error callbacks may touch widgets freely. Submitting with a
+    `key` supersedes the previous task with the same key: it is cancelled
+    if it has not started yet, and its result is dropped if it has.
+    """
+    POLL_MS = 25
 
-    @staticmethod
-    def add_visitor(data):
-        conn = sqlite3.connect(DatabaseManager.DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO visitors (fullname, email, phone, address, meeting_with, department, purpose)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (data['fullname'], data['email'], data['phone'], data['address'], 
-              data['meeting_with'], data['department'], data['purpose']))
-        conn.commit()
-        conn.close()
+    def __init__(self, root, max_workers=4):
+        self.root = root
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vms-query")
+        self._pending = []  # (future, key, on_done, on_error)
+        self._latest = {}   # key -> most recent future for that key
+        self._poll_id = None
 
-    @staticmethod
-    def update_visitor(visitor_id, data):
-        conn = sqlite3.connect(DatabaseManager.DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE visitors 
-            SET fullname=?, email=?, phone=?, address=?, meeting_with=?, department=?, purpose=?
-            WHERE id=?
-        """, (data['fullname'], data['email'], data['phone'], data['address'], 
-              data['meeting_with'], data['department'], data['purpose'], visitor_id))
-        conn.commit()
-        conn.close()
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None, **kwargs):
+        if key is not None:
+            self.cancel(key)
+        return self.watch(self._workers.submit(fn, *args, **kwargs),
+                          on_done=on_done, on_error=on_error, key=key)
 
-    @staticmethod
-    def delete_visitor(visitor_id):
-        conn = sqlite3.connect(DatabaseManager.DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM visitors WHERE id = ?", (visitor_id,))
-        conn.commit()
-        conn.close()
+    def watch(self, future, on_done=None, on_error=None, key=None):
+        """Deliver an existing Future's outcome to the Tk thread"""
+        if key is not None:
+            self.cancel(key)
+            self._latest[key] = future
+        self._pending.append((future, key, on_done, on_error))
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+        return future
 
-    @staticmethod
-    def get_visitors(filters=None):
-        conn = sqlite3.connect(DatabaseManager.DB_NAME)
-        cursor = conn.cursor()
-        
-        query = "SELECT id, fullname, email, phone, created_at, meeting_with, department FROM visitors"
-        params = []
-        
-        if filters and filters.get('from') and filters.get('to'):
-             # Assumes input format YYYY-MM-DD; adds time for full day coverage
-            query += " WHERE created_at BETWEEN ? AND ?"
-            params = [f"{filters['from']} 00:00:00", f"{filters['to']} 23:59:59"]
-            
-        query += " ORDER BY created_at DESC"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        return rows
-    
-    @staticmethod
-    def get_visitor_by_id(visitor_id):
-        conn = sqlite3.connect(DatabaseManager.DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM visitors WHERE id = ?", (visitor_id,))
-        row = cursor.fetchone()
-        conn.close()
-        return row
+    def cancel(self, key):
+        future = self._latest.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def is_busy(self, key):
+        future = self._latest.get(key)
+        return future is not None and not future.done()
+
+    def _poll(self):
+        self._poll_id = None
+        pending, self._pending = self._pending, []
+        still_running = []
+        for item in pending:
+            future, key, on_done, on_error = item
+            if not future.done():
+                still_running.append(item)
+                continue
+            if key is not None:
+                if self._latest.get(key) is not future:
+                    continue  # superseded by a newer request
+                del self._latest[key]
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None:
+                (on_error or self.report_error)(error)
+            elif on_done is not None:
+                on_done(future.result())
+
+        # Callbacks may have submitted follow-up work while we were iterating
+        self._pending = still_running + self._pending
+        if self._pending and self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
 
     @staticmethod
-    def get_stats():
-        conn = sqlite3.connect(DatabaseManager.DB_NAME)
-        cursor = conn.cursor()
-        
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        cursor.execute("SELECT COUNT(*) FROM visitors")
-        total = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM visitors WHERE date(created_at) = date('now', 'localtime')")
-        today_count = cursor.fetchone()[0]
-        
-        conn.close()
-        return {"total": total, "today": today_count}
+    def report_error(error):
+        messagebox.showerror("Database Error", str(error))
+
+    def shutdown(self):
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        for future, _, _, _ in self._pending:
+            future.cancel()
+        self._pending = []
+        self._latest = {}
+        self._workers.shutdown(wait=False)
 
 # ==========================================
 # UI COMPONENTS
@@ -182,65 +165,105 @@ class StyledEntry(tk.Entry):
             bd=5
         )
 
-# ==========================================
-# APPLICATION CLASS
-# ==========================================
-class VMSApplication:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Visitor Management System")
-        self.root.geometry("1200x800")
-        self.root.configure(bg=Theme.BG_PRIMARY)
-        
-        # Initialize
-        DatabaseManager.init_db()
-        self.current_user = None
-        
-        # Styles for Treeview
-        self.setup_ttk_styles()
-        
-        # Start
-        self.show_login()
+class Chart(tk.Canvas):
+    """Small titled chart drawn on a Canvas; subclasses implement plot().
 
-    def setup_ttk_styles(self):
-        style = ttk.Style()
-        style.theme_use("clam")
-        
-        # Treeview Header
-        style.configure(
-            "Treeview.Heading", 
-            background=Theme.BG_TERTIARY, 
-            foreground="white", 
-            font=Theme.FONT_BOLD,
-            relief="flat"
-        )
-        style.map("Treeview.Heading", background=[('active', Theme.BG_SECONDARY)])
-        
-        # Treeview Body
-        style.configure(
-            "Treeview",
-            background=Theme.BG_SECONDARY,
-            foreground="white",
-            fieldbackground=Theme.BG_SECONDARY,
-            font=Theme.FONT_NORMAL,
-            rowheight=35
-        )
-        style.map("Treeview", background=[("selected", Theme.ACCENT)])
+    The data is kept so the chart redraws itself when resized.
+    """
+    PADDING = (44, 28, 12, 24)  # left, top, right, bottom
+    LABEL_WIDTH = 44            # px reserved per x-axis label
 
-    def clear_window(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    def __init__(self, parent, title, color=Theme.ACCENT, height=150):
+        super().__init__(parent, bg=Theme.BG_SECONDARY, height=height, highlightthickness=0)
+        self.title = title
+        self.color = color
+        self.labels = []
+        self.values = []
+        self.bind("<Configure>", lambda e: self.redraw())
 
-    # ================= LOGIN =================
-    def show_login(self):
-        self.clear_window()
-        
-        # Split layout: Left (Brand/Art), Right (Login Form)
-        container = tk.Frame(self.root, bg=Theme.BG_PRIMARY)
-        container.pack(fill=tk.BOTH, expand=True)
+    def set_data(self, labels, values):
+        self.labels = list(labels)
+        self.values = list(values)
+        self.redraw()
+
+    def redraw(self):
+        self.delete("all")
+        width, height = self.winfo_width(), self.winfo_height()
+        self.create_text(10, 8, text=self.title, anchor="nw", fill=Theme.TEXT_MUTED, font=Theme.FONT_SMALL)
+        left, top, right, bottom = self.PADDING
+        x0, y0, x1, y1 = left, top, width - right, height - bottom
+        if not self.values or x1 - x0 < 20:
+            return
 
+        peak = max(self.values) or 1
+        self.create_line(x0, y1, x1, y1, fill=Theme.BG_TERTIARY)
+        self.create_text(x0 - 6, y0, text=f"{peak:,}", anchor="e", fill=Theme.TEXT_MUTED, font=Theme.FONT_SMALL)
+        self.create_text(x0 - 6, y1, text="0", anchor="e", fill=Theme.TEXT_MUTED, font=Theme.FONT_SMALL)
+        self.plot(x0, y0, x1, y1, peak)
+
+        # Thin out the x labels so they never overlap
+        slot = (x1 - x0) / len(self.values)
+        step = max(1, math.ceil(self.LABEL_WIDTH / slot))
+        for i in range(0, len(self.labels), step):
+            self.create_text(x0 + slot * (i + 0.5), y1 + 4, text=self.labels[i], anchor="n",
+                             fill=Theme.TEXT_MUTED, font=Theme.FONT_SMALL)
+
+    def plot(self, x0, y0, x1, y1, peak):
+        raise NotImplementedError
+
+class BarChart(Chart):
+    def plot(self, x0, y0, x1, y1, peak):
+        slot = (x1 - x0) / len(self.values)
+        gap = min(4, slot * 0.2)
+        for i, value in enumerate(self.values):
+            if value:
+                top = y1 - (y1 - y0) * value / peak
+                self.create_rectangle(x0 + slot * i + gap, top, x0 + slot * (i + 1) - gap, y1,
+                                      fill=self.color, width=0)
+
+class LineChart(Chart):
+    def plot(self, x0, y0, x1, y1, peak):
+        slot = (x1 - x0) / len(self.values)
+        points = []
+        for i, value in enumerate(self.values):
+            points += [x0 + slot * (i + 0.5), y1 - (y1 - y0) * value / peak]
+        if len(points) >= 4:
+            self.create_line(*points, fill=self.color, width=2)
+
+
+class Screen(tk.Frame):
+    """A page that is built once and then shown or hidden.
+
+    build() creates the widgets on first use; on_show() is the refresh hook
+    called every time the screen is brought to the front.
+    """
+    # Sidebar entry highlighted while this screen is visible
+    menu_item = None
+
+    def __init__(self, parent, app):
+        super().__init__(parent, bg=Theme.BG_PRIMARY)
+        self.app = app
+        self.root = app.root
+        self.db = app.db
+        self.db_executor = app.db_executor
+        self.build()
+
+    def build(self):
+        raise NotImplementedError
+
+    def on_show(self, **kwargs):
+        pass
+
+    def on_hide(self):
+        pass
+
+# ==========================================
+# SCREENS
+# ==========================================
+class LoginScreen(Screen):
+    def build(self):
         # Content Frame (Centered)
-        center_frame = tk.Frame(container, bg=Theme.BG_SECONDARY, padx=40, pady=40)
+        center_frame = tk.Frame(self, bg=Theme.BG_SECONDARY, padx=40, pady=40)
         center_frame.place(relx=0.5, rely=0.5, anchor="center")
         
         # Logo/Title
@@ -273,101 +296,90 @@ class VMSApplication:
         # Login Button
         StyledButton(center_frame, text="LOGIN", command=self.handle_login, width=30).pack()
 
+    def on_show(self):
+        self.login_pass.delete(0, tk.END)
+        self.login_user.focus_set()
         # Bind enter key
         self.root.bind('<Return>', lambda e: self.handle_login())
 
+    def on_hide(self):
+        self.root.unbind('<Return>')
+
     def handle_login(self):
         u = self.login_user.get()
         p = self.login_pass.get()
         
         if u == "admin" and p == "admin123":
-            self.current_user = "admin"
-            self.root.unbind('<Return>')
-            self.show_dashboard()
+            self.app.current_user = "admin"
+            self.app.show_dashboard()
         else:
             messagebox.showerror("Access Denied", "Invalid Credentials")
 
-    # ================= LAYOUT HELPERS =================
-    def create_sidebar(self, active_item):
-        sidebar = tk.Frame(self.root, bg=Theme.BG_SECONDARY, width=250)
-        sidebar.pack(side=tk.LEFT, fill=tk.Y)
-        sidebar.pack_propagate(False)
-        
-        # Brand
-        tk.Label(
-            sidebar, 
-            text="VMS SYSTEM", 
-            font=("Segoe UI", 18, "bold"), 
-            bg=Theme.BG_SECONDARY, 
-            fg="white"
-        ).pack(pady=40)
-        
-        # Menu Items
-        menu_items = [
-            ("Dashboard", self.show_dashboard),
-            ("New Visitor", self.show_new_visitor),
-            ("Manage Visitors", self.show_manage_visitors),
-        ]
-        
-        for text, cmd in menu_items:
-            is_active = (text == active_item)
-            fg_color = Theme.ACCENT if is_active else Theme.TEXT_MAIN
-            bg_color = "#2f3650" if is_active else Theme.BG_SECONDARY
-            font = Theme.FONT_BOLD if is_active else Theme.FONT_NORMAL
-            
-            btn = tk.Button(
-                sidebar,
-                text=f"  {text}",
-                bg=bg_color,
-                fg=fg_color,
-                font=font,
-                relief=tk.FLAT,
-                anchor="w",
-                padx=20,
-                pady=12,
-                command=cmd,
-                cursor="hand2",
-                activebackground="#2f3650",
-                activeforeground="white"
-            )
-            btn.pack(fill=tk.X, pady=2)
-
-        # Logout at bottom
-        tk.Button(
-            sidebar, 
-            text="Logout", 
-            bg=Theme.ERROR, 
-            fg="white", 
-            font=Theme.FONT_BOLD,
-            relief=tk.FLAT, 
-            command=self.show_login
-        ).pack(side=tk.BOTTOM, fill=tk.X, pady=20, padx=20)
-
-        return sidebar
 
-    def create_main_area(self):
-        main = tk.Frame(self.root, bg=Theme.BG_PRIMARY)
-        main.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
-        return main
+class DashboardScreen(Screen):
+    menu_item = "Dashboard"
+    REPORT_RANGES = ((7, "7 days"), (30, "30 days"), (365, "12 months"))
 
-    # ================= DASHBOARD =================
-    def show_dashboard(self):
-        self.clear_window()
-        self.create_sidebar("Dashboard")
-        main = self.create_main_area()
-        
+    def build(self):
         # Header
-        tk.Label(main, text="Dashboard Overview", font=Theme.FONT_HEADER, bg=Theme.BG_PRIMARY, fg="white").pack(anchor="w", padx=40, pady=40)
+        tk.Label(self, text="Dashboard Overview", font=Theme.FONT_HEADER, bg=Theme.BG_PRIMARY, fg="white").pack(anchor="w", padx=40, pady=40)
         
         # Stats Grid
-        stats_frame = tk.Frame(main, bg=Theme.BG_PRIMARY)
+        stats_frame = tk.Frame(self, bg=Theme.BG_PRIMARY)
         stats_frame.pack(fill=tk.X, padx=40)
         
-        stats = DatabaseManager.get_stats()
-        
-        self.create_stat_card(stats_frame, "Total Visitors", str(stats['total']), Theme.ACCENT).pack(side=tk.LEFT, padx=(0, 20), expand=True, fill=tk.X)
-        self.create_stat_card(stats_frame, "Visitors Today", str(stats['today']), Theme.SUCCESS).pack(side=tk.LEFT, padx=(0, 20), expand=True, fill=tk.X)
-        self.create_stat_card(stats_frame, "Active Now", "2", Theme.WARNING).pack(side=tk.LEFT, expand=True, fill=tk.X) # Mock data for now
+        self.total_card = self.create_stat_card(stats_frame, "Total Visitors", "…", Theme.ACCENT)
+        self.total_card.pack(side=tk.LEFT, padx=(0, 20), expand=True, fill=tk.X)
+        self.today_card = self.create_stat_card(stats_frame, "Visitors Today", "…", Theme.SUCCESS)
+        self.today_card.pack(side=tk.LEFT, padx=(0, 20), expand=True, fill=tk.X)
+        self.active_card = self.create_stat_card(stats_frame, "Active Now", "…", Theme.WARNING)
+        self.active_card.pack(side=tk.LEFT, expand=True, fill=tk.X)
+
+        # Traffic charts, summed from the rollup tables
+        traffic_header = tk.Frame(self, bg=Theme.BG_PRIMARY)
+        traffic_header.pack(fill=tk.X, padx=40, pady=(30, 10))
+        tk.Label(traffic_header, text="Traffic", font=Theme.FONT_SUBHEADER, bg=Theme.BG_PRIMARY, fg="white").pack(side=tk.LEFT)
+        self.report_total = tk.Label(traffic_header, text="", font=Theme.FONT_NORMAL, bg=Theme.BG_PRIMARY, fg=Theme.TEXT_MUTED)
+        self.report_total.pack(side=tk.LEFT, padx=15)
+
+        self.report_days = 30
+        self.range_buttons = {}
+        for days, text in reversed(self.REPORT_RANGES):
+            btn = StyledButton(traffic_header, text=text, width=10, bg=Theme.BG_TERTIARY,
+                               command=lambda d=days: self.load_report(d))
+            btn.pack(side=tk.RIGHT, padx=(10, 0))
+            self.range_buttons[days] = btn
+
+        charts = tk.Frame(self, bg=Theme.BG_PRIMARY)
+        charts.pack(fill=tk.X, padx=40)
+        for col in range(3):
+            charts.columnconfigure(col, weight=1, uniform="chart")
+
+        self.hour_chart = BarChart(charts, "Check-ins by hour")
+        self.hour_chart.grid(row=0, column=0, sticky="ew", padx=(0, 10), pady=(0, 10))
+        self.weekday_chart = BarChart(charts, "By weekday", color=Theme.SUCCESS)
+        self.weekday_chart.grid(row=0, column=1, sticky="ew", padx=(0, 10), pady=(0, 10))
+        self.department_chart = BarChart(charts, "By department", color=Theme.WARNING)
+        self.department_chart.grid(row=0, column=2, sticky="ew", pady=(0, 10))
+        self.day_chart = LineChart(charts, "Daily check-ins")
+        self.day_chart.grid(row=1, column=0, columnspan=2, sticky="ew", padx=(0, 10))
+        self.host_chart = BarChart(charts, f"Top {VisitorReports.TOP_HOSTS} hosts", color=Theme.ERROR)
+        self.host_chart.grid(row=1, column=2, sticky="ew")
+
+        # On Site list (evacuation rollcall)
+        tk.Label(self, text="On Site", font=Theme.FONT_SUBHEADER, bg=Theme.BG_PRIMARY, fg="white").pack(anchor="w", padx=40, pady=(30, 10))
+        site_frame = tk.Frame(self, bg=Theme.BG_SECONDARY)
+        site_frame.pack(fill=tk.BOTH, expand=True, padx=40, pady=(0, 40))
+
+        self.on_site = ttk.Treeview(site_frame, columns=("name", "host", "dept", "since"), show="headings")
+        for col, text, width in [("name", "Full Name", 200), ("host", "Meeting With", 160),
+                                 ("dept", "Department", 120), ("since", "Checked In", 150)]:
+            self.on_site.heading(col, text=text)
+            self.on_site.column(col, width=width)
+        site_sb = ttk.Scrollbar(site_frame, orient="vertical", command=self.on_site.yview)
+        self.on_site.configure(yscroll=site_sb.set)
+        self.on_site.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        site_sb.pack(side=tk.RIGHT, fill=tk.Y)
 
     def create_stat_card(self, parent, title, value, color):
         card = tk.Frame(parent, bg=Theme.BG_SECONDARY, padx=20, pady=20)
@@ -379,20 +391,68 @@ class VMSApplication:
         content.pack(side=tk.LEFT)
         
         tk.Label(content, text=title, font=Theme.FONT_NORMAL, bg=Theme.BG_SECONDARY, fg=Theme.TEXT_MUTED).pack(anchor="w")
-        tk.Label(content, text=value, font=("Segoe UI", 28, "bold"), bg=Theme.BG_SECONDARY, fg="white").pack(anchor="w")
+        card.value_label = tk.Label(content, text=value, font=("Segoe UI", 28, "bold"), bg=Theme.BG_SECONDARY, fg="white")
+        card.value_label.pack(anchor="w")
         
         return card
 
-    # ================= ADD/EDIT VISITOR =================
-    def show_new_visitor(self, existing_data=None):
-        self.clear_window()
-        page_title = "Edit Visitor" if existing_data else "New Visitor"
-        self.create_sidebar("New Visitor" if not existing_data else "")
-        main = self.create_main_area()
-        
+    def on_show(self):
+        self.refresh()
+
+    def refresh(self):
+        def fetch():
+            return self.db.get_stats(), self.db.get_on_site()
+
+        self.db_executor.submit(fetch, on_done=self.show_stats, key="dashboard.stats")
+        self.load_report()
+
+    def load_report(self, days=None):
+        if days:
+            self.report_days = days
+        for range_days, btn in self.range_buttons.items():
+            btn.default_bg = Theme.ACCENT if range_days == self.report_days else Theme.BG_TERTIARY
+            btn.config(bg=btn.default_bg)
+
+        last = datetime.strptime(SiteTime.today(), "%Y-%m-%d").date()
+        first = last - timedelta(days=self.report_days - 1)
+        self.db_executor.submit(self.db.get_traffic, first.isoformat(), last.isoformat(),
+                                on_done=self.show_report, key="dashboard.report")
+
+    def show_report(self, report):
+        self.report_total.config(text=f"{report['total']:,} check-ins")
+        self.hour_chart.set_data([f"{hour:02d}" for hour in range(24)], report['by_hour'])
+        self.weekday_chart.set_data(WEEKDAYS, report['by_weekday'])
+        self.day_chart.set_data([day[5:] for day, _ in report['by_day']], [n for _, n in report['by_day']])
+        for chart, rows in ((self.department_chart, report['by_department']), (self.host_chart, report['by_host'])):
+            # Short labels; the axis only has room for a few characters
+            chart.set_data([name[:6] for name, _ in rows], [n for _, n in rows])
+
+    def show_stats(self, result):
+        stats, visitors = result
+        self.total_card.value_label.config(text=str(stats['total']))
+        self.today_card.value_label.config(text=str(stats['today']))
+        self.active_card.value_label.config(text=str(len(visitors)))
+        self.on_site.delete(*self.on_site.get_children())
+        # row: id, fullname, meeting_with, department, created_at
+        for row in visitors:
+            self.on_site.insert("", tk.END, values=(row[1], row[2], row[3], SiteTime.format(row[4])))
+
+
+class VisitorFormScreen(Screen):
+    menu_item = "New Visitor"
+    LOOKUP_DEBOUNCE_MS = 300
+
+    def build(self):
+        self.editing_id = None
+        # Returning-visitor offer: pending after() id, the details on offer,
+        # and the (phone, email) keys already offered or dismissed
+        self.lookup_after_id = None
+        self.prefill_data = None
+        self.prefill_seen = set()
+
         # Scrollable Frame
-        canvas = tk.Canvas(main, bg=Theme.BG_PRIMARY, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(main, orient="vertical", command=canvas.yview)
+        canvas = tk.Canvas(self, bg=Theme.BG_PRIMARY, highlightthickness=0)
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=canvas.yview)
         scrollable_frame = tk.Frame(canvas, bg=Theme.BG_PRIMARY)
         
         scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
@@ -403,11 +463,22 @@ class VMSApplication:
         canvas.configure(yscrollcommand=scrollbar.set)
 
         # Header
-        tk.Label(scrollable_frame, text=page_title, font=Theme.FONT_HEADER, bg=Theme.BG_PRIMARY, fg="white").pack(anchor="w", pady=(20, 30))
+        self.title_label = tk.Label(scrollable_frame, text="New Visitor", font=Theme.FONT_HEADER, bg=Theme.BG_PRIMARY, fg="white")
+        self.title_label.pack(anchor="w", pady=(20, 30))
+
+        # Shown above the form when the phone or email matches an earlier visit
+        self.prefill_bar = tk.Frame(scrollable_frame, bg=Theme.BG_TERTIARY, padx=15, pady=10)
+        self.prefill_label = tk.Label(self.prefill_bar, text="", font=Theme.FONT_NORMAL, bg=Theme.BG_TERTIARY, fg=Theme.TEXT_MAIN)
+        self.prefill_label.pack(side=tk.LEFT)
+        StyledButton(self.prefill_bar, text="Dismiss", width=8, bg=Theme.BG_SECONDARY,
+                     command=self.hide_prefill).pack(side=tk.RIGHT)
+        StyledButton(self.prefill_bar, text="Use details", width=10,
+                     command=self.apply_prefill).pack(side=tk.RIGHT, padx=10)
 
         # Form Container
         form = tk.Frame(scrollable_frame, bg=Theme.BG_SECONDARY, padx=30, pady=30)
         form.pack(fill=tk.BOTH, expand=True)
+        self.form = form
 
         # Fields Storage
         self.form_fields = {}
@@ -426,6 +497,8 @@ class VMSApplication:
             entry = StyledEntry(form, width=40)
             entry.grid(row=i, column=1, sticky="w", pady=(0, 15), padx=(0, 20))
             self.form_fields[key] = entry
+        for key in ("phone", "email"):
+            self.form_fields[key].bind("<KeyRelease>", self.on_contact_typed)
 
         # Text Areas for Address & Purpose
         tk.Label(form, text="Address", font=Theme.FONT_BOLD, bg=Theme.BG_SECONDARY, fg="white").grid(row=0, column=2, sticky="w", pady=(10, 5))
@@ -437,15 +510,23 @@ class VMSApplication:
         self.purp_text.grid(row=2, column=3, rowspan=2, sticky="nw", pady=(0, 15))
 
         # Buttons
-        btn_text = "UPDATE" if existing_data else "SUBMIT"
-        cmd = lambda: self.save_visitor(existing_data[0] if existing_data else None)
-        
         btn_frame = tk.Frame(form, bg=Theme.BG_SECONDARY)
         btn_frame.grid(row=6, column=0, columnspan=4, pady=30, sticky="e")
         
-        StyledButton(btn_frame, text=btn_text, command=cmd, bg=Theme.SUCCESS).pack(side=tk.RIGHT)
+        self.submit_btn = StyledButton(btn_frame, text="SUBMIT", command=lambda: self.save_visitor(self.editing_id), bg=Theme.SUCCESS)
+        self.submit_btn.pack(side=tk.RIGHT)
+        self.cancel_btn = StyledButton(btn_frame, text="CANCEL", command=self.app.show_manage_visitors, bg=Theme.ERROR)
+
+    def on_show(self, existing_data=None):
+        self.reset()
+        self.editing_id = existing_data[0] if existing_data else None
+        self.menu_item = "" if existing_data else VisitorFormScreen.menu_item
+        self.title_label.config(text="Edit Visitor" if existing_data else "New Visitor")
+        self.submit_btn.config(text="UPDATE" if existing_data else "SUBMIT", state=tk.NORMAL)
         if existing_data:
-             StyledButton(btn_frame, text="CANCEL", command=self.show_manage_visitors, bg=Theme.ERROR).pack(side=tk.RIGHT, padx=10)
+            self.cancel_btn.pack(side=tk.RIGHT, padx=10)
+        else:
+            self.cancel_btn.pack_forget()
 
         # Pre-fill if editing
         if existing_data:
@@ -453,14 +534,89 @@ class VMSApplication:
             # CAREFUL: DatabaseManager.get_visitor_by_id returns specific order.
             # ID=0, Name=1, Email=2, Phone=3, Addr=4, Meet=5, Dept=6, Purp=7, Time=8
             
-            self.form_fields['fullname'].insert(0, existing_data[1])
-            self.form_fields['email'].insert(0, existing_data[2])
-            self.form_fields['phone'].insert(0, existing_data[3])
-            self.addr_text.insert("1.0", existing_data[4])
-            self.form_fields['meeting_with'].insert(0, existing_data[5])
-            self.form_fields['department'].insert(0, existing_data[6])
-            self.purp_text.insert("1.0", existing_data[7])
+            self.form_fields['fullname'].insert(0, existing_data[1] or "")
+            self.form_fields['email'].insert(0, existing_data[2] or "")
+            self.form_fields['phone'].insert(0, existing_data[3] or "")
+            self.addr_text.insert("1.0", existing_data[4] or "")
+            self.form_fields['meeting_with'].insert(0, existing_data[5] or "")
+            self.form_fields['department'].insert(0, existing_data[6] or "")
+            self.purp_text.insert("1.0", existing_data[7] or "")
+
+    def on_hide(self):
+        self.cancel_lookup()
+
+    def reset(self):
+        """Clear the form in place"""
+        for entry in self.form_fields.values():
+            entry.delete(0, tk.END)
+        self.addr_text.delete("1.0", tk.END)
+        self.purp_text.delete("1.0", tk.END)
+        self.form_fields['fullname'].focus_set()
+        self.cancel_lookup()
+        self.hide_prefill()
+        self.prefill_seen = set()
+
+    # ---- returning visitors ----
+    def contact_keys(self):
+        return (normalize_phone(self.form_fields['phone'].get()),
+                normalize_email(self.form_fields['email'].get()))
+
+    def cancel_lookup(self):
+        if self.lookup_after_id is not None:
+            self.root.after_cancel(self.lookup_after_id)
+            self.lookup_after_id = None
+        self.db_executor.cancel("visitor_form.lookup")
 
+    def on_contact_typed(self, event=None):
+        """Look the visitor up once typing pauses; new visits only"""
+        if self.editing_id:
+            return
+        self.cancel_lookup()
+        self.lookup_after_id = self.root.after(self.LOOKUP_DEBOUNCE_MS, self.lookup_returning)
+
+    def lookup_returning(self):
+        self.lookup_after_id = None
+        keys = self.contact_keys()
+        if keys == (None, None) or keys in self.prefill_seen:
+            return
+
+        def on_found(found):
+            # Typing may have moved on while the query ran
+            if found is None or self.editing_id or self.contact_keys() != keys:
+                return
+            self.prefill_seen.add(keys)
+            self.show_prefill(found)
+
+        self.db_executor.submit(self.db.find_returning_visitor, keys[0], keys[1],
+                                on_done=on_found, key="visitor_form.lookup")
+
+    def show_prefill(self, found):
+        self.prefill_data = found
+        details = ", ".join(part for part in (found['department'], found['meeting_with']) if part)
+        self.prefill_label.config(text=f"Returning visitor: {found['fullname']}"
+                                       f" (last visit {SiteTime.format(found['created_at'], '%Y-%m-%d')}"
+                                       f"{', ' + details if details else ''})")
+        if not self.prefill_bar.winfo_ismapped():
+            self.prefill_bar.pack(fill=tk.X, pady=(0, 15), before=self.form)
+
+    def hide_prefill(self):
+        self.prefill_data = None
+        self.prefill_bar.pack_forget()
+
+    def apply_prefill(self):
+        """Fill the fields still empty from the earlier visit; typed text wins"""
+        found = self.prefill_data
+        if found is None:
+            return
+        for key, entry in self.form_fields.items():
+            if not entry.get().strip() and found.get(key):
+                entry.insert(0, found[key])
+        for key, text in (('address', self.addr_text), ('purpose', self.purp_text)):
+            if not text.get("1.0", tk.END).strip() and found.get(key):
+                text.insert("1.0", found[key])
+        self.hide_prefill()
+
+    @Metrics.timed("ui.save_visitor")
     def save_visitor(self, visitor_id=None):
         data = {
             'fullname': self.form_fields['fullname'].get().strip(),
@@ -473,57 +629,141 @@ class VMSApplication:
         }
         
         # Basic Validation
-        if not data['fullname'] or not data['phone']:
-            messagebox.showwarning("Missing Data", "Full Name and Phone are required.")
+        error = self.db.validate_visitor(data)
+        if error:
+            messagebox.showwarning("Missing Data", error)
             return
 
+        # Loading state; also guards against double submits
+        btn_text = self.submit_btn['text']
+        self.submit_btn.config(text="SAVING…", state=tk.DISABLED)
+
+        def restore_button():
+            self.submit_btn.config(text=btn_text, state=tk.NORMAL)
+
+        def on_error(error):
+            restore_button()
+            QueryExecutor.report_error(error)
+
         if visitor_id:
-            DatabaseManager.update_visitor(visitor_id, data)
-            messagebox.showinfo("Success", "Visitor Updated Successfully")
-            self.show_manage_visitors()
+            def on_updated(_):
+                restore_button()
+                messagebox.showinfo("Success", "Visitor Updated Successfully")
+                self.app.show_manage_visitors()
+
+            self.db_executor.watch(self.db.submit_update_visitor(visitor_id, data),
+                                   on_done=on_updated, on_error=on_error)
         else:
-            DatabaseManager.add_visitor(data)
-            messagebox.showinfo("Success", "Visitor Added Successfully")
-            # Clear form
-            self.show_new_visitor()
+            def on_added(_):
+                restore_button()
+                messagebox.showinfo("Success", "Visitor Added Successfully")
+                # Clear form
+                self.reset()
+
+            self.db_executor.watch(self.db.submit_add_visitor(data),
+                                   on_done=on_added, on_error=on_error)
+
+
+class ManageVisitorsScreen(Screen):
+    menu_item = "Manage Visitors"
+    SEARCH_DEBOUNCE_MS = 250
+    POLL_INTERVAL_MS = 1000
+    REASSIGN_FIELDS = {"department": "Department", "meeting_with": "Host"}
+    # Tree column -> ColumnarResultSet column, for heading sorts and quick filters
+    RESULT_COLUMNS = {"id": "id", "name": "fullname", "email": "email", "phone": "phone",
+                      "date": "created_at", "dept": "department", "status": "checked_out_at"}
+    QUICK_FILTER_COLUMNS = ("id", "name", "email", "phone", "date", "dept")
+    QUICK_FILTER_MS = 150
+    # Bigger results stay paged from SQLite, without sorting or quick filters
+    MAX_RESULT_ROWS = 500000
+
+    def build(self):
+        # Write generation the table was last synced at; None = never loaded
+        self.loaded_generation = None
+        self.table_filters = None
+        self.table_loaded = 0
+        self.table_total = 0
+        self.table_exhausted = True
+        # Change-log version the tree reflects, and page key per tree item
+        self.change_version = 0
+        self.row_keys = {}
+        self.seen_data_version = None
+        self.poll_after_id = None
+        # Every row the filter matches, loaded on the first sort or quick
+        # filter; they work on it and result_view holds the rows they
+        # leave, as of result_version
+        self.result = None
+        self.result_view = None
+        self.result_version = 0
+        self.sort_column = None
+        self.sort_desc = False
+        self.quick_filters = {}
+        self.quick_after_id = None
 
-    # ================= MANAGE VISITORS =================
-    def show_manage_visitors(self):
-        self.clear_window()
-        self.create_sidebar("Manage Visitors")
-        main = self.create_main_area()
-        
         # Header
-        top_frame = tk.Frame(main, bg=Theme.BG_PRIMARY)
+        top_frame = tk.Frame(self, bg=Theme.BG_PRIMARY)
         top_frame.pack(fill=tk.X, padx=40, pady=40)
         
         tk.Label(top_frame, text="Manage Visitors", font=Theme.FONT_HEADER, bg=Theme.BG_PRIMARY, fg="white").pack(side=tk.LEFT)
         
         # Filter Bar
-        filter_frame = tk.Frame(main, bg=Theme.BG_PRIMARY)
+        filter_frame = tk.Frame(self, bg=Theme.BG_PRIMARY)
         filter_frame.pack(fill=tk.X, padx=40, pady=(0, 20))
         
         tk.Label(filter_frame, text="From:", bg=Theme.BG_PRIMARY, fg="white").pack(side=tk.LEFT)
         self.date_from = StyledEntry(filter_frame, width=15)
-        self.date_from.insert(0, datetime.now().strftime("%Y-%m-%d"))
+        self.date_from.insert(0, SiteTime.today())
         self.date_from.pack(side=tk.LEFT, padx=10)
         
         tk.Label(filter_frame, text="To:", bg=Theme.BG_PRIMARY, fg="white").pack(side=tk.LEFT)
         self.date_to = StyledEntry(filter_frame, width=15)
-        self.date_to.insert(0, datetime.now().strftime("%Y-%m-%d"))
+        self.date_to.insert(0, SiteTime.today())
         self.date_to.pack(side=tk.LEFT, padx=10)
         
         StyledButton(filter_frame, text="Filter", width=10, command=self.load_table_data).pack(side=tk.LEFT, padx=10)
 
+        tk.Label(filter_frame, text="Search:", bg=Theme.BG_PRIMARY, fg="white").pack(side=tk.LEFT, padx=(10, 0))
+        self.search_entry = StyledEntry(filter_frame, width=20)
+        self.search_entry.pack(side=tk.LEFT, padx=10)
+        self.search_after_id = None
+        self.search_entry.bind("<KeyRelease>", self.on_search_typed)
+        self.search_entry.bind("<Return>", lambda e: self.load_table_data())
+
         # Action Buttons
         StyledButton(filter_frame, text="Delete Selected", width=15, bg=Theme.ERROR, command=self.delete_selected).pack(side=tk.RIGHT)
         StyledButton(filter_frame, text="Edit Selected", width=15, bg=Theme.WARNING, command=self.edit_selected).pack(side=tk.RIGHT, padx=10)
+        StyledButton(filter_frame, text="Check Out", width=10, bg=Theme.SUCCESS, command=self.check_out_selected).pack(side=tk.RIGHT)
+        reassign = tk.Menubutton(filter_frame, text="Reassign", width=10, font=Theme.FONT_BOLD, bg=Theme.ACCENT,
+                                 fg=Theme.TEXT_MAIN, activebackground=Theme.ACCENT_HOVER, relief="flat", cursor="hand2")
+        reassign.menu = tk.Menu(reassign, tearoff=0)
+        for field, label in self.REASSIGN_FIELDS.items():
+            reassign.menu.add_command(label=f"{label}…", command=lambda field=field: self.reassign_selected(field))
+        reassign.config(menu=reassign.menu)
+        reassign.pack(side=tk.RIGHT, padx=10)
+        # Ticked, the actions above apply to every row the filter matches
+        self.bulk_all = tk.BooleanVar(value=False)
+        tk.Checkbutton(filter_frame, text="All matching", variable=self.bulk_all, bg=Theme.BG_PRIMARY, fg="white",
+                       selectcolor=Theme.BG_SECONDARY, activebackground=Theme.BG_PRIMARY,
+                       activeforeground="white").pack(side=tk.RIGHT, padx=10)
+        self.export_btn = StyledButton(filter_frame, text="Export", width=10, command=self.toggle_export)
+        self.export_btn.pack(side=tk.RIGHT)
+        self.export_cancel = None
 
         # Table
-        table_frame = tk.Frame(main, bg=Theme.BG_SECONDARY)
+        table_frame = tk.Frame(self, bg=Theme.BG_SECONDARY)
         table_frame.pack(fill=tk.BOTH, expand=True, padx=40, pady=(0, 40))
-        
-        columns = ("id", "name", "email", "phone", "date", "dept")
+
+        # Quick filters, one per column, lined up by layout_quick_filters()
+        self.quick_frame = tk.Frame(table_frame, bg=Theme.BG_SECONDARY, height=30)
+        self.quick_frame.pack(side=tk.TOP, fill=tk.X)
+        self.quick_entries = {}
+        for col in self.QUICK_FILTER_COLUMNS:
+            entry = tk.Entry(self.quick_frame, font=Theme.FONT_SMALL, bg=Theme.BG_TERTIARY, fg=Theme.TEXT_MAIN,
+                             insertbackground="white", relief=tk.FLAT)
+            entry.bind("<KeyRelease>", self.on_quick_filter_typed)
+            self.quick_entries[col] = entry
+
+        columns = ("id", "name", "email", "phone", "date", "dept", "status")
         self.tree = ttk.Treeview(table_frame, columns=columns, show="headings")
         
         # Config Columns
@@ -533,55 +773,534 @@ class VMSApplication:
             ("email", "Email", 200),
             ("phone", "Phone", 120),
             ("date", "Date Time", 150),
-            ("dept", "Department", 100)
+            ("dept", "Department", 100),
+            ("status", "Status", 120)
         ]
         
+        self.heading_text = {}
         for col, text, width in cols_config:
-            self.tree.heading(col, text=text)
+            self.tree.heading(col, text=text, command=lambda col=col: self.sort_by(col))
             self.tree.column(col, width=width)
+            self.heading_text[col] = text
+        # Column widths change on resize and when a heading divider is dragged
+        self.tree.bind("<Configure>", lambda e: self.layout_quick_filters())
+        self.tree.bind("<ButtonRelease-1>", lambda e: self.layout_quick_filters(), add="+")
 
         # Scrollbar
         sb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=sb.set)
+
+        def on_tree_scroll(first, last):
+            sb.set(first, last)
+            # Fetch the next page before the user actually hits the bottom
+            if float(last) >= 0.9:
+                self.load_next_page()
+
+        self.tree.configure(yscrollcommand=on_tree_scroll)
         
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         sb.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.load_table_data()
 
+        self.table_status = tk.Label(self, text="", font=Theme.FONT_SMALL, bg=Theme.BG_PRIMARY, fg=Theme.TEXT_MUTED)
+        self.table_status.pack(anchor="w", padx=40, pady=(0, 20))
+
+    def on_show(self):
+        # Keep the current filter and scroll position; only apply what changed
+        if self.loaded_generation is None:
+            self.load_table_data()
+        elif self.loaded_generation != self.db._write_generation:
+            self.refresh_changes()
+        # show_screen() also calls this when the screen is already up; keep one poll loop
+        self.stop_polling()
+        self.poll_after_id = self.root.after(self.POLL_INTERVAL_MS, self.poll_data_version)
+
+    def on_hide(self):
+        self.stop_polling()
+
+    def stop_polling(self):
+        if self.poll_after_id is not None:
+            self.root.after_cancel(self.poll_after_id)
+            self.poll_after_id = None
+
+    def poll_data_version(self):
+        """Pick up writes from other kiosks without re-querying the table"""
+        def on_polled(version):
+            if self.seen_data_version is not None and version != self.seen_data_version:
+                self.refresh_changes()
+            self.seen_data_version = version
+
+        self.db_executor.submit(self.db.data_version, on_done=on_polled, key="visitors.poll")
+        self.poll_after_id = self.root.after(self.POLL_INTERVAL_MS, self.poll_data_version)
+
+    @Metrics.timed("ui.load_table_data")
     def load_table_data(self):
         # Clear
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        filters = {
+        self.tree.delete(*self.tree.get_children())
+        self.row_keys = {}
+        self.result = None
+        self.result_view = None
+        self.result_version = 0
+
+        self.table_filters = {
             'from': self.date_from.get(),
-            'to': self.date_to.get()
+            'to': self.date_to.get(),
+            'search': self.search_entry.get().strip(),
         }
-        
-        try:
-            rows = DatabaseManager.get_visitors(filters)
-            for row in rows:
-                # row: id, fullname, email, phone, created_at, meeting_with, department
-                # tree expects: id, name, email, phone, date, dept
-                self.tree.insert("", tk.END, values=(row[0], row[1], row[2], row[3], row[4], row[6]))
-        except Exception:
-            # Fallback if date is invalid, load all
-            rows = DatabaseManager.get_visitors()
-            for row in rows:
-                self.tree.insert("", tk.END, values=(row[0], row[1], row[2], row[3], row[4], row[6]))
+        self.table_cursor = None
+        self.table_exhausted = True  # no paging until the first page arrives
+        self.table_loaded = 0
+        self.loaded_generation = self.db._write_generation
+        self.table_status.config(text="Loading…")
+        started = time.perf_counter()
 
-    def delete_selected(self):
+        def fetch(filters):
+            # Read first: anything committed during the load is replayed later
+            version = self.db.change_version()
+            try:
+                total = self.db.count_visitors(filters)
+            except Exception:
+                # Fallback if date is invalid, load all
+                filters = None
+                total = self.db.count_visitors()
+            return filters, total, version, self.db.get_visitors_page(filters)
+
+        def on_loaded(result):
+            self.table_filters, self.table_total, self.change_version, rows = result
+            self.append_table_rows(rows)
+            if Metrics.enabled:
+                # Click to first page on screen, including the background query
+                Metrics.record("ui.load_table_data.shown", (time.perf_counter() - started) * 1000, len(rows))
+            if (self.sort_column or self.quick_filters) and self.table_total <= self.MAX_RESULT_ROWS:
+                self.load_result()
+
+        # A newer Filter click supersedes the old load, page fetches and refreshes
+        self.db_executor.cancel("visitors.page")
+        self.db_executor.cancel("visitors.changes")
+        self.db_executor.cancel("visitors.result")
+        self.db_executor.cancel("visitors.arrange")
+        self.db_executor.submit(fetch, self.table_filters, on_done=on_loaded, key="visitors.table")
+
+    def load_result(self):
+        """Read every matching row into a ColumnarResultSet in the background.
+
+        Only done once a heading is clicked or a quick filter typed; until
+        then the table pages from SQLite. Once this lands, paging, sorting
+        and quick filters run on the result set instead.
+        """
+        started = time.perf_counter()
+        arrangement = self.result_arrangement()
+
+        def fetch(filters):
+            # Read first, as in load_table_data(): refresh_changes() replays the rest
+            version = self.db.change_version()
+            result = ColumnarResultSet()
+            for rows in self.db.iter_list_rows(filters):
+                result.extend(rows)
+            return version, result, result.arrange(*arrangement)
+
+        def on_loaded(loaded):
+            self.change_version, self.result, arranged = loaded
+            self.table_total = len(self.result)
+            self.db_executor.cancel("visitors.page")
+            self.render_result(arranged, reset=True)
+            if self.result_arrangement() != arrangement:
+                self.arrange_result()  # sorted or filtered again while loading
+            self.refresh_changes()
+            if Metrics.enabled:
+                Metrics.record("ui.load_result", (time.perf_counter() - started) * 1000, len(self.result))
+
+        self.db_executor.submit(fetch, self.table_filters, on_done=on_loaded, key="visitors.result")
+
+    def result_arrangement(self):
+        """ColumnarResultSet.arrange() arguments for the current sort and quick filters"""
+        return self.RESULT_COLUMNS.get(self.sort_column), self.sort_desc, dict(self.quick_filters)
+
+    def arrange_result(self):
+        """Sort and filter the result set on a worker thread, then redraw"""
+        result = self.result
+
+        def on_arranged(arranged):
+            if result is self.result and arranged[0] > self.result_version:
+                self.render_result(arranged, reset=True)
+
+        self.db_executor.submit(result.arrange, *self.result_arrangement(), on_done=on_arranged,
+                                key="visitors.arrange")
+
+    @Metrics.timed("ui.render_result")
+    def render_result(self, arranged, reset=False):
+        """Redraw the tree from an arranged (version, view) of the result set.
+
+        Only for a new sort or filter, or when the edits between two
+        versions are not known; change ticks go through apply_result_edits().
+        Keeps as many rows, the scroll position and the selection as before
+        unless `reset`.
+        """
+        self.result_version, self.result_view = arranged[:2]
+        selected = self.tree.selection()
+        top = self.tree.yview()[0]
+        count = self.db.PAGE_SIZE if reset else max(self.db.PAGE_SIZE, self.table_loaded)
+        self.tree.delete(*self.tree.get_children())
+        self.row_keys = {}
+        self.table_loaded = 0
+        self.insert_result_rows(count)
+        if not reset:
+            kept = [iid for iid in selected if iid in self.row_keys]
+            if kept:
+                self.tree.selection_set(kept)
+            self.tree.yview_moveto(top)
+
+    def apply_result_edits(self, result, edited, status=""):
+        """Patch the loaded tree rows with what a result set update returned.
+
+        The tree holds the first table_loaded rows of the view, so only
+        edits at those positions touch a widget; the rest are left to
+        paging. A missed version or a rebuilt view redraws instead.
+        """
+        version, view, edits = edited
+        if result is not self.result or version <= self.result_version:
+            return
+        self.table_total = len(result)
+        if edits is None or version != self.result_version + 1:
+            self.render_result((version, view))
+            self.show_table_status(status)
+            return
+        for action, position, index in edits:
+            iid = str(result.ids[index])
+            if action == "delete":
+                if position < self.table_loaded:
+                    self.tree.delete(iid)
+                    del self.row_keys[iid]
+                    self.table_loaded -= 1
+            elif action == "insert":
+                if position < self.table_loaded or self.table_exhausted:
+                    row = result.row(index)
+                    self.tree.insert("", position, iid=iid, values=self.row_values(row))
+                    self.row_keys[iid] = self.db.page_key(row)
+                    self.table_loaded += 1
+            elif position < self.table_loaded:
+                self.tree.item(iid, values=self.row_values(result.row(index)))
+        self.result_version, self.result_view = version, view
+        self.table_exhausted = self.table_loaded >= len(view)
+        self.show_table_status(status)
+
+    def insert_result_rows(self, count):
+        """Append the next `count` rows of the view to the tree"""
+        result, start = self.result, self.table_loaded
+        for index in self.result_view[start:start + count]:
+            row = result.row(index)
+            iid = str(row[0])
+            self.tree.insert("", tk.END, iid=iid, values=self.row_values(row))
+            self.row_keys[iid] = self.db.page_key(row)
+        self.table_loaded = min(len(self.result_view), start + count)
+        self.table_exhausted = self.table_loaded >= len(self.result_view)
+        self.show_table_status()
+
+    def show_table_status(self, prefix=""):
+        if self.result is not None and self.quick_filters:
+            text = (f"Showing {self.table_loaded:,} of {len(self.result_view):,} matches "
+                    f"({self.table_total:,} visitors)")
+        else:
+            text = f"Showing {self.table_loaded:,} of {self.table_total:,} visitors"
+        self.table_status.config(text=prefix + text)
+
+    def need_result(self):
+        """Load the result set for a sort or quick filter, if it can be"""
+        if (self.table_total <= self.MAX_RESULT_ROWS and not self.db_executor.is_busy("visitors.table")
+                and not self.db_executor.is_busy("visitors.result")):
+            self.load_result()  # after a running table load, that load starts it
+        self.result_pending()
+
+    def result_pending(self):
+        """Explain why a sort or quick filter is not applied yet"""
+        if self.table_total > self.MAX_RESULT_ROWS:
+            self.table_status.config(text=f"Sorting and quick filters need {self.MAX_RESULT_ROWS:,} visitors "
+                                          f"or fewer; narrow the dates or search")
+        else:
+            self.table_status.config(text="Sorting and quick filters apply once every matching visitor is loaded…")
+
+    def sort_by(self, col):
+        """Heading click: sort by `col`, again to reverse"""
+        if self.sort_column == col:
+            self.sort_desc = not self.sort_desc
+        else:
+            self.sort_column, self.sort_desc = col, False
+        for name, text in self.heading_text.items():
+            arrow = (" ▼" if self.sort_desc else " ▲") if name == col else ""
+            self.tree.heading(name, text=text + arrow)
+        if self.result is not None:
+            self.arrange_result()
+        else:
+            self.need_result()
+
+    def on_quick_filter_typed(self, event):
+        if self.quick_after_id is not None:
+            self.root.after_cancel(self.quick_after_id)
+        self.quick_after_id = self.root.after(self.QUICK_FILTER_MS, self.apply_quick_filters)
+
+    def apply_quick_filters(self):
+        self.quick_after_id = None
+        self.quick_filters = {self.RESULT_COLUMNS[col]: entry.get() for col, entry in self.quick_entries.items()
+                              if entry.get().strip()}
+        if self.result is not None:
+            self.arrange_result()
+        elif self.quick_filters:
+            self.need_result()
+
+    def layout_quick_filters(self):
+        """Line the quick-filter entries up under the tree's current column widths"""
+        x = 0
+        for col in self.tree["columns"]:
+            width = self.tree.column(col, "width")
+            entry = self.quick_entries.get(col)
+            if entry is not None:
+                entry.place(x=x + 1, y=3, width=max(width - 2, 10), height=24)
+            x += width
+
+    def refresh_changes(self):
+        """Apply rows changed since the last load or refresh to the tree"""
+        if self.db_executor.is_busy("visitors.table"):
+            return  # the running load will include them
+        self.loaded_generation = self.db._write_generation
+        result = self.result
+
+        def fetch(version, filters):
+            changes = self.db.changes_since(version, filters)
+            if not (changes and (changes[1] or changes[2])):
+                return changes, self.table_total, None
+            if result is not None:
+                # Re-sorted and re-filtered here, off the Tk thread
+                return changes, self.table_total, result.update(changes[1], changes[2])
+            return changes, self.db.count_visitors(filters), None
+
+        self.db_executor.submit(fetch, self.change_version, self.table_filters,
+                                on_done=lambda fetched: self.apply_changes(fetched, result), key="visitors.changes")
+
+    def apply_changes(self, fetched, result=None):
+        changes, self.table_total, edited = fetched
+        if changes is None:
+            self.load_table_data()
+            return
+        self.change_version, rows, removed = changes
+
+        if result is not None:
+            if edited is not None:
+                self.apply_result_edits(result, edited)
+            return
+
+        for visitor_id in removed:
+            self.remove_tree_row(str(visitor_id))
+
+        for row in rows:
+            iid, key = str(row[0]), self.db.page_key(row)
+            if self.row_keys.get(iid) == key:
+                self.tree.item(iid, values=self.row_values(row))
+                continue
+            self.remove_tree_row(iid)  # check-in time changed; it moves
+            if not self.table_exhausted and key < self.table_cursor:
+                continue  # beyond the loaded pages; paging will bring it in
+            self.tree.insert("", self.tree_index(key), iid=iid, values=self.row_values(row))
+            self.row_keys[iid] = key
+            self.table_loaded += 1
+
+        self.show_table_status()
+
+    def remove_tree_row(self, iid):
+        if self.row_keys.pop(iid, None) is not None:
+            self.tree.delete(iid)
+            self.table_loaded -= 1
+
+    def tree_index(self, key):
+        """Position for a row with page key `key` (newest first)"""
+        for index, iid in enumerate(self.tree.get_children()):
+            if self.row_keys[iid] < key:
+                return index
+        return tk.END
+
+    @staticmethod
+    def row_values(row):
+        # row: id, fullname, email, phone, created_at, meeting_with, department, checked_out_at
+        # (times in UTC epoch seconds); tree expects: id, name, email, phone, date, dept, status
+        status = f"Out {SiteTime.format(row[7])}" if row[7] else "On site"
+        return (row[0], row[1], row[2], row[3], SiteTime.format(row[4]), row[6], status)
+
+    def on_search_typed(self, event):
+        # Debounce: only query once typing pauses
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(self.SEARCH_DEBOUNCE_MS, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        self.load_table_data()
+
+    def load_next_page(self):
+        if self.table_exhausted:
+            return
+        if self.result is not None:
+            self.insert_result_rows(self.db.PAGE_SIZE)
+            return
+        if self.db_executor.is_busy("visitors.page"):
+            return
+
+        self.table_status.config(text=f"Showing {self.table_loaded:,} of {self.table_total:,} visitors (loading more…)")
+        self.db_executor.submit(self.db.get_visitors_page, self.table_filters,
+                                after=self.table_cursor, on_done=self.append_table_rows, key="visitors.page")
+
+    def append_table_rows(self, rows):
+        if self.result is not None:
+            return  # a page that finished after the result set took over
+        for row in rows:
+            iid = str(row[0])
+            if iid in self.row_keys:
+                continue  # already placed by apply_changes()
+            self.tree.insert("", tk.END, iid=iid, values=self.row_values(row))
+            self.row_keys[iid] = self.db.page_key(row)
+            self.table_loaded += 1
+
+        if rows:
+            self.table_cursor = self.db.page_key(rows[-1])
+        self.table_exhausted = len(rows) < self.db.PAGE_SIZE
+        self.show_table_status()
+
+    def toggle_export(self):
+        if self.export_cancel is not None:
+            self.export_cancel.set()
+            return
+
+        path = filedialog.asksaveasfilename(
+            title="Export Visitors",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Excel Workbook", "*.xlsx")],
+        )
+        if not path:
+            return
+
+        # Export exactly what the table is showing, including the search box
+        filters = self.table_filters
+        cancel_event = self.export_cancel = threading.Event()
+        progress = {'rows': 0}
+
+        def show_progress():
+            if self.export_cancel is cancel_event:
+                self.export_btn.config(text=f"Cancel ({progress['rows']:,})")
+                self.root.after(200, show_progress)
+
+        def finish():
+            self.export_cancel = None
+            self.export_btn.config(text="Export")
+
+        def on_done(count):
+            finish()
+            messagebox.showinfo("Export Complete", f"Exported {count:,} visitors to {path}")
+
+        def on_error(error):
+            finish()
+            if not isinstance(error, ExportCancelled):
+                messagebox.showerror("Export Failed", str(error))
+
+        def on_progress(rows):
+            progress['rows'] = rows  # read by show_progress on the Tk thread
+
+        self.db_executor.submit(export_visitors, path, filters, progress=on_progress, source=self.db,
+                                cancel_event=cancel_event, on_done=on_done, on_error=on_error,
+                                key="visitors.export")
+        show_progress()
+
+    def bulk_scope(self, then):
+        """Call then(scope) with the (ids, filters, all_rows, count) the
+        actions apply to; nothing happens if they apply to no row"""
+        if self.bulk_all.get():
+            if not self.table_total:
+                messagebox.showwarning("Warning", "No visitors match the filter")
+                return
+            if self.result is not None and self.quick_filters:
+                # The quick filters narrow what matches; SQLite doesn't know them
+                ids = self.result.visitor_ids(self.result_view)
+                if not ids:
+                    messagebox.showwarning("Warning", "No visitors match the quick filters")
+                    return
+                then((ids, None, False, len(ids)))
+                return
+            # table_total includes archived months, which bulk actions never
+            # touch: ask for the count of the rows the action will run over
+            filters = self.table_filters
+
+            def counted(count):
+                if not count:
+                    messagebox.showwarning("Warning", "Only archived visitors match the filter")
+                else:
+                    then((None, filters, True, count))
+
+            self.db_executor.submit(self.db.count_bulk_targets, filters, on_done=counted, key="visitors.bulk_count")
+            return
         selected = self.tree.selection()
         if not selected:
             messagebox.showwarning("Warning", "No visitor selected")
             return
-            
-        if messagebox.askyesno("Confirm", "Delete selected visitor?"):
-            visitor_id = self.tree.item(selected[0])['values'][0]
-            DatabaseManager.delete_visitor(visitor_id)
-            self.load_table_data()
-            messagebox.showinfo("Success", "Visitor deleted")
+        then(([int(iid) for iid in selected], None, False, len(selected)))
+
+    def delete_selected(self):
+        def confirm(scope):
+            if messagebox.askyesno("Confirm", f"Delete {scope[3]:,} visitor(s)?"):
+                self.run_bulk("delete", scope, "Deleting…")
+
+        self.bulk_scope(confirm)
+
+    def check_out_selected(self):
+        self.bulk_scope(lambda scope: self.run_bulk("check_out", scope, "Checking out…"))
+
+    def reassign_selected(self, field):
+        label = self.REASSIGN_FIELDS[field]
+
+        def ask(scope):
+            value = simpledialog.askstring(f"Reassign {label}", f"New {label.lower()} for {scope[3]:,} visitor(s):",
+                                           parent=self.root)
+            if value is not None:
+                self.run_bulk(field, scope, "Reassigning…", value)
+
+        self.bulk_scope(ask)
+
+    def run_bulk(self, action, scope, status, value=None):
+        ids, filters, all_rows, _ = scope
+        self.table_status.config(text=status)
+        self.db_executor.watch(self.db.submit_bulk_action(action, ids, filters, value, all_rows),
+                               on_done=self.apply_bulk_result)
+
+    def apply_bulk_result(self, result):
+        """Apply a committed bulk action to the loaded rows in one pass"""
+        action, value, ids = result["action"], result["value"], result["ids"]
+        loaded = [iid for iid in map(str, ids) if iid in self.row_keys]
+        verb = {"delete": "Deleted", "check_out": "Checked out"}.get(action, "Reassigned")
+        status = f"{verb} {len(ids):,} visitors. "
+        if self.result is not None:
+            rows = self.result
+            if action == "delete":
+                update = (rows.remove, ids)
+            else:
+                update = (rows.set_value, ids, "checked_out_at" if action == "check_out" else action, value)
+            self.db_executor.submit(*update, on_done=lambda edited: self.apply_result_edits(rows, edited, status))
+        elif action == "delete":
+            if loaded:
+                self.tree.delete(*loaded)
+            for iid in loaded:
+                del self.row_keys[iid]
+            self.table_loaded -= len(loaded)
+            self.table_total = max(0, self.table_total - len(ids))
+        elif action == "check_out":
+            for iid in loaded:
+                self.tree.set(iid, "status", f"Out {SiteTime.format(value)}")
+        elif action == "department":
+            for iid in loaded:
+                self.tree.set(iid, "dept", value)
+
+        # A new department or host can move rows in or out of a search, and
+        # other writes may have landed meanwhile: the change feed covers both
+        searching = bool(self.table_filters and self.table_filters.get('search'))
+        if result["before"] == self.change_version and not (searching and action in self.REASSIGN_FIELDS):
+            self.change_version = result["after"]
+            self.loaded_generation = self.db._write_generation
+        else:
+            self.refresh_changes()
+        self.show_table_status(status)
 
     def edit_selected(self):
         selected = self.tree.selection()
@@ -590,11 +1309,302 @@ class VMSApplication:
             return
             
         visitor_id = self.tree.item(selected[0])['values'][0]
-        data = DatabaseManager.get_visitor_by_id(visitor_id)
-        if data:
-            self.show_new_visitor(data)
 
-if __name__ == "__main__":
+        def on_fetched(data):
+            if data:
+                self.app.show_new_visitor(data)
+
+        self.db_executor.submit(self.db.get_visitor_by_id, visitor_id,
+                                on_done=on_fetched, key="visitors.edit")
+
+class DiagnosticsScreen(Screen):
+    """Latency histograms for this process; hidden, opened with Ctrl+Shift+D"""
+    REFRESH_MS = 1000
+    COLUMNS = (
+        ("count", "Calls", 70),
+        ("p50_ms", "p50 ms", 70),
+        ("p95_ms", "p95 ms", 70),
+        ("p99_ms", "p99 ms", 70),
+        ("max_ms", "Max ms", 80),
+        ("rows", "Rows", 80),
+    )
+
+    def build(self):
+        self.refresh_after_id = None
+
+        top_frame = tk.Frame(self, bg=Theme.BG_PRIMARY)
+        top_frame.pack(fill=tk.X, padx=40, pady=40)
+        tk.Label(top_frame, text="Diagnostics", font=Theme.FONT_HEADER, bg=Theme.BG_PRIMARY, fg="white").pack(side=tk.LEFT)
+
+        StyledButton(top_frame, text="Export JSON", width=12, command=self.export).pack(side=tk.RIGHT)
+        StyledButton(top_frame, text="Reset", width=8, bg=Theme.BG_TERTIARY,
+                     command=lambda: (Metrics.reset(), self.refresh())).pack(side=tk.RIGHT, padx=10)
+        self.toggle_btn = StyledButton(top_frame, text="", width=10, command=self.toggle)
+        self.toggle_btn.pack(side=tk.RIGHT)
+
+        table_frame = tk.Frame(self, bg=Theme.BG_SECONDARY)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=40, pady=(0, 10))
+        self.tree = ttk.Treeview(table_frame, columns=[key for key, _, _ in self.COLUMNS])
+        self.tree.heading("#0", text="Series")
+        self.tree.column("#0", width=520)
+        for key, text, width in self.COLUMNS:
+            self.tree.heading(key, text=text)
+            self.tree.column(key, width=width, anchor="e")
+        sb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=sb.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        sb.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.status = tk.Label(self, text="", font=Theme.FONT_SMALL, bg=Theme.BG_PRIMARY, fg=Theme.TEXT_MUTED)
+        self.status.pack(anchor="w", padx=40, pady=(0, 20))
+
+    def on_show(self):
+        self.refresh()
+
+    def on_hide(self):
+        if self.refresh_after_id is not None:
+            self.root.after_cancel(self.refresh_after_id)
+            self.refresh_after_id = None
+
+    def toggle(self):
+        Metrics.enable(not Metrics.enabled)
+        self.refresh()
+
+    def refresh(self):
+        if self.refresh_after_id is not None:
+            self.root.after_cancel(self.refresh_after_id)
+        snapshot = Metrics.snapshot()
+        self.toggle_btn.config(text="Disable" if snapshot["enabled"] else "Enable")
+
+        # Slowest first by p95, updated in place so scrolling and selection survive
+        series = sorted(snapshot["series"].items(), key=lambda item: -(item[1]["p95_ms"] or 0))
+        stale = set(self.tree.get_children()) - set(snapshot["series"])
+        if stale:
+            self.tree.delete(*stale)
+        for index, (name, stats) in enumerate(series):
+            values = [stats[key] if stats[key] is not None else "" for key, _, _ in self.COLUMNS]
+            if self.tree.exists(name):
+                self.tree.item(name, values=values)
+                self.tree.move(name, "", index)
+            else:
+                self.tree.insert("", index, iid=name, text=name, values=values)
+
+        state = "recording" if snapshot["enabled"] else "off"
+        text = (f"Recording is {state}; {len(series)} series since {snapshot['since'] or '-'}."
+                f" Percentiles are bucket upper bounds.")
+        if self.db is DatabaseManager:  # an API backend's cache lives in the server
+            text += "  Read cache: " + "; ".join(
+                f"{name} {stats['hits']:,}/{stats['hits'] + stats['misses']:,} hits,"
+                f" {stats['entries']:,} entries, {stats['bytes'] / 1024:,.0f} KB"
+                if stats['enabled'] else f"{name} off"
+                for name, stats in DatabaseManager.cache_stats().items())
+        self.status.config(text=text)
+        self.refresh_after_id = self.root.after(self.REFRESH_MS, self.refresh)
+
+    def export(self):
+        path = filedialog.asksaveasfilename(
+            title="Export Diagnostics",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json")],
+        )
+        if not path:
+            return
+        try:
+            Metrics.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Failed", str(e))
+            return
+        messagebox.showinfo("Export Complete", f"Diagnostics written to {path}")
+
+# ==========================================
+# APPLICATION CLASS
+# ==========================================
+class VMSApplication:
+    def __init__(self, root, backend=None):
+        self.root = root
+        # DatabaseManager for a local file, or an ApiClient for a VMS server
+        self.db = backend or DatabaseManager
+        self.root.title("Visitor Management System")
+        self.root.geometry("1200x800")
+        self.root.configure(bg=Theme.BG_PRIMARY)
+        
+        # Initialize (schema must be current before any screen queries it)
+        try:
+            self.db.init_db()
+        except Exception as e:
+            messagebox.showerror("Database Error", f"Init failed: {e}")
+        self.db_executor = QueryExecutor(root)
+        self.current_user = None
+        
+        # Styles for Treeview
+        self.setup_ttk_styles()
+
+        # Screens are built on first visit and reused afterwards
+        self.screens = {}
+        self.current_screen = None
+        self.shell = None
+
+        # Hidden on purpose: support staff open it when a kiosk feels slow
+        self.root.bind_all("<Control-Shift-D>", lambda e: self.show_diagnostics())
+        
+        # Start
+        self.show_login()
+
+    def setup_ttk_styles(self):
+        style = ttk.Style()
+        style.theme_use("clam")
+        
+        # Treeview Header
+        style.configure(
+            "Treeview.Heading", 
+            background=Theme.BG_TERTIARY, 
+            foreground="white", 
+            font=Theme.FONT_BOLD,
+            relief="flat"
+        )
+        style.map("Treeview.Heading", background=[('active', Theme.BG_SECONDARY)])
+        
+        # Treeview Body
+        style.configure(
+            "Treeview",
+            background=Theme.BG_SECONDARY,
+            foreground="white",
+            fieldbackground=Theme.BG_SECONDARY,
+            font=Theme.FONT_NORMAL,
+            rowheight=35
+        )
+        style.map("Treeview", background=[("selected", Theme.ACCENT)])
+
+    # ================= NAVIGATION =================
+    def show_screen(self, screen_class, **kwargs):
+        """Hide the current screen and show `screen_class`, building it once"""
+        if screen_class is LoginScreen:
+            parent = self.root
+            if self.shell is not None:
+                self.shell.pack_forget()
+        else:
+            parent = self.get_shell()
+
+        screen = self.screens.get(screen_class)
+        if screen is None:
+            screen = self.screens[screen_class] = screen_class(parent, self)
+
+        if self.current_screen is not None and self.current_screen is not screen:
+            self.current_screen.on_hide()
+            self.current_screen.pack_forget()
+        if self.current_screen is not screen:
+            screen.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        self.current_screen = screen
+
+        screen.on_show(**kwargs)
+        self.highlight_menu(screen.menu_item)
+        return screen
+
+    def show_login(self):
+        # Back at the login screen nobody is signed in, whatever led here
+        self.current_user = None
+        return self.show_screen(LoginScreen)
+
+    @Metrics.timed("ui.show_dashboard")
+    def show_dashboard(self):
+        return self.show_screen(DashboardScreen)
+
+    @Metrics.timed("ui.show_new_visitor")
+    def show_new_visitor(self, existing_data=None):
+        return self.show_screen(VisitorFormScreen, existing_data=existing_data)
+
+    @Metrics.timed("ui.show_manage_visitors")
+    def show_manage_visitors(self):
+        return self.show_screen(ManageVisitorsScreen)
+
+    def show_diagnostics(self):
+        if self.current_user is None:
+            return None
+        return self.show_screen(DiagnosticsScreen)
+
+    # ================= LAYOUT HELPERS =================
+    def get_shell(self):
+        """Sidebar plus content area shared by every signed-in screen"""
+        if self.shell is None:
+            self.shell = tk.Frame(self.root, bg=Theme.BG_PRIMARY)
+            self.sidebar = self.create_sidebar(self.shell)
+        if not self.shell.winfo_ismapped():
+            self.shell.pack(fill=tk.BOTH, expand=True)
+        return self.shell
+
+    def create_sidebar(self, parent):
+        sidebar = tk.Frame(parent, bg=Theme.BG_SECONDARY, width=250)
+        sidebar.pack(side=tk.LEFT, fill=tk.Y)
+        sidebar.pack_propagate(False)
+        
+        # Brand
+        tk.Label(
+            sidebar, 
+            text="VMS SYSTEM", 
+            font=("Segoe UI", 18, "bold"), 
+            bg=Theme.BG_SECONDARY, 
+            fg="white"
+        ).pack(pady=40)
+        
+        # Menu Items
+        menu_items = [
+            ("Dashboard", self.show_dashboard),
+            ("New Visitor", self.show_new_visitor),
+            ("Manage Visitors", self.show_manage_visitors),
+        ]
+        
+        self.menu_buttons = {}
+        for text, cmd in menu_items:
+            btn = tk.Button(
+                sidebar,
+                text=f"  {text}",
+                bg=Theme.BG_SECONDARY,
+                fg=Theme.TEXT_MAIN,
+                font=Theme.FONT_NORMAL,
+                relief=tk.FLAT,
+                anchor="w",
+                padx=20,
+                pady=12,
+                command=cmd,
+                cursor="hand2",
+                activebackground="#2f3650",
+                activeforeground="white"
+            )
+            btn.pack(fill=tk.X, pady=2)
+            self.menu_buttons[text] = btn
+
+        # Logout at bottom
+        tk.Button(
+            sidebar, 
+            text="Logout", 
+            bg=Theme.ERROR, 
+            fg="white", 
+            font=Theme.FONT_BOLD,
+            relief=tk.FLAT, 
+            command=self.show_login
+        ).pack(side=tk.BOTTOM, fill=tk.X, pady=20, padx=20)
+
+        return sidebar
+
+    def highlight_menu(self, active_item):
+        for text, btn in getattr(self, "menu_buttons", {}).items():
+            is_active = (text == active_item)
+            btn.config(
+                fg=Theme.ACCENT if is_active else Theme.TEXT_MAIN,
+                bg="#2f3650" if is_active else Theme.BG_SECONDARY,
+                font=Theme.FONT_BOLD if is_active else Theme.FONT_NORMAL,
+            )
+
+
+def run_gui(backend=None):
     root = tk.Tk()
-    app = VMSApplication(root)
+    app = VMSApplication(root, backend)
     root.mainloop()
+    app.db_executor.shutdown()
+    app.db.close()
+
+
+if __name__ == "__main__":
+    # `python vms_app.py [command]` keeps working; the CLI decides whether to open the GUI
+    import vms_cli
+    sys.exit(vms_cli.main())
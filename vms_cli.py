@@ -0,0 +1,297 @@
+"""Command line for the Visitor Management System.
+
+    python -m vms_cli [--db vms.db] <command> [options]
+    python -m vms_cli --help
+
+Without a command the desktop GUI opens; it is the only path that
+imports tkinter.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from vms_core import (EXPORT_COLUMNS, EXPORT_WRITERS, DatabaseManager, Metrics, Replicator, SiteTime,
+                      TimestampBackfill, VisitorArchive, export_visitors, import_visitors_file)
+
+
+def cmd_init(args):
+    applied = DatabaseManager.upgrade()
+    with DatabaseManager.connection() as conn:
+        version = DatabaseManager.schema_version(conn)
+    if applied:
+        print(f"Migrated {DatabaseManager.DB_NAME} to schema version {version}"
+              f" (applied {', '.join(map(str, applied))})")
+    else:
+        print(f"{DatabaseManager.DB_NAME} is up to date at schema version {version}")
+    return 0
+
+
+def cmd_add(args):
+    data = {'fullname': args.name, 'phone': args.phone, 'email': args.email or '', 'address': args.address or '',
+            'meeting_with': args.host or '', 'department': args.department or '', 'purpose': args.purpose or ''}
+    error = DatabaseManager.validate_visitor(data)
+    if error:
+        print(error, file=sys.stderr)
+        return 2
+    print(DatabaseManager.add_visitor(data))
+    return 0
+
+
+def cmd_list(args):
+    filters = {'from': args.date_from, 'to': args.date_to, 'search': args.search}
+    batches = DatabaseManager.iter_visitors(filters)
+    # JSON keeps the stored UTC times; the table shows the site's clock
+    times = [EXPORT_COLUMNS.index('created_at'), EXPORT_COLUMNS.index('checked_out_at')]
+    shown = 0
+    try:
+        if not args.json:
+            print("\t".join(EXPORT_COLUMNS))
+        for batch in batches:
+            for row in batch:
+                if args.limit and shown >= args.limit:
+                    return 0
+                if args.json:
+                    print(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False))
+                else:
+                    row = list(row)
+                    for i in times:
+                        row[i] = SiteTime.format(row[i])
+                    print("\t".join("" if value is None else str(value).replace("\t", " ").replace("\n", " ")
+                                    for value in row))
+                shown += 1
+    finally:
+        batches.close()
+    return 0
+
+
+def cmd_stats(args):
+    stats = DatabaseManager.get_stats()
+    with DatabaseManager.connection() as conn:
+        stats["schema_version"] = DatabaseManager.schema_version(conn)
+        stats["archived"] = conn.execute(DatabaseManager.SQL_ARCHIVED_TOTAL).fetchone()[0]
+    stats["on_site"] = len(DatabaseManager.get_on_site())
+    stats["change_version"] = DatabaseManager.change_version()
+    stats["file_bytes"] = DatabaseManager.file_size()
+    if args.json:
+        print(json.dumps(stats))
+    else:
+        for key, value in stats.items():
+            print(f"{key:<15}{value:,}")
+    return 0
+
+
+def cmd_vacuum(args):
+    before, after = DatabaseManager.vacuum()
+    print(f"Vacuumed {DatabaseManager.DB_NAME}: {before / 2**20:,.1f} MB -> {after / 2**20:,.1f} MB")
+    return 0
+
+
+def cmd_integrity_check(args):
+    problems = DatabaseManager.integrity_check(quick=args.quick)
+    for problem in problems:
+        print(problem)
+    if not problems:
+        print("ok")
+    return 1 if problems else 0
+
+
+def cmd_serve(args):
+    from vms_api import make_api_server
+    server = make_api_server(args.host, args.port, token=args.token, verbose=args.verbose)
+    TimestampBackfill.start()
+    print(f"Serving {DatabaseManager.DB_NAME} on http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def cmd_import(args):
+    started = time.monotonic()
+
+    def progress(imported, rejected):
+        rate = imported / max(time.monotonic() - started, 1e-9)
+        print(f"\rimported {imported:,} rows, {rejected:,} rejected ({rate:,.0f} rows/s)",
+              end="", file=sys.stderr, flush=True)
+
+    result = import_visitors_file(args.file, rejects_path=args.rejects, chunk_size=args.chunk_size,
+                                  progress=progress, defer_indexes=not args.keep_indexes)
+    print(file=sys.stderr)
+    print(f"Imported {result['imported']:,} visitors, rejected {result['rejected']:,}"
+          f" in {time.monotonic() - started:.1f}s")
+    return 1 if result['rejected'] else 0
+
+
+def cmd_archive(args):
+    def progress(moved):
+        print(f"\rarchived {moved:,} rows", end="", file=sys.stderr, flush=True)
+
+    moved = VisitorArchive.run(retention_days=args.retention_days, chunk_size=args.chunk_size,
+                               progress=progress)
+    print(file=sys.stderr)
+    print(f"Archived {moved:,} visitors to {DatabaseManager.archive_dir()}")
+    return 0
+
+
+def cmd_backfill(args):
+    started = time.monotonic()
+
+    def progress(filled):
+        print(f"\rfilled in {filled:,} check-in times", end="", file=sys.stderr, flush=True)
+
+    filled = TimestampBackfill.run(chunk_size=args.chunk_size, pause=0, progress=progress)
+    print(file=sys.stderr)
+    print(f"Filled in {filled:,} check-in times in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+def cmd_sync(args):
+    def progress(totals):
+        print(f"\rsent {totals['batches']:,} change sets ({totals['bytes']:,} bytes)",
+              end="", file=sys.stderr, flush=True)
+
+    totals = Replicator.sync(DatabaseManager.DB_NAME, args.target, batch_size=args.batch_size, progress=progress)
+    print(file=sys.stderr)
+    print(f"Synced to {args.target} up to change {totals['seq']:,}: {totals['inserted']:,} inserted,"
+          f" {totals['updated']:,} updated, {totals['deleted']:,} deleted, {totals['skipped']:,} skipped")
+    return 0
+
+
+def cmd_export(args):
+    filters = {'from': args.date_from, 'to': args.date_to, 'search': args.search}
+
+    def progress(rows):
+        print(f"\rexported {rows:,} rows", end="", file=sys.stderr, flush=True)
+
+    count = export_visitors(args.file, filters, fmt=args.format, progress=progress)
+    print(file=sys.stderr)
+    print(f"Exported {count:,} visitors to {args.file}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Visitor Management System")
+    parser.add_argument("--db", default=DatabaseManager.DB_NAME, help="SQLite database file")
+    parser.add_argument("--api", metavar="URL", help="run the GUI against a VMS server instead of --db")
+    parser.add_argument("--token", default=os.environ.get("VMS_API_TOKEN"),
+                        help="shared API token (default: $VMS_API_TOKEN)")
+    parser.add_argument("--diagnostics", action="store_true", default=bool(os.environ.get("VMS_DIAGNOSTICS")),
+                        help="record latency histograms from startup (default: $VMS_DIAGNOSTICS)")
+    parser.add_argument("--diagnostics-out", metavar="FILE", help="write the histograms as JSON on exit")
+    parser.add_argument("--no-read-cache", action="store_true",
+                        help="always query SQLite, e.g. when benchmarking a server")
+    parser.add_argument("--timezone", default=os.environ.get("VMS_TIMEZONE"), metavar="ZONE",
+                        help="site time zone for dates and display, e.g. Europe/London"
+                             " (default: $VMS_TIMEZONE, else this machine's)")
+    commands = parser.add_subparsers(dest="command", metavar="command",
+                                     help="omit to open the GUI")
+
+    # These manage the schema themselves instead of migrating first
+    p = commands.add_parser("init", aliases=["migrate"], help="create the database or migrate it to the latest schema")
+    p.set_defaults(func=cmd_init, upgrade=False)
+
+    p = commands.add_parser("integrity-check", help="check the file, the search index and the counters")
+    p.add_argument("--quick", action="store_true", help="run SQLite's faster quick_check only")
+    p.set_defaults(func=cmd_integrity_check, upgrade=False)
+
+    p = commands.add_parser("add", help="check in a visitor and print the new id")
+    p.add_argument("--name", required=True, help="full name")
+    p.add_argument("--phone", required=True)
+    p.add_argument("--email")
+    p.add_argument("--address")
+    p.add_argument("--host", help="person being visited")
+    p.add_argument("--department")
+    p.add_argument("--purpose")
+    p.set_defaults(func=cmd_add)
+
+    p = commands.add_parser("list", help="print visitors as tab-separated text, newest first")
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", help="first day (inclusive; with --to)")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", help="last day (inclusive; with --from)")
+    p.add_argument("--search", help="full-text search terms")
+    p.add_argument("--limit", type=int, default=0, help="stop after this many rows (0: all)")
+    p.add_argument("--json", action="store_true", help="print JSON lines instead")
+    p.set_defaults(func=cmd_list)
+
+    p = commands.add_parser("stats", help="print visitor counts and database facts")
+    p.add_argument("--json", action="store_true", help="print one JSON object instead")
+    p.set_defaults(func=cmd_stats)
+
+    p = commands.add_parser("vacuum", help="compact the database file")
+    p.set_defaults(func=cmd_vacuum)
+
+    p = commands.add_parser("import", help="bulk import visitors from CSV or JSONL")
+    p.add_argument("file", help="input .csv (with a header row) or .jsonl file")
+    p.add_argument("--rejects", help="write rejected rows to this JSONL file")
+    p.add_argument("--chunk-size", type=int, default=5000, help="rows per transaction")
+    p.add_argument("--keep-indexes", action="store_true",
+                   help="maintain indexes row by row instead of rebuilding them at the end")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("export", help="export visitors to CSV, JSONL or XLSX")
+    p.add_argument("file", help="output file; the format follows the extension")
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", help="first day (inclusive; with --to)")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", help="last day (inclusive; with --from)")
+    p.add_argument("--search", help="full-text search terms")
+    p.add_argument("--format", choices=sorted(EXPORT_WRITERS), help="override the format")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("serve", help="serve the database as a JSON API for kiosks")
+    p.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--verbose", action="store_true", help="log every request")
+    p.set_defaults(func=cmd_serve)
+
+    p = commands.add_parser("archive", help="move old visits into monthly archive files")
+    p.add_argument("--retention-days", type=int, default=VisitorArchive.RETENTION_DAYS,
+                   help="keep visits from this many recent days in the main database")
+    p.add_argument("--chunk-size", type=int, default=VisitorArchive.CHUNK_SIZE, help="rows per transaction")
+    p.set_defaults(func=cmd_archive)
+
+    p = commands.add_parser("backfill", help="fill in columns added by a migration now, instead of in the"
+                                             " background while the GUI or server runs")
+    p.add_argument("--chunk-size", type=int, default=TimestampBackfill.CHUNK_SIZE, help="rows per transaction")
+    p.set_defaults(func=cmd_backfill)
+
+    p = commands.add_parser("sync", help="send new and changed visits to a central database")
+    p.add_argument("target", help="central SQLite database file")
+    p.add_argument("--batch-size", type=int, default=Replicator.BATCH_SIZE, help="change-log entries per change set")
+    p.set_defaults(func=cmd_sync)
+
+    args = parser.parse_args(argv)
+    # Date filters only apply as a closed range; one bound alone would be silently ignored
+    if bool(getattr(args, "date_from", None)) != bool(getattr(args, "date_to", None)):
+        parser.error("--from and --to must be given together")
+    try:
+        SiteTime.set_zone(args.timezone)
+    except ValueError as e:
+        parser.error(str(e))
+    DatabaseManager.DB_NAME = args.db
+    if args.no_read_cache:
+        DatabaseManager.set_read_cache(False)
+    if args.diagnostics or args.diagnostics_out:
+        Metrics.enable()
+    try:
+        if args.command is None:
+            # Only the GUI needs tkinter; every other command stays headless
+            from vms_api import ApiClient
+            from vms_app import run_gui
+            run_gui(ApiClient(args.api, token=args.token) if args.api else None)
+            return 0
+        try:
+            if getattr(args, "upgrade", True):
+                DatabaseManager.upgrade()
+            return args.func(args)
+        finally:
+            DatabaseManager.close()
+    finally:
+        if args.diagnostics_out:
+            Metrics.export(args.diagnostics_out)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
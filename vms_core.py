@@ -0,0 +1,3526 @@
+"""Data layer of the Visitor Management System.
+
+Storage, migrations, import/export, reports, archiving and replication.
+Nothing here imports tkinter, so scripts and cron jobs run on machines
+without a display. The GUI lives in vms_app, the HTTP API in vms_api and
+the command line in vms_cli.
+"""
+import bisect
+import collections
+import csv
+import functools
+import io
+import itertools
+import json
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import heapq
+import html
+import types
+import zlib
+
+# ==========================================
+# INSTRUMENTATION
+# ==========================================
+# inspect.CO_GENERATOR; inspect itself costs every command ~10 ms to import
+_CO_GENERATOR = 0x20
+
+
+class Histogram:
+    """Latency histogram with fixed buckets; size does not grow with samples"""
+    # Upper bucket bounds in ms; one more bucket holds anything slower
+    BOUNDS_MS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    __slots__ = ("counts", "total_ms", "max_ms", "rows")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def add(self, ms, rows=None):
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        if rows:
+            self.rows += rows
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket the given fraction of samples falls in"""
+        rank = fraction * sum(self.counts)
+        seen = 0
+        for bound, count in zip(self.BOUNDS_MS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return round(min(bound, self.max_ms), 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self):
+        count = sum(self.counts)
+        return {
+            "count": count,
+            "mean_ms": round(self.total_ms / count, 3) if count else None,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+            "buckets": list(self.counts),
+        }
+
+
+class Metrics:
+    """Opt-in latency recording for database calls, SQL and screen changes.
+
+    Methods wrapped with timed() record wall time and, for list results,
+    row counts. Connections checked out while enabled have trace() as
+    their SQLite trace callback; inside a timed call each statement is
+    timed until the next one starts or the call returns, so fetching its
+    rows is included. While disabled a wrapped call costs one attribute
+    check, statements are not traced, and nothing is recorded.
+    """
+    enabled = False
+    MAX_SERIES = 400   # later distinct statements share one series
+    _lock = threading.Lock()
+    _series = {}
+    _since = None
+    _local = threading.local()
+
+    # Bound values are inlined in traced SQL; fold them back to ?
+    SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    SQL_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+
+    @classmethod
+    def enable(cls, on=True):
+        with cls._lock:
+            cls.enabled = on
+            if cls._since is None:
+                cls._since = datetime.now()
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._series = {}
+            cls._since = datetime.now()
+
+    @classmethod
+    def record(cls, name, ms, rows=None):
+        with cls._lock:
+            histogram = cls._series.get(name)
+            if histogram is None:
+                if len(cls._series) >= cls.MAX_SERIES:
+                    name = "sql: (other)" if name.startswith("sql: ") else "(other)"
+                histogram = cls._series.get(name)
+                if histogram is None:
+                    histogram = cls._series[name] = Histogram()
+            histogram.add(ms, rows)
+
+    @classmethod
+    def normalize(cls, sql):
+        sql = cls.SQL_LISTS.sub("?, …", cls.SQL_LITERALS.sub("?", sql))
+        return " ".join(sql.split())[:160]
+
+    @classmethod
+    def watch(cls, conn):
+        """Install trace() on conn while enabled, remove it otherwise.
+
+        Called on every checkout: the callback runs for each trigger
+        statement too, which on bulk writes costs more than the SQL.
+        """
+        conn.set_trace_callback(cls.trace if cls.enabled else None)
+
+    @classmethod
+    def trace(cls, sql):
+        frames = getattr(cls._local, "frames", None)
+        # "--" statements are FTS5 internals and a repeat is the same
+        # statement entering a trigger; both belong to the running one.
+        if frames and not sql.startswith("--"):
+            statements = frames[-1]
+            if not statements or statements[-1][1] != sql:
+                statements.append((time.perf_counter(), sql))
+
+    @classmethod
+    def _close_statements(cls, statements, end):
+        for i, (started, sql) in enumerate(statements):
+            finished = statements[i + 1][0] if i + 1 < len(statements) else end
+            cls.record("sql: " + cls.normalize(sql), (finished - started) * 1000)
+        statements.clear()
+
+    @classmethod
+    def _timed_iter(cls, name, iterator):
+        started = time.perf_counter()
+        rows = 0
+        try:
+            for item in iterator:
+                rows += len(item) if isinstance(item, list) else 1  # pages count their rows
+                yield item
+        finally:
+            cls.record(name, (time.perf_counter() - started) * 1000, rows)
+
+    @classmethod
+    def timed(cls, name):
+        """Decorator recording each call's latency under `name`.
+
+        Generator functions are timed until exhausted or closed.
+        """
+        def decorate(func):
+            generator = bool(func.__code__.co_flags & _CO_GENERATOR)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not cls.enabled:
+                    return func(*args, **kwargs)
+                if generator:
+                    return cls._timed_iter(name, func(*args, **kwargs))
+
+                frames = getattr(cls._local, "frames", None)
+                if frames is None:
+                    frames = cls._local.frames = []
+                started = time.perf_counter()
+                if frames:
+                    cls._close_statements(frames[-1], started)  # the caller's statement ends here
+                frames.append([])
+                rows = None
+                try:
+                    result = func(*args, **kwargs)
+                    if isinstance(result, list):
+                        rows = len(result)
+                    return result
+                finally:
+                    finished = time.perf_counter()
+                    cls._close_statements(frames.pop(), finished)
+                    cls.record(name, (finished - started) * 1000, rows)
+            return wrapper
+        return decorate
+
+    @classmethod
+    def instrumented(cls, prefix, skip=()):
+        """Class decorator applying timed() to every public method"""
+        def decorate(klass):
+            for attr, member in list(vars(klass).items()):
+                if attr.startswith("_") or attr in skip:
+                    continue
+                name = f"{prefix}.{attr}"
+                if isinstance(member, classmethod):
+                    setattr(klass, attr, classmethod(cls.timed(name)(member.__func__)))
+                elif isinstance(member, staticmethod):
+                    setattr(klass, attr, staticmethod(cls.timed(name)(member.__func__)))
+                elif isinstance(member, types.FunctionType):
+                    setattr(klass, attr, cls.timed(name)(member))
+            return klass
+        return decorate
+
+    @classmethod
+    def snapshot(cls):
+        with cls._lock:
+            series = {name: histogram.to_dict() for name, histogram in sorted(cls._series.items())}
+            since = cls._since
+        return {
+            "enabled": cls.enabled,
+            "since": since.strftime("%Y-%m-%d %H:%M:%S") if since else None,
+            "bucket_bounds_ms": list(Histogram.BOUNDS_MS),
+            "series": series,
+        }
+
+    @classmethod
+    def export(cls, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cls.snapshot(), f, indent=2)
+
+# ==========================================
+# CONNECTION POOL
+# ==========================================
+class ConnectionPool:
+    """Thread-aware pool of long-lived SQLite connections.
+
+    Each thread checks out at most one connection at a time (nested
+    acquires on the same thread get the same connection back), and idle
+    connections are parked for reuse instead of being closed.
+    """
+    # Applied once per physical connection, not per call
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA cache_size = -16000",       # ~16 MB page cache
+        "PRAGMA mmap_size = 268435456",     # 256 MB memory map
+        "PRAGMA busy_timeout = 5000",       # ms to wait on a locked db
+        "PRAGMA temp_store = MEMORY",
+    )
+    # sqlite3 keeps a per-connection LRU of prepared statements keyed by
+    # SQL text; size it so every statement the app issues stays compiled.
+    STATEMENT_CACHE_SIZE = 256
+
+    def __init__(self, db_name, max_idle=4):
+        self.db_name = db_name
+        self.max_idle = max_idle
+        self._idle = []
+        self._all = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def open(cls, db_name):
+        """Open a standalone connection with the pool's settings"""
+        conn = sqlite3.connect(
+            db_name,
+            timeout=5.0,
+            check_same_thread=False,  # a connection may move between threads, never shared
+            cached_statements=cls.STATEMENT_CACHE_SIZE,
+        )
+        for pragma in cls.PRAGMAS:
+            conn.execute(pragma)
+        Metrics.watch(conn)
+        return conn
+
+    def acquire(self):
+        local = self._local
+        if getattr(local, "conn", None) is not None:
+            local.depth += 1
+            return local.conn
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self.open(self.db_name)
+            with self._lock:
+                self._all.add(conn)
+        else:
+            Metrics.watch(conn)
+
+        local.conn = conn
+        local.depth = 1
+        return conn
+
+    def release(self, conn):
+        local = self._local
+        local.depth -= 1
+        if local.depth:
+            return
+        local.conn = None
+
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self._all.discard(conn)
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        with self._lock:
+            conns, self._all, self._idle = self._all, set(), []
+        for conn in conns:
+            conn.close()
+
+# ==========================================
+# WRITE QUEUE
+# ==========================================
+class WriteQueue:
+    """Single writer thread that group-commits queued writes.
+
+    Writes that queue up while a transaction is committing share the next
+    transaction and therefore one fsync. Each write runs in its own SAVEPOINT, so a
+    failing write is rolled back and reported on its own future without
+    affecting the rest of the batch. If the database is locked by another
+    process the whole batch is retried with exponential backoff.
+    """
+    # Extra seconds to linger for more writes. Zero still batches: whatever
+    # queued up during the previous COMMIT goes into the next transaction.
+    BATCH_WINDOW = 0.0
+    MAX_BATCH = 500
+    MAX_RETRIES = 8
+    BACKOFF_START = 0.01    # seconds, doubled on every retry
+    BACKOFF_MAX = 1.0
+    BUSY_TIMEOUT_MS = 250   # short, so our own backoff decides how long to wait
+
+    def __init__(self, db_name, on_commit=None):
+        self.db_name = db_name
+        self.on_commit = on_commit
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="vms-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        """Queue fn(conn, *args); the returned Future resolves after COMMIT"""
+        from concurrent.futures import Future  # ~10 ms to import; read-only commands never need it
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = ConnectionPool.open(self.db_name)
+        conn.isolation_level = None  # transactions are managed explicitly below
+        conn.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS:d}")
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                # Everything that queued up while the previous batch was
+                # committing joins this one; then linger briefly for more.
+                batch, stop = [item], False
+                deadline = time.monotonic() + self.BATCH_WINDOW
+                while len(batch) < self.MAX_BATCH:
+                    try:
+                        remaining = deadline - time.monotonic()
+                        if remaining > 0:
+                            item = self._queue.get(timeout=remaining)
+                        else:
+                            item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _is_busy(error):
+        message = str(error).lower()
+        return "locked" in message or "busy" in message
+
+    @Metrics.timed("writer.commit")
+    def _commit(self, conn, batch):
+        batch = [entry for entry in batch if entry[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        Metrics.watch(conn)
+        delay = self.BACKOFF_START
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                outcomes = self._apply(conn, batch)
+                break
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if not self._is_busy(e) or attempt == self.MAX_RETRIES:
+                    for future, _, _ in batch:
+                        future.set_exception(e)
+                    return
+                time.sleep(delay)
+                delay = min(delay * 2, self.BACKOFF_MAX)
+            except BaseException as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                for future, _, _ in batch:
+                    future.set_exception(e)
+                return
+
+        if self.on_commit:
+            self.on_commit([value for ok, value in outcomes if ok])
+        for (future, _, _), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    @staticmethod
+    def _apply(conn, batch):
+        """Run one batch in a single transaction; returns [(ok, value)]"""
+        outcomes = []
+        conn.execute("BEGIN IMMEDIATE")
+        for _, fn, args in batch:
+            conn.execute("SAVEPOINT write")
+            try:
+                result = fn(conn, *args)
+            except sqlite3.OperationalError as e:
+                if WriteQueue._is_busy(e):
+                    raise  # retry the whole batch
+                conn.execute("ROLLBACK TO write")
+                outcomes.append((False, e))
+            except Exception as e:
+                conn.execute("ROLLBACK TO write")
+                outcomes.append((False, e))
+            else:
+                outcomes.append((True, result))
+            conn.execute("RELEASE write")
+        conn.execute("COMMIT")
+        return outcomes
+
+# ==========================================
+# SITE TIME
+# ==========================================
+# Check-in times are stored in UTC: created_at as SQLite's CURRENT_TIMESTAMP
+# text and, since migration 11, created_ts as epoch seconds. Dates people
+# type and read are in the site's time zone (SiteTime).
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+UTC_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def utc_seconds(value):
+    """Epoch seconds for a stored UTC timestamp; ints and None pass through"""
+    if value is None or isinstance(value, int):
+        return value
+    return (datetime.fromisoformat(value) - _EPOCH) // _SECOND
+
+
+def utc_text(seconds):
+    """Inverse of utc_seconds(): the created_at text for `seconds`"""
+    if seconds is None:
+        return None
+    return (_EPOCH + seconds * _SECOND).strftime(UTC_FORMAT)
+
+
+def epoch_sql(column):
+    """SQL turning a stored UTC timestamp column into epoch seconds"""
+    return f"CAST(strftime('%s', {column}) AS INTEGER)"
+
+
+class SiteTime:
+    """The site's time zone: what "today" and a YYYY-MM-DD filter mean,
+    and how stored times are displayed.
+
+    `zone` is a tzinfo, or None for this machine's local zone. Set it with
+    set_zone() (vms_cli --timezone) when kiosks and the server should
+    agree on a zone other than their own.
+    """
+    zone = None
+    DISPLAY_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    @classmethod
+    def set_zone(cls, name):
+        """Use the IANA zone `name`, e.g. "Europe/London"; empty for the local zone"""
+        if not name:
+            cls.zone = None
+            return
+        from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+        try:
+            cls.zone = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError) as e:
+            # Windows has no zone database of its own; `pip install tzdata` adds one
+            raise ValueError(f"Unknown time zone {name!r}") from e
+
+    @classmethod
+    def today(cls):
+        return datetime.now(cls.zone).strftime("%Y-%m-%d")
+
+    @classmethod
+    def day_start(cls, day):
+        """Epoch seconds of the site's midnight starting `day` (YYYY-MM-DD or a date)"""
+        if isinstance(day, str):
+            day = datetime.strptime(day, "%Y-%m-%d")
+        else:
+            day = datetime(day.year, day.month, day.day)
+        return int(day.replace(tzinfo=cls.zone).timestamp())
+
+    @classmethod
+    def day_range(cls, first, last):
+        """[start, end) epoch seconds covering the site days first..last"""
+        after = datetime.strptime(last, "%Y-%m-%d") + timedelta(days=1)
+        return cls.day_start(first), cls.day_start(after)
+
+    @classmethod
+    def local(cls, seconds):
+        """Naive datetime on the site's wall clock"""
+        return datetime.fromtimestamp(seconds, cls.zone).replace(tzinfo=None)
+
+    @classmethod
+    def format(cls, seconds, fmt=None):
+        """Display text for epoch seconds (or stored UTC text); "" for None"""
+        seconds = utc_seconds(seconds)
+        if seconds is None:
+            return ""
+        return datetime.fromtimestamp(seconds, cls.zone).strftime(fmt or cls.DISPLAY_FORMAT)
+
+# ==========================================
+# SCHEMA MIGRATIONS
+# ==========================================
+# Ordered (version, description, steps). A step is either a SQL statement
+# or a callable taking the connection. The database records the last
+# applied version in PRAGMA user_version. Never edit a released entry;
+# append a new one instead.
+MIGRATIONS = [
+    (1, "create visitors table", [
+        """
+        CREATE TABLE IF NOT EXISTS visitors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fullname TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            address TEXT,
+            meeting_with TEXT,
+            department TEXT,
+            purpose TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (2, "index date filter and lookup columns", [
+        "CREATE INDEX IF NOT EXISTS idx_visitors_created_at ON visitors(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_visitors_department ON visitors(department)",
+        "CREATE INDEX IF NOT EXISTS idx_visitors_meeting_with ON visitors(meeting_with)",
+        "CREATE INDEX IF NOT EXISTS idx_visitors_phone ON visitors(phone)",
+        "ANALYZE visitors",
+    ]),
+    (3, "per-day visitor counters maintained by triggers", [
+        """
+        CREATE TABLE IF NOT EXISTS visitor_counts (
+            bucket TEXT PRIMARY KEY,            -- 'all' or a day as YYYY-MM-DD
+            total INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_counts_ai AFTER INSERT ON visitors BEGIN
+            INSERT INTO visitor_counts (bucket, total) VALUES ('all', 1)
+                ON CONFLICT(bucket) DO UPDATE SET total = total + 1;
+            INSERT INTO visitor_counts (bucket, total)
+                SELECT date(NEW.created_at), 1 WHERE date(NEW.created_at) IS NOT NULL
+                ON CONFLICT(bucket) DO UPDATE SET total = total + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_counts_ad AFTER DELETE ON visitors BEGIN
+            UPDATE visitor_counts SET total = total - 1 WHERE bucket = 'all';
+            UPDATE visitor_counts SET total = total - 1 WHERE bucket = date(OLD.created_at);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_counts_au AFTER UPDATE OF created_at ON visitors
+        WHEN date(OLD.created_at) IS NOT date(NEW.created_at) BEGIN
+            UPDATE visitor_counts SET total = total - 1 WHERE bucket = date(OLD.created_at);
+            INSERT INTO visitor_counts (bucket, total)
+                SELECT date(NEW.created_at), 1 WHERE date(NEW.created_at) IS NOT NULL
+                ON CONFLICT(bucket) DO UPDATE SET total = total + 1;
+        END
+        """,
+        # Seed from the existing history; the triggers keep it current after this
+        "DELETE FROM visitor_counts",
+        "INSERT INTO visitor_counts (bucket, total) SELECT 'all', COUNT(*) FROM visitors",
+        """
+        INSERT INTO visitor_counts (bucket, total)
+        SELECT date(created_at), COUNT(*) FROM visitors
+        WHERE date(created_at) IS NOT NULL
+        GROUP BY date(created_at)
+        """,
+    ]),
+    (4, "full-text search index over visitor details", [
+        # External-content table: the text lives only in visitors, FTS keeps
+        # the inverted index. prefix= adds prefix indexes for type-ahead.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS visitors_fts USING fts5(
+            fullname, email, phone, meeting_with, department, purpose,
+            content='visitors', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_fts_ai AFTER INSERT ON visitors BEGIN
+            INSERT INTO visitors_fts (rowid, fullname, email, phone, meeting_with, department, purpose)
+            VALUES (NEW.id, NEW.fullname, NEW.email, NEW.phone, NEW.meeting_with, NEW.department, NEW.purpose);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_fts_ad AFTER DELETE ON visitors BEGIN
+            INSERT INTO visitors_fts (visitors_fts, rowid, fullname, email, phone, meeting_with, department, purpose)
+            VALUES ('delete', OLD.id, OLD.fullname, OLD.email, OLD.phone, OLD.meeting_with, OLD.department, OLD.purpose);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_fts_au
+        AFTER UPDATE OF fullname, email, phone, meeting_with, department, purpose ON visitors BEGIN
+            INSERT INTO visitors_fts (visitors_fts, rowid, fullname, email, phone, meeting_with, department, purpose)
+            VALUES ('delete', OLD.id, OLD.fullname, OLD.email, OLD.phone, OLD.meeting_with, OLD.department, OLD.purpose);
+            INSERT INTO visitors_fts (rowid, fullname, email, phone, meeting_with, department, purpose)
+            VALUES (NEW.id, NEW.fullname, NEW.email, NEW.phone, NEW.meeting_with, NEW.department, NEW.purpose);
+        END
+        """,
+        "INSERT INTO visitors_fts (visitors_fts) VALUES ('rebuild')",
+    ]),
+    (5, "check-out tracking", [
+        "ALTER TABLE visitors ADD COLUMN checked_out_at TIMESTAMP",
+        # Visits logged before check-out existed are closed at check-in time,
+        # except today's, which may genuinely still be on site.
+        """
+        UPDATE visitors SET checked_out_at = created_at
+        WHERE checked_out_at IS NULL AND created_at < date('now', 'localtime')
+        """,
+        # Only the handful of rows still on site are in this index
+        "CREATE INDEX IF NOT EXISTS idx_visitors_on_site ON visitors(created_at) WHERE checked_out_at IS NULL",
+    ]),
+    (6, "updated_at column and change log", [
+        "ALTER TABLE visitors ADD COLUMN updated_at TIMESTAMP",
+        "UPDATE visitors SET updated_at = COALESCE(checked_out_at, created_at)",
+        # One row per insert/update/delete; version only ever grows, so a
+        # reader can ask for everything after the last version it saw.
+        """
+        CREATE TABLE IF NOT EXISTS visitor_changes (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            visitor_id INTEGER NOT NULL,
+            op TEXT NOT NULL                    -- 'I', 'U' or 'D'
+        )
+        """,
+        # ALTER TABLE cannot add a CURRENT_TIMESTAMP default, so updated_at
+        # is stamped here. The other AFTER UPDATE triggers are limited to
+        # their own columns and do not fire for the updated_at write.
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_changes_ai AFTER INSERT ON visitors BEGIN
+            UPDATE visitors SET updated_at = NEW.created_at WHERE id = NEW.id AND NEW.updated_at IS NULL;
+            INSERT INTO visitor_changes (visitor_id, op) VALUES (NEW.id, 'I');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_changes_au AFTER UPDATE ON visitors
+        WHEN OLD.updated_at IS NOT NULL BEGIN
+            UPDATE visitors SET updated_at = CURRENT_TIMESTAMP
+                WHERE id = NEW.id AND NEW.updated_at IS OLD.updated_at;
+            INSERT INTO visitor_changes (visitor_id, op) VALUES (NEW.id, 'U');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_changes_ad AFTER DELETE ON visitors BEGIN
+            INSERT INTO visitor_changes (visitor_id, op) VALUES (OLD.id, 'D');
+        END
+        """,
+    ]),
+    (7, "hourly traffic rollups by department and host", [
+        # visitor_rollups is the hour x department x host grain. The hourly
+        # and monthly tables are coarser copies kept alongside it so a long
+        # range reads a few thousand rows whatever the traffic.
+        """
+        CREATE TABLE IF NOT EXISTS visitor_rollups (
+            hour TEXT NOT NULL,                 -- check-in hour as YYYY-MM-DD HH:00:00
+            department TEXT NOT NULL,           -- '' when not recorded
+            host TEXT NOT NULL,                 -- meeting_with, '' when not recorded
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, department, host)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS visitor_rollups_hourly (
+            hour TEXT PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS visitor_rollups_monthly (
+            month TEXT NOT NULL,                -- YYYY-MM
+            department TEXT NOT NULL,
+            host TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, department, host)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_rollups_ai AFTER INSERT ON visitors
+        WHEN NEW.created_at IS NOT NULL BEGIN
+            INSERT INTO visitor_rollups (hour, department, host, total)
+            VALUES (strftime('%Y-%m-%d %H:00:00', NEW.created_at),
+                    COALESCE(NEW.department, ''), COALESCE(NEW.meeting_with, ''), 1)
+                ON CONFLICT(hour, department, host) DO UPDATE SET total = total + 1;
+            INSERT INTO visitor_rollups_hourly (hour, total)
+            VALUES (strftime('%Y-%m-%d %H:00:00', NEW.created_at), 1)
+                ON CONFLICT(hour) DO UPDATE SET total = total + 1;
+            INSERT INTO visitor_rollups_monthly (month, department, host, total)
+            VALUES (strftime('%Y-%m', NEW.created_at),
+                    COALESCE(NEW.department, ''), COALESCE(NEW.meeting_with, ''), 1)
+                ON CONFLICT(month, department, host) DO UPDATE SET total = total + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_rollups_ad AFTER DELETE ON visitors
+        WHEN OLD.created_at IS NOT NULL BEGIN
+            UPDATE visitor_rollups SET total = total - 1
+            WHERE hour = strftime('%Y-%m-%d %H:00:00', OLD.created_at)
+              AND department = COALESCE(OLD.department, '') AND host = COALESCE(OLD.meeting_with, '');
+            UPDATE visitor_rollups_hourly SET total = total - 1
+            WHERE hour = strftime('%Y-%m-%d %H:00:00', OLD.created_at);
+            UPDATE visitor_rollups_monthly SET total = total - 1
+            WHERE month = strftime('%Y-%m', OLD.created_at)
+              AND department = COALESCE(OLD.department, '') AND host = COALESCE(OLD.meeting_with, '');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_rollups_au
+        AFTER UPDATE OF created_at, department, meeting_with ON visitors
+        WHEN strftime('%Y-%m-%d %H', OLD.created_at) IS NOT strftime('%Y-%m-%d %H', NEW.created_at)
+          OR OLD.department IS NOT NEW.department OR OLD.meeting_with IS NOT NEW.meeting_with BEGIN
+            UPDATE visitor_rollups SET total = total - 1
+            WHERE hour = strftime('%Y-%m-%d %H:00:00', OLD.created_at)
+              AND department = COALESCE(OLD.department, '') AND host = COALESCE(OLD.meeting_with, '');
+            UPDATE visitor_rollups_hourly SET total = total - 1
+            WHERE hour = strftime('%Y-%m-%d %H:00:00', OLD.created_at);
+            UPDATE visitor_rollups_monthly SET total = total - 1
+            WHERE month = strftime('%Y-%m', OLD.created_at)
+              AND department = COALESCE(OLD.department, '') AND host = COALESCE(OLD.meeting_with, '');
+            INSERT INTO visitor_rollups (hour, department, host, total)
+            SELECT strftime('%Y-%m-%d %H:00:00', NEW.created_at),
+                   COALESCE(NEW.department, ''), COALESCE(NEW.meeting_with, ''), 1
+            WHERE NEW.created_at IS NOT NULL
+                ON CONFLICT(hour, department, host) DO UPDATE SET total = total + 1;
+            INSERT INTO visitor_rollups_hourly (hour, total)
+            SELECT strftime('%Y-%m-%d %H:00:00', NEW.created_at), 1
+            WHERE NEW.created_at IS NOT NULL
+                ON CONFLICT(hour) DO UPDATE SET total = total + 1;
+            INSERT INTO visitor_rollups_monthly (month, department, host, total)
+            SELECT strftime('%Y-%m', NEW.created_at),
+                   COALESCE(NEW.department, ''), COALESCE(NEW.meeting_with, ''), 1
+            WHERE NEW.created_at IS NOT NULL
+                ON CONFLICT(month, department, host) DO UPDATE SET total = total + 1;
+        END
+        """,
+        lambda conn: VisitorReports.rebuild_rollups(conn),
+    ]),
+    (8, "monthly archive bookkeeping", [
+        """
+        CREATE TABLE IF NOT EXISTS visitor_archives (
+            month TEXT PRIMARY KEY,             -- YYYY-MM held by the file
+            file TEXT NOT NULL,                 -- name inside the archive directory
+            total INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        # Holds a row only inside the archiver's delete transaction. Moving a
+        # visit to an archive is not a deletion: counters, rollups and the
+        # change log must not see it.
+        "CREATE TABLE IF NOT EXISTS visitor_archiving (active INTEGER NOT NULL)",
+        "DROP TRIGGER IF EXISTS visitors_counts_ad",
+        """
+        CREATE TRIGGER visitors_counts_ad AFTER DELETE ON visitors
+        WHEN NOT EXISTS (SELECT 1 FROM visitor_archiving) BEGIN
+            UPDATE visitor_counts SET total = total - 1 WHERE bucket = 'all';
+            UPDATE visitor_counts SET total = total - 1 WHERE bucket = date(OLD.created_at);
+        END
+        """,
+        "DROP TRIGGER IF EXISTS visitors_rollups_ad",
+        """
+        CREATE TRIGGER visitors_rollups_ad AFTER DELETE ON visitors
+        WHEN OLD.created_at IS NOT NULL AND NOT EXISTS (SELECT 1 FROM visitor_archiving) BEGIN
+            UPDATE visitor_rollups SET total = total - 1
+            WHERE hour = strftime('%Y-%m-%d %H:00:00', OLD.created_at)
+              AND department = COALESCE(OLD.department, '') AND host = COALESCE(OLD.meeting_with, '');
+            UPDATE visitor_rollups_hourly SET total = total - 1
+            WHERE hour = strftime('%Y-%m-%d %H:00:00', OLD.created_at);
+            UPDATE visitor_rollups_monthly SET total = total - 1
+            WHERE month = strftime('%Y-%m', OLD.created_at)
+              AND department = COALESCE(OLD.department, '') AND host = COALESCE(OLD.meeting_with, '');
+        END
+        """,
+        "DROP TRIGGER IF EXISTS visitors_changes_ad",
+        """
+        CREATE TRIGGER visitors_changes_ad AFTER DELETE ON visitors
+        WHEN NOT EXISTS (SELECT 1 FROM visitor_archiving) BEGIN
+            INSERT INTO visitor_changes (visitor_id, op) VALUES (OLD.id, 'D');
+        END
+        """,
+    ]),
+    (9, "replication identity and change sets", [
+        # One random id per database file, stamped on the visits it creates
+        "CREATE TABLE IF NOT EXISTS replication_site (site_id TEXT NOT NULL)",
+        """
+        INSERT INTO replication_site (site_id)
+        SELECT lower(hex(randomblob(16))) WHERE NOT EXISTS (SELECT 1 FROM replication_site)
+        """,
+        # Dropped before the backfill so it is not logged or re-stamped
+        "DROP TRIGGER IF EXISTS visitors_changes_ai",
+        "DROP TRIGGER IF EXISTS visitors_changes_au",
+        "DROP TRIGGER IF EXISTS visitors_changes_ad",
+        # Row ids are per file; uuid identifies a visit across sites
+        "ALTER TABLE visitors ADD COLUMN uuid TEXT",
+        "ALTER TABLE visitors ADD COLUMN site_id TEXT",
+        "UPDATE visitors SET uuid = lower(hex(randomblob(16))), site_id = (SELECT site_id FROM replication_site)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_visitors_uuid ON visitors(uuid)",
+        "ALTER TABLE visitor_changes ADD COLUMN uuid TEXT",
+        "ALTER TABLE visitor_changes ADD COLUMN changed_at TIMESTAMP",
+        # Source side: the last change sequence each target acknowledged.
+        # The change log is never trimmed past it.
+        """
+        CREATE TABLE IF NOT EXISTS replication_peers (
+            peer TEXT PRIMARY KEY,              -- the target's site_id
+            acked_seq INTEGER NOT NULL,
+            synced_at TIMESTAMP
+        ) WITHOUT ROWID
+        """,
+        # Target side: the last change sequence applied from each source
+        """
+        CREATE TABLE IF NOT EXISTS replication_inbox (
+            site_id TEXT PRIMARY KEY,
+            applied_seq INTEGER NOT NULL,
+            synced_at TIMESTAMP
+        ) WITHOUT ROWID
+        """,
+        # Target side: deleted visits, so a late update cannot resurrect them
+        """
+        CREATE TABLE IF NOT EXISTS replication_tombstones (
+            uuid TEXT PRIMARY KEY,
+            deleted_at TIMESTAMP NOT NULL
+        ) WITHOUT ROWID
+        """,
+        # Holds a row while a change set is applied; replicated rows keep
+        # the updated_at they were shipped with.
+        "CREATE TABLE IF NOT EXISTS replication_applying (active INTEGER NOT NULL)",
+        """
+        CREATE TRIGGER visitors_changes_ai AFTER INSERT ON visitors BEGIN
+            UPDATE visitors SET updated_at = COALESCE(NEW.updated_at, NEW.created_at),
+                                uuid = COALESCE(NEW.uuid, lower(hex(randomblob(16)))),
+                                site_id = COALESCE(NEW.site_id, (SELECT site_id FROM replication_site))
+                WHERE id = NEW.id AND (NEW.updated_at IS NULL OR NEW.uuid IS NULL OR NEW.site_id IS NULL);
+            INSERT INTO visitor_changes (visitor_id, op, uuid, changed_at)
+                SELECT NEW.id, 'I', uuid, CURRENT_TIMESTAMP FROM visitors WHERE id = NEW.id;
+        END
+        """,
+        # OLD.uuid is NULL only for the insert trigger's own stamping update
+        """
+        CREATE TRIGGER visitors_changes_au AFTER UPDATE ON visitors
+        WHEN OLD.updated_at IS NOT NULL AND OLD.uuid IS NOT NULL BEGIN
+            UPDATE visitors SET updated_at = CURRENT_TIMESTAMP
+                WHERE id = NEW.id AND NEW.updated_at IS OLD.updated_at
+                  AND NOT EXISTS (SELECT 1 FROM replication_applying);
+            INSERT INTO visitor_changes (visitor_id, op, uuid, changed_at)
+                VALUES (NEW.id, 'U', NEW.uuid, CURRENT_TIMESTAMP);
+        END
+        """,
+        """
+        CREATE TRIGGER visitors_changes_ad AFTER DELETE ON visitors
+        WHEN NOT EXISTS (SELECT 1 FROM visitor_archiving) BEGIN
+            INSERT INTO visitor_changes (visitor_id, op, uuid, changed_at)
+                VALUES (OLD.id, 'D', OLD.uuid, CURRENT_TIMESTAMP);
+        END
+        """,
+    ]),
+    (10, "normalized phone and email for returning-visitor lookup", [
+        # Virtual generated columns: computed on read, so every insert and
+        # update path keeps them right without triggers, and only the
+        # indexes below store them. normalize_phone() and normalize_email()
+        # must produce the same values.
+        """
+        ALTER TABLE visitors ADD COLUMN phone_norm TEXT GENERATED ALWAYS AS (
+            NULLIF(replace(replace(replace(replace(replace(replace(replace(
+                phone, ' ', ''), '-', ''), '(', ''), ')', ''), '.', ''), '+', ''), '/', ''), '')
+        ) VIRTUAL
+        """,
+        "ALTER TABLE visitors ADD COLUMN email_norm TEXT GENERATED ALWAYS AS (NULLIF(lower(trim(email)), '')) VIRTUAL",
+        # (key, created_at) answers "latest visit for this key" with one index probe
+        """
+        CREATE INDEX IF NOT EXISTS idx_visitors_phone_norm ON visitors(phone_norm, created_at)
+        WHERE phone_norm IS NOT NULL
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_visitors_email_norm ON visitors(email_norm, created_at)
+        WHERE email_norm IS NOT NULL
+        """,
+    ]),
+    (11, "integer UTC check-in time", [
+        # created_ts is created_at as UTC epoch seconds: a compact key for
+        # range scans and ordering. Existing rows are filled in by
+        # TimestampBackfill in the background, not here, so a large file
+        # does not hold up startup; the cursor below tracks its progress.
+        "ALTER TABLE visitors ADD COLUMN created_ts INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_visitors_created_ts ON visitors(created_ts)",
+        """
+        CREATE TABLE IF NOT EXISTS visitor_backfill (
+            name TEXT PRIMARY KEY,              -- the column being filled in
+            next_id INTEGER NOT NULL            -- rows up to this id are done
+        ) WITHOUT ROWID
+        """,
+        "INSERT OR IGNORE INTO visitor_backfill (name, next_id) VALUES ('created_ts', 0)",
+        # Inserts that do not set created_ts (replication, older code) and
+        # edits of created_at keep it in step
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_created_ts_ai AFTER INSERT ON visitors
+        WHEN NEW.created_ts IS NULL BEGIN
+            UPDATE visitors SET created_ts = CAST(strftime('%s', NEW.created_at) AS INTEGER) WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_created_ts_au AFTER UPDATE OF created_at ON visitors BEGIN
+            UPDATE visitors SET created_ts = CAST(strftime('%s', NEW.created_at) AS INTEGER) WHERE id = NEW.id;
+        END
+        """,
+        # Writes to created_ts alone are bookkeeping, not edits: keep them
+        # out of updated_at and the change log. Every other column is listed.
+        "DROP TRIGGER IF EXISTS visitors_changes_au",
+        """
+        CREATE TRIGGER visitors_changes_au
+        AFTER UPDATE OF fullname, email, phone, address, meeting_with, department, purpose, created_at,
+                        checked_out_at, updated_at, uuid, site_id ON visitors
+        WHEN OLD.updated_at IS NOT NULL AND OLD.uuid IS NOT NULL BEGIN
+            UPDATE visitors SET updated_at = CURRENT_TIMESTAMP
+                WHERE id = NEW.id AND NEW.updated_at IS OLD.updated_at
+                  AND NOT EXISTS (SELECT 1 FROM replication_applying);
+            INSERT INTO visitor_changes (visitor_id, op, uuid, changed_at)
+                VALUES (NEW.id, 'U', NEW.uuid, CURRENT_TIMESTAMP);
+        END
+        """,
+        # visitor_counts keeps only the 'all' total: the per-day buckets
+        # were UTC days while "today" is the site's, and get_stats() now
+        # counts today on the time index instead.
+        "DROP TRIGGER IF EXISTS visitors_counts_ai",
+        "DROP TRIGGER IF EXISTS visitors_counts_ad",
+        "DROP TRIGGER IF EXISTS visitors_counts_au",
+        """
+        CREATE TRIGGER visitors_counts_ai AFTER INSERT ON visitors BEGIN
+            INSERT INTO visitor_counts (bucket, total) VALUES ('all', 1)
+                ON CONFLICT(bucket) DO UPDATE SET total = total + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER visitors_counts_ad AFTER DELETE ON visitors
+        WHEN NOT EXISTS (SELECT 1 FROM visitor_archiving) BEGIN
+            UPDATE visitor_counts SET total = total - 1 WHERE bucket = 'all';
+        END
+        """,
+        "DELETE FROM visitor_counts WHERE bucket <> 'all'",
+    ]),
+    (12, "email_norm trims the same whitespace as normalize_email()", [
+        # Plain trim() only strips spaces, so a pasted "a@b.com\t" never
+        # matched its key. The indexed column has to go before it can be
+        # dropped and added back.
+        "DROP INDEX IF EXISTS idx_visitors_email_norm",
+        "ALTER TABLE visitors DROP COLUMN email_norm",
+        """
+        ALTER TABLE visitors ADD COLUMN email_norm TEXT GENERATED ALWAYS AS (
+            NULLIF(lower(trim(email, ' ' || char(9) || char(10) || char(13))), '')
+        ) VIRTUAL
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_visitors_email_norm ON visitors(email_norm, created_at)
+        WHERE email_norm IS NOT NULL
+        """,
+    ]),
+    (13, "check-in counters per UTC quarter hour", [
+        # The per-day buckets dropped in 11 were UTC days. Triggers cannot
+        # know the site's zone, but every zone's midnight falls on a quarter
+        # hour, so get_stats() sums the site's day out of these.
+        """
+        CREATE TABLE IF NOT EXISTS visitor_quarter_counts (
+            quarter INTEGER PRIMARY KEY,        -- UTC epoch seconds // 900
+            total INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_quarters_ai AFTER INSERT ON visitors
+        WHEN strftime('%s', NEW.created_at) IS NOT NULL BEGIN
+            INSERT INTO visitor_quarter_counts (quarter, total)
+                VALUES (CAST(strftime('%s', NEW.created_at) AS INTEGER) / 900, 1)
+                ON CONFLICT(quarter) DO UPDATE SET total = total + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_quarters_ad AFTER DELETE ON visitors
+        WHEN strftime('%s', OLD.created_at) IS NOT NULL AND NOT EXISTS (SELECT 1 FROM visitor_archiving) BEGIN
+            UPDATE visitor_quarter_counts SET total = total - 1
+            WHERE quarter = CAST(strftime('%s', OLD.created_at) AS INTEGER) / 900;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS visitors_quarters_au AFTER UPDATE OF created_at ON visitors
+        WHEN strftime('%s', OLD.created_at) IS NOT strftime('%s', NEW.created_at) BEGIN
+            UPDATE visitor_quarter_counts SET total = total - 1
+            WHERE quarter = CAST(strftime('%s', OLD.created_at) AS INTEGER) / 900;
+            INSERT INTO visitor_quarter_counts (quarter, total)
+                SELECT CAST(strftime('%s', NEW.created_at) AS INTEGER) / 900, 1
+                WHERE strftime('%s', NEW.created_at) IS NOT NULL
+                ON CONFLICT(quarter) DO UPDATE SET total = total + 1;
+        END
+        """,
+        "DELETE FROM visitor_quarter_counts",
+        """
+        INSERT INTO visitor_quarter_counts (quarter, total)
+        SELECT CAST(strftime('%s', created_at) AS INTEGER) / 900, COUNT(*) FROM visitors
+        WHERE strftime('%s', created_at) IS NOT NULL
+        GROUP BY 1
+        """,
+    ]),
+    (14, "remember indexes and triggers a bulk import has dropped", [
+        # Written in the same transaction as the drops, so an import that
+        # dies midway leaves the list for upgrade() to restore from
+        """
+        CREATE TABLE IF NOT EXISTS visitor_deferred (
+            name TEXT PRIMARY KEY,
+            type TEXT NOT NULL,                 -- 'index' or 'trigger'
+            sql TEXT NOT NULL,
+            last_id INTEGER NOT NULL            -- rows above this id skipped the triggers
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (15, "split migration 5's visits on the site's midnight", [
+        # Migration 5 compared the UTC created_at with the machine's local
+        # date, so depending on the offset it closed some of today's visits
+        # or left some of yesterday's open. The visits it saw are the ones
+        # the change log (started in 6) has never mentioned; within the
+        # window between the two midnights, put them on the right side.
+        lambda conn: conn.execute("""
+            UPDATE visitors SET checked_out_at = NULL
+            WHERE checked_out_at = created_at AND created_at >= ? AND created_at < date('now', 'localtime')
+              AND NOT EXISTS (SELECT 1 FROM visitor_changes WHERE visitor_id = visitors.id)
+        """, (utc_text(SiteTime.day_start(SiteTime.today())),)),
+        lambda conn: conn.execute("""
+            UPDATE visitors SET checked_out_at = created_at
+            WHERE checked_out_at IS NULL AND created_at >= date('now', 'localtime') AND created_at < ?
+              AND NOT EXISTS (SELECT 1 FROM visitor_changes WHERE visitor_id = visitors.id)
+        """, (utc_text(SiteTime.day_start(SiteTime.today())),)),
+    ]),
+]
+
+# Oldest SQLite a migration runs on, where it needs more than the
+# generated columns of migration 10 (3.31): 12 uses ALTER TABLE ... DROP
+# COLUMN. DatabaseManager.migrate() checks before starting one.
+MIGRATION_SQLITE = {12: (3, 35, 0)}
+
+# Python side of the phone_norm/email_norm columns in migrations 10 and 12
+PHONE_PUNCTUATION = str.maketrans("", "", " -().+/")
+EMAIL_WHITESPACE = " \t\n\r"  # what trim() strips in email_norm
+# SQLite's lower() only folds ASCII letters
+ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+MIN_PHONE_DIGITS = 7
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+
+def normalize_phone(value):
+    """phone_norm for `value`, or None while too short to identify anyone"""
+    phone = (value or "").translate(PHONE_PUNCTUATION)
+    return phone if sum(ch.isdigit() for ch in phone) >= MIN_PHONE_DIGITS else None
+
+
+def normalize_email(value):
+    """email_norm for `value`, or None until it looks like a full address"""
+    email = (value or "").strip(EMAIL_WHITESPACE).translate(ASCII_LOWER)
+    return email if EMAIL_PATTERN.fullmatch(email) else None
+
+# ==========================================
+# ACTIVE VISITORS
+# ==========================================
+class ActiveVisitors:
+    """In-memory set of visitors currently on site.
+
+    Seeded from the on-site partial index, then kept current by the write
+    paths, so occupancy and the rollcall list never touch history. Commits
+    by other connections are caught up with on read (see
+    DatabaseManager._sync_active_visitors). Rows are (id, fullname,
+    meeting_with, department, created_at), the check-in time as UTC epoch
+    seconds.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self._rows = {}
+        self.synced = None  # (data_version, change version) the rows reflect
+
+    def reload(self, load_rows):
+        """Replace the contents with load_rows().
+
+        The lock is held while loading, so apply() calls racing with the
+        reload wait and are replayed on top of it rather than lost.
+        """
+        with self._lock:
+            self._rows = {row[0]: tuple(row) for row in load_rows()}
+
+    def refresh(self, ids, load_rows):
+        """Re-read visitors `ids`: load_rows() returns those still on site.
+
+        Holds the lock while loading, as reload() does.
+        """
+        with self._lock:
+            rows = {row[0]: tuple(row) for row in load_rows()}
+            for visitor_id in ids:
+                if visitor_id in rows:
+                    self._rows[visitor_id] = rows[visitor_id]
+                else:
+                    self._rows.pop(visitor_id, None)
+
+    def apply(self, visitor_id, row):
+        """Record the latest state of one visitor: on-site row, or None"""
+        self.apply_many([(visitor_id, row)])
+
+    def apply_many(self, changes):
+        """apply() for many (visitor_id, row) pairs under one lock"""
+        with self._lock:
+            for visitor_id, row in changes:
+                if row is None:
+                    self._rows.pop(visitor_id, None)
+                else:
+                    self._rows[visitor_id] = tuple(row)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def snapshot(self):
+        """Rows ordered by arrival time, oldest first"""
+        with self._lock:
+            rows = list(self._rows.values())
+        return sorted(rows, key=lambda row: (row[4] or 0, row[0]))
+
+# ==========================================
+# READ CACHE
+# ==========================================
+def approx_size(value, sample=16):
+    """Rough deep size in bytes of a query result (nested lists, tuples,
+    dicts and scalars). Long sequences are extrapolated from `sample`
+    evenly spaced items, so sizing a big result stays cheap."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        items = [*value.keys(), *value.values()]
+    elif isinstance(value, (list, tuple)):
+        items = value
+    else:
+        return size
+    if len(items) > sample:
+        picked = items[::len(items) // sample][:sample]
+        return size + sum(approx_size(item, sample) for item in picked) * len(items) // len(picked)
+    return size + sum(approx_size(item, sample) for item in items)
+
+
+class LRUCache:
+    """Thread-safe mapping that forgets the least recently used entries.
+
+    Bounded by `maxsize` entries and, if `max_bytes` is set, by the
+    approx_size() of the cached values. `epoch` moves on every
+    invalidation: a reader notes it before querying and passes it to
+    put(), which drops the value if the data changed in the meantime.
+    While `enabled` is False every get() misses and put() stores nothing.
+    """
+
+    def __init__(self, maxsize, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.epoch = 0
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> (value, size)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key) if self.enabled else None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, epoch=None):
+        if not self.enabled:
+            return
+        size = approx_size(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return  # would evict everything else and still not fit
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while len(self._entries) > self.maxsize or (self.max_bytes and self.bytes > self.max_bytes):
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self.bytes -= dropped
+                self.evictions += 1
+
+    def discard(self, keys):
+        """Forget the entries for `keys`"""
+        with self._lock:
+            self.epoch += 1
+            for key in keys:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self.bytes -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.maxsize,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+# ==========================================
+# DATABASE MANAGER
+# ==========================================
+@Metrics.instrumented("db", skip=("connection", "pool", "writer"))
+class DatabaseManager:
+    """Handles all database interactions"""
+    DB_NAME = "vms.db"
+    PAGE_SIZE = 200
+    SEARCH_LIMIT = 50
+    _pool = None
+    _writer = None
+    _active = None
+    _monitor = None         # (db_name, connection) polled by data_version()
+    _pool_lock = threading.Lock()
+    _active_lock = threading.Lock()
+
+    # SQL is kept in one place so every call reuses the same text and
+    # therefore the same cached prepared statement.
+    # 'now' is fixed for the whole statement, so created_ts matches the
+    # created_at default exactly
+    SQL_INSERT = """
+        INSERT INTO visitors (fullname, email, phone, address, meeting_with, department, purpose, created_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER))
+    """
+    SQL_UPDATE = """
+        UPDATE visitors 
+        SET fullname=?, email=?, phone=?, address=?, meeting_with=?, department=?, purpose=?
+        WHERE id=?
+    """
+    SQL_DELETE = "DELETE FROM visitors WHERE id = ?"
+    # List rows carry both times as UTC epoch seconds. Hot rows read the
+    # check-in from created_ts, converting the text only for rows the
+    # backfill has not reached; archive files may predate created_ts, so
+    # their rows always convert.
+    CREATED_TS = f"COALESCE(created_ts, {epoch_sql('created_at')})"
+    LIST_COLUMNS = f"id, fullname, email, phone, {CREATED_TS}, meeting_with, department, {epoch_sql('checked_out_at')}"
+    ARCHIVE_LIST_COLUMNS = (f"id, fullname, email, phone, {epoch_sql('created_at')}, meeting_with, department,"
+                            f" {epoch_sql('checked_out_at')}")
+    SQL_LIST = f"SELECT {LIST_COLUMNS} FROM visitors"
+    SQL_BY_ID = "SELECT * FROM visitors WHERE id = ?"
+    SQL_COUNT_ALL = "SELECT COUNT(*) FROM visitors"
+    # The trigger-maintained total, and today's check-ins summed from the
+    # quarter-hour counters covering the site's day
+    SQL_STATS = "SELECT total FROM visitor_counts WHERE bucket = 'all'"
+    COUNT_QUARTER = 900     # seconds per visitor_quarter_counts bucket
+    SQL_COUNT_QUARTERS = "SELECT COALESCE(SUM(total), 0) FROM visitor_quarter_counts WHERE quarter >= ? AND quarter < ?"
+
+    # get_stats() result cache: (write generation, local day, expiry, stats).
+    # Our own writes bump the generation; the TTL bounds how stale the
+    # numbers can get when another kiosk writes to the same file.
+    STATS_CACHE_TTL = 5.0
+    _stats_cache = None
+    _write_generation = 0
+    # Read cache. Record lookups are keyed by id and dropped one by one
+    # when that visitor changes; list pages, counts and lookups by value
+    # can depend on any row and are dropped on every write. Our own
+    # writes invalidate as they commit; commits by other connections are
+    # noticed through PRAGMA data_version and mapped to ids via the change
+    # log (see _sync_read_cache).
+    RECORD_CACHE_SIZE = 4096
+    QUERY_CACHE_SIZE = 512
+    QUERY_CACHE_BYTES = 32 * 1024 * 1024
+    _records = LRUCache(RECORD_CACHE_SIZE)
+    _queries = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_BYTES)
+    _cache_sync = None      # (db_name, data_version, change version) the caches reflect
+    _MISSING = object()
+    _created_ts_ready = None  # DB_NAME once its created_ts backfill is known to be done
+
+    @classmethod
+    def pool(cls):
+        """Return the shared pool, (re)creating it if DB_NAME changed"""
+        with cls._pool_lock:
+            if cls._pool is None or cls._pool.db_name != cls.DB_NAME:
+                if cls._pool is not None:
+                    cls._pool.close_all()
+                cls._pool = ConnectionPool(cls.DB_NAME)
+            return cls._pool
+
+    @classmethod
+    def connection(cls):
+        return cls.pool().connection()
+
+    @classmethod
+    def writer(cls):
+        """Return the shared WriteQueue for DB_NAME"""
+        with cls._pool_lock:
+            if cls._writer is None or cls._writer.db_name != cls.DB_NAME:
+                if cls._writer is not None:
+                    cls._writer.close()
+                cls._writer = WriteQueue(cls.DB_NAME, on_commit=cls._on_commit)
+            return cls._writer
+
+    @classmethod
+    def close(cls):
+        with cls._pool_lock:
+            if cls._writer is not None:
+                cls._writer.close()
+                cls._writer = None
+            if cls._pool is not None:
+                cls._pool.close_all()
+                cls._pool = None
+            if cls._monitor is not None:
+                cls._monitor[1].close()
+                cls._monitor = None
+        TimestampBackfill.stop()
+        cls._created_ts_ready = None
+
+    @staticmethod
+    def _visitor_params(data):
+        return (data['fullname'], data['email'], data['phone'], data['address'], 
+                data['meeting_with'], data['department'], data['purpose'])
+
+    @staticmethod
+    def validate_visitor(data):
+        """Return an error message if `data` cannot be saved, else None"""
+        if not data.get('fullname') or not data.get('phone'):
+            return "Full Name and Phone are required."
+        return None
+
+    @classmethod
+    def upgrade(cls):
+        """Create or migrate the schema, raising on failure"""
+        with cls.connection() as conn:
+            applied = cls.migrate(conn)
+            cls._restore_deferred(conn)
+            with conn:
+                conn.execute(cls.SQL_PRUNE_CHANGES, (cls.CHANGE_LOG_KEEP,))
+            return applied
+
+    @classmethod
+    def init_db(cls):
+        """Startup hook shared with ApiClient; raises if the schema cannot be brought up to date"""
+        cls.upgrade()
+        TimestampBackfill.start()
+
+    @staticmethod
+    def schema_version(conn):
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    @classmethod
+    def migrate(cls, conn):
+        """Bring the schema up to the latest version in MIGRATIONS.
+
+        Each migration runs in its own write transaction together with the
+        user_version bump, so a crash leaves the file at a clean version
+        and two kiosks starting at once cannot apply the same step twice.
+        """
+        applied = []
+        for version, description, steps in MIGRATIONS:
+            if cls.schema_version(conn) >= version:
+                continue
+            needed = MIGRATION_SQLITE.get(version)
+            if needed and sqlite3.sqlite_version_info < needed:
+                raise sqlite3.NotSupportedError(
+                    f"Schema version {version} ({description}) needs SQLite {'.'.join(map(str, needed))}"
+                    f" or later; this Python has {sqlite3.sqlite_version}")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-check under the write lock; another process may have won
+                if cls.schema_version(conn) < version:
+                    for step in steps:
+                        if callable(step):
+                            step(conn)
+                        else:
+                            conn.execute(step)
+                    conn.execute(f"PRAGMA user_version = {version:d}")
+                    applied.append(version)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if applied:
+            conn.execute("PRAGMA optimize")
+        return applied
+
+    @classmethod
+    def file_size(cls):
+        """Bytes on disk for DB_NAME including its write-ahead log"""
+        return sum(os.path.getsize(path) for path in (cls.DB_NAME, cls.DB_NAME + "-wal") if os.path.exists(path))
+
+    @classmethod
+    def vacuum(cls):
+        """Rewrite the file without free pages; returns (bytes_before, bytes_after)"""
+        before = cls.file_size()
+        with cls.connection() as conn:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA optimize")
+        return before, cls.file_size()
+
+    @classmethod
+    def integrity_check(cls, quick=False):
+        """Return a list of problems found, empty when the database is sound.
+
+        Besides SQLite's own check this verifies the full-text index and
+        that the trigger-maintained total still matches the visitors held
+        here and in the archives.
+        """
+        with cls.connection() as conn:
+            pragma = "quick_check" if quick else "integrity_check"
+            problems = [row[0] for row in conn.execute(f"PRAGMA {pragma}") if row[0] != "ok"]
+            if problems or quick:
+                return problems
+            try:
+                conn.execute("INSERT INTO visitors_fts (visitors_fts) VALUES ('integrity-check')")
+            except sqlite3.DatabaseError as e:
+                problems.append(f"visitors_fts: {e}")
+            finally:
+                conn.rollback()
+            counted = conn.execute("SELECT total FROM visitor_counts WHERE bucket = 'all'").fetchone()
+            held = conn.execute(cls.SQL_COUNT_ALL).fetchone()[0] + conn.execute(cls.SQL_ARCHIVED_TOTAL).fetchone()[0]
+            if (counted[0] if counted else 0) != held:
+                problems.append(f"visitor_counts: total is {counted[0] if counted else 0:,}, tables hold {held:,}")
+        return problems
+
+    # Imported visits are history: without an explicit checked_out_at they
+    # are closed at their check-in time rather than counted as on site.
+    SQL_IMPORT = """
+        INSERT INTO visitors (fullname, email, phone, address, meeting_with, department, purpose,
+                              created_at, checked_out_at, created_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, ?, CURRENT_TIMESTAMP),
+                CAST(strftime('%s', COALESCE(?, 'now')) AS INTEGER))
+    """
+
+    @classmethod
+    def bulk_import(cls, records, chunk_size=5000, progress=None, on_reject=None, defer_indexes=False):
+        """Insert many visitors in chunked transactions.
+
+        `records` yields (line_no, dict) pairs and is consumed lazily, so
+        memory stays bounded by `chunk_size`. Invalid rows are passed to
+        on_reject(line_no, record, error) and skipped; progress(imported,
+        rejected) is called after every committed chunk. With
+        `defer_indexes`, secondary indexes and full-text triggers are
+        dropped for the duration and rebuilt once at the end.
+        """
+        imported = rejected = 0
+        chunk = []
+
+        with cls.connection() as conn:
+            def flush():
+                nonlocal imported
+                with conn:
+                    conn.executemany(cls.SQL_IMPORT, chunk)
+                imported += len(chunk)
+                chunk.clear()
+                if progress:
+                    progress(imported, rejected)
+
+            with cls._deferred_indexes(conn, enabled=defer_indexes):
+                for line_no, record in records:
+                    try:
+                        chunk.append(cls._import_params(record))
+                    except ValueError as e:
+                        rejected += 1
+                        if on_reject:
+                            on_reject(line_no, record, str(e))
+                        continue
+                    if len(chunk) >= chunk_size:
+                        flush()
+                if chunk:
+                    flush()
+
+        cls.invalidate_caches()
+        return {"imported": imported, "rejected": rejected}
+
+    @classmethod
+    def _import_params(cls, record):
+        data = {key: (str(record.get(key) or "")).strip() for key in VISITOR_FIELDS}
+        error = cls.validate_visitor(data)
+        if error:
+            raise ValueError(error)
+        created_at = parse_timestamp(record.get('created_at'))
+        return cls._visitor_params(data) + (created_at, parse_timestamp(record.get('checked_out_at')), created_at,
+                                            created_at)
+
+    SQL_DEFERRABLE = """
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = 'visitors' AND sql IS NOT NULL
+          AND ((type = 'index' AND name LIKE 'idx_visitors_%')
+            OR (type = 'trigger' AND (name LIKE 'visitors_fts_%' OR name LIKE 'visitors_rollups_%')))
+    """
+    SQL_DEFER = "INSERT OR IGNORE INTO visitor_deferred (name, type, sql, last_id) VALUES (?, ?, ?, ?)"
+
+    @classmethod
+    @contextmanager
+    def _deferred_indexes(cls, conn, enabled=True):
+        """Drop visitors' secondary indexes, FTS and rollup triggers, restore on exit.
+
+        The dropped objects are listed in visitor_deferred in the same
+        transaction, so if the process dies before the restore, the next
+        upgrade() puts them back.
+        """
+        if not enabled:
+            yield
+            return
+
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Every row the import adds gets an id above this
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM visitors").fetchone()[0]
+            for kind, name, sql in conn.execute(cls.SQL_DEFERRABLE).fetchall():
+                conn.execute(cls.SQL_DEFER, (name, kind, sql, last_id))
+                conn.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+        try:
+            yield
+        finally:
+            if cls._restore_deferred(conn):
+                conn.execute("PRAGMA optimize")
+
+    @staticmethod
+    def _restore_deferred(conn):
+        """Recreate everything listed in visitor_deferred; True if there was any"""
+        if conn.execute("SELECT 1 FROM visitor_deferred LIMIT 1").fetchone() is None:
+            return False
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            objects = conn.execute("SELECT name, sql, last_id FROM visitor_deferred").fetchall()
+            for _, sql, _ in objects:
+                conn.execute(sql)
+            if any(name.startswith("visitors_fts_") for name, _, _ in objects):
+                conn.execute("INSERT INTO visitors_fts (visitors_fts) VALUES ('rebuild')")
+            if any(name.startswith("visitors_rollups_") for name, _, _ in objects):
+                VisitorReports.accumulate_rollups(conn, min(last_id for _, _, last_id in objects))
+            conn.execute("DELETE FROM visitor_deferred")
+        return bool(objects)
+
+    @classmethod
+    def invalidate_caches(cls, visitor_ids=None):
+        """Drop cached reads; called after every write.
+
+        Record lookups are kept except for `visitor_ids` (all of them when
+        None); everything else may depend on any row and always goes.
+        """
+        cls._write_generation += 1
+        cls._stats_cache = None
+        cls._queries.clear()
+        if visitor_ids is None:
+            cls._records.clear()
+        else:
+            cls._records.discard(visitor_ids)
+
+    @classmethod
+    def _on_commit(cls, results):
+        """WriteQueue hook: results are (result, [(visitor_id, row)]) per write"""
+        cls.invalidate_caches([visitor_id for _, changes in results for visitor_id, _ in changes])
+
+    @classmethod
+    def _sync_read_cache(cls):
+        """Drop cached reads made stale by commits from other connections.
+
+        data_version only says that somebody committed; the change log
+        says which visitors changed. Our own commits show up here too,
+        after _on_commit() has handled them, and repeating that is
+        harmless. A commit that logged nothing (an archive run, say) or a
+        gap in the log clears everything.
+        """
+        version = cls.data_version()
+        synced = cls._cache_sync
+        if synced is not None and synced[:2] == (cls.DB_NAME, version):
+            return
+        ids = None
+        with cls.connection() as conn:
+            latest, oldest = conn.execute(cls.SQL_CHANGE_BOUNDS).fetchone()
+            if (synced is not None and synced[0] == cls.DB_NAME
+                    and synced[2] < latest <= synced[2] + cls.RECORD_CACHE_SIZE
+                    and (oldest is None or oldest <= synced[2] + 1)):
+                ids = [row[0] for row in conn.execute(cls.SQL_CHANGED_IDS, (synced[2], latest))]
+        cls._stats_cache = None
+        cls._queries.clear()
+        if ids is None:
+            cls._records.clear()
+        else:
+            cls._records.discard(ids)
+        cls._cache_sync = (cls.DB_NAME, version, latest)
+
+    @classmethod
+    def _cached(cls, cache, key, load):
+        """cache[key], filled by load() on a miss"""
+        if not cache.enabled:
+            return load()
+        cls._sync_read_cache()
+        epoch = cache.epoch
+        value = cache.get(key, cls._MISSING)
+        if value is cls._MISSING:
+            value = load()
+            cache.put(key, value, epoch)
+        return value
+
+    @classmethod
+    def _filters_key(cls, filters):
+        """Hashable form of `filters`, equal for filters selecting the same rows"""
+        if not filters:
+            return None
+        dates = (filters['from'], filters['to']) if filters.get('from') and filters.get('to') else None
+        return dates, cls.fts_query(filters.get('search'))
+
+    @classmethod
+    def set_read_cache(cls, enabled):
+        """Switch the read cache on or off, e.g. to benchmark the queries themselves"""
+        for cache in (cls._records, cls._queries):
+            cache.enabled = enabled
+            cache.clear()
+        cls._cache_sync = None
+
+    @classmethod
+    def cache_stats(cls):
+        return {"records": cls._records.stats(), "queries": cls._queries.stats()}
+
+    SQL_ON_SITE = (f"SELECT id, fullname, meeting_with, department, {CREATED_TS} FROM visitors"
+                   " WHERE checked_out_at IS NULL")
+    SQL_ON_SITE_ROW = SQL_ON_SITE + " AND id = ?"
+    SQL_CHECK_OUT = "UPDATE visitors SET checked_out_at = CURRENT_TIMESTAMP WHERE id = ? AND checked_out_at IS NULL"
+
+    # Write operations: each runs on the writer thread as fn(conn, *args)
+    # and returns (result, [(visitor_id, on-site row or None)]) for the
+    # active set.
+    @classmethod
+    def _insert_visitor(cls, conn, params):
+        visitor_id = conn.execute(cls.SQL_INSERT, params).lastrowid
+        return visitor_id, [(visitor_id, conn.execute(cls.SQL_ON_SITE_ROW, (visitor_id,)).fetchone())]
+
+    @classmethod
+    def _update_visitor(cls, conn, visitor_id, params):
+        conn.execute(cls.SQL_UPDATE, params + (visitor_id,))
+        return visitor_id, [(visitor_id, conn.execute(cls.SQL_ON_SITE_ROW, (visitor_id,)).fetchone())]
+
+    @classmethod
+    def _delete_visitor(cls, conn, visitor_id):
+        conn.execute(cls.SQL_DELETE, (visitor_id,))
+        return visitor_id, [(visitor_id, None)]
+
+    @classmethod
+    def _check_out_visitor(cls, conn, visitor_id):
+        conn.execute(cls.SQL_CHECK_OUT, (visitor_id,))
+        return visitor_id, [(visitor_id, None)]
+
+    # Bulk actions on a selection (`ids`) or on every hot row matching
+    # `filters`. Each is one queued write: the targets are resolved inside
+    # the transaction, then the statement runs through executemany() once
+    # per BULK_CHUNK ids, passed as a JSON array. Set-based statements
+    # matter here: FTS5 flushes its pending index at the end of every
+    # statement, so one statement per row is several times slower.
+    BULK_CHUNK = 1000
+    BULK_FIELDS = ("department", "meeting_with")
+    SQL_IN_IDS = "id IN (SELECT value FROM json_each(?))"
+    SQL_BULK = {
+        "delete": "DELETE FROM visitors WHERE " + SQL_IN_IDS,
+        "check_out": "UPDATE visitors SET checked_out_at = datetime(?, 'unixepoch') WHERE " + SQL_IN_IDS,
+        "department": "UPDATE visitors SET department = ? WHERE " + SQL_IN_IDS,
+        "meeting_with": "UPDATE visitors SET meeting_with = ? WHERE " + SQL_IN_IDS,
+    }
+    # Rows an action would not change are left out of its targets
+    SQL_BULK_TARGET = {
+        "delete": None,
+        "check_out": "checked_out_at IS NULL",
+        "department": "department IS NOT ?",
+        "meeting_with": "meeting_with IS NOT ?",
+    }
+
+    @classmethod
+    def check_bulk_action(cls, action, ids=None, filters=None, all_rows=False):
+        """Raise ValueError for a bulk request that should not be queued.
+
+        Without ids, a filter or an explicit all_rows=True the request
+        would act on every hot row, so it is refused.
+        """
+        if action not in cls.SQL_BULK:
+            raise ValueError(f"Unknown bulk action {action!r}")
+        if ids is None and not all_rows and not any(cls._filters_key(filters) or ()):
+            raise ValueError("A bulk action needs ids, a filter or an explicit request for all rows")
+
+    @classmethod
+    def _bulk_scope(cls, conn, ids, filters):
+        """WHERE conditions and parameters for the rows a bulk action covers"""
+        if ids is None:
+            return cls._filter_clause(filters, conn=conn)
+        return [cls.SQL_IN_IDS], [json.dumps(ids)]
+
+    @classmethod
+    def count_bulk_targets(cls, filters=None):
+        """Hot rows a bulk action with ids=None and these filters covers.
+
+        Unlike count_visitors() this leaves out archived months, which
+        bulk actions never touch.
+        """
+        def load():
+            with cls.connection() as conn:
+                conditions, params = cls._bulk_scope(conn, None, filters)
+                return conn.execute(cls.SQL_COUNT_ALL + cls._where(conditions), params).fetchone()[0]
+
+        return cls._cached(cls._queries, ("bulk_count", cls._filters_key(filters)), load)
+
+    @classmethod
+    def _bulk_action(cls, conn, action, ids, filters, value):
+        version = conn.execute(cls.SQL_CHANGE_BOUNDS).fetchone()[0]
+        target = cls.SQL_BULK_TARGET[action]
+        conditions, params = ([target], [value] if "?" in target else []) if target else ([], [])
+        more, more_params = cls._bulk_scope(conn, ids, filters)
+        conditions, params = conditions + more, params + more_params
+        targets = [row[0] for row in conn.execute("SELECT id FROM visitors" + cls._where(conditions), params)]
+
+        # One timestamp (epoch seconds) for the whole check-out, so callers can show it
+        if action == "check_out":
+            value = conn.execute("SELECT CAST(strftime('%s', 'now') AS INTEGER)").fetchone()[0]
+        head = () if action == "delete" else (value,)
+        conn.executemany(cls.SQL_BULK[action], (head + (json.dumps(targets[start:start + cls.BULK_CHUNK]),)
+                                                for start in range(0, len(targets), cls.BULK_CHUNK)))
+
+        if action in cls.BULK_FIELDS:
+            rows = conn.execute(cls.SQL_ON_SITE + " AND " + cls.SQL_IN_IDS, (json.dumps(targets),))
+            on_site = {row[0]: row for row in rows}
+            changes = [(visitor_id, on_site.get(visitor_id)) for visitor_id in targets]
+        else:
+            changes = [(visitor_id, None) for visitor_id in targets]
+        result = {
+            "action": action,
+            "value": value,
+            "ids": targets,
+            # Change-log versions around this write: a reader at `before`
+            # can jump to `after` by applying the result itself
+            "before": version,
+            "after": conn.execute(cls.SQL_CHANGE_BOUNDS).fetchone()[0],
+        }
+        return result, changes
+
+    @classmethod
+    def submit_bulk_action(cls, action, ids=None, filters=None, value=None, all_rows=False):
+        """Queue a bulk delete, check-out or department/host reassignment.
+
+        Acts on `ids`, or with ids=None on every hot row matching
+        `filters`; every hot row only with all_rows=True. The Future
+        resolves to a dict with the affected ids, the value written
+        (check-out time for "check_out") and the change-log versions
+        before and after.
+        """
+        cls.check_bulk_action(action, ids, filters, all_rows)
+        if action in cls.BULK_FIELDS:
+            value = (value or "").strip()
+        if ids is not None:
+            ids = sorted({int(visitor_id) for visitor_id in ids})
+        return cls._submit_write(cls._bulk_action, action, ids, filters, value)
+
+    @classmethod
+    def bulk_action(cls, action, ids=None, filters=None, value=None, all_rows=False):
+        return cls.submit_bulk_action(action, ids, filters, value, all_rows).result()
+
+    @classmethod
+    def _submit_write(cls, fn, *args):
+        """Queue a write; the Future resolves to its result (the visitor id
+        for single-row writes) after COMMIT and after the active set
+        reflects it."""
+        from concurrent.futures import Future
+        committed = cls.writer().submit(fn, *args)
+        acknowledged = Future()
+
+        def on_committed(future):
+            try:
+                result, changes = future.result()
+                # An unseeded set needs no update: its seed will see this commit
+                registry = cls._active
+                if registry is not None and registry.db_name == cls.DB_NAME:
+                    registry.apply_many(changes)
+            except BaseException as e:
+                acknowledged.set_exception(e)
+            else:
+                acknowledged.set_result(result)
+
+        committed.add_done_callback(on_committed)
+        return acknowledged
+
+    @classmethod
+    def submit_add_visitor(cls, data):
+        """Queue an insert; the Future resolves to the new id once committed"""
+        return cls._submit_write(cls._insert_visitor, cls._visitor_params(data))
+
+    @classmethod
+    def submit_update_visitor(cls, visitor_id, data):
+        return cls._submit_write(cls._update_visitor, visitor_id, cls._visitor_params(data))
+
+    @classmethod
+    def submit_delete_visitor(cls, visitor_id):
+        return cls._submit_write(cls._delete_visitor, visitor_id)
+
+    @classmethod
+    def submit_check_out_visitor(cls, visitor_id):
+        return cls._submit_write(cls._check_out_visitor, visitor_id)
+
+    @classmethod
+    def check_out_visitor(cls, visitor_id):
+        cls.submit_check_out_visitor(visitor_id).result()
+
+    @classmethod
+    def active_visitors(cls):
+        """The process-wide ActiveVisitors set, seeded on first use"""
+        with cls._active_lock:
+            registry = cls._active
+            if registry is None or registry.db_name != cls.DB_NAME:
+                registry = cls._active = ActiveVisitors(cls.DB_NAME)
+                cls.reseed_active_visitors()
+            return registry
+
+    @classmethod
+    def reseed_active_visitors(cls):
+        """Reload the active set, e.g. after another process wrote to the file"""
+        registry = cls._active
+
+        def load():
+            version = cls.data_version()
+            with cls.connection() as conn:
+                latest = conn.execute(cls.SQL_CHANGE_BOUNDS).fetchone()[0]
+                rows = conn.execute(cls.SQL_ON_SITE).fetchall()
+            registry.synced = (version, latest)
+            return rows
+
+        registry.reload(load)
+
+    @classmethod
+    def _sync_active_visitors(cls, registry):
+        """Apply commits by other connections to the active set.
+
+        Same scheme as _sync_read_cache(): the visitors the change log
+        names since the last sync are re-read, and a commit that logged
+        nothing or a gap in the log reloads the set from the on-site
+        index. Our own commits were applied already; re-reading them is
+        harmless.
+        """
+        version = cls.data_version()
+        synced = registry.synced
+        if synced is not None and synced[0] == version:
+            return
+        with cls.connection() as conn:
+            latest, oldest = conn.execute(cls.SQL_CHANGE_BOUNDS).fetchone()
+            if (synced is None or not synced[1] < latest <= synced[1] + cls.CHANGE_FEED_LIMIT
+                    or (oldest is not None and oldest > synced[1] + 1)):
+                cls.reseed_active_visitors()
+                return
+            ids = [row[0] for row in conn.execute(cls.SQL_CHANGED_IDS, (synced[1], latest))]
+
+            def load():
+                return conn.execute(cls.SQL_ON_SITE + " AND " + cls.SQL_IN_IDS, (json.dumps(ids),)).fetchall()
+
+            registry.refresh(ids, load)
+        registry.synced = (version, latest)
+
+    @classmethod
+    def get_on_site(cls):
+        registry = cls.active_visitors()
+        cls._sync_active_visitors(registry)
+        return registry.snapshot()
+
+    @classmethod
+    def add_visitor(cls, data):
+        return cls.submit_add_visitor(data).result()
+
+    @classmethod
+    def update_visitor(cls, visitor_id, data):
+        cls.submit_update_visitor(visitor_id, data).result()
+
+    @classmethod
+    def delete_visitor(cls, visitor_id):
+        cls.submit_delete_visitor(visitor_id).result()
+
+    @staticmethod
+    def fts_query(text):
+        """Turn free text into an FTS5 prefix query, or None if it has no terms.
+
+        Every word must match (implicit AND) and each is treated as a
+        prefix, so "jo smi" finds "John Smith". Words are quoted, which
+        keeps FTS5 operators typed by the user from being interpreted.
+        """
+        terms = re.findall(r"\w+", text or "")
+        if not terms:
+            return None
+        return " ".join(f'"{term}"*' for term in terms)
+
+    @classmethod
+    def created_ts_ready(cls, conn=None):
+        """True once every row has created_ts (see TimestampBackfill)"""
+        if cls._created_ts_ready == cls.DB_NAME:
+            return True
+        if conn is None:
+            with cls.connection() as conn:
+                return cls.created_ts_ready(conn)
+        if conn.execute(TimestampBackfill.SQL_PENDING).fetchone() is None:
+            cls._created_ts_ready = cls.DB_NAME
+            return True
+        return False
+
+    @classmethod
+    def _time_column(cls, conn=None, schema="main"):
+        """(column, bound) that ranges and ordering on check-in time use.
+
+        created_ts once it is backfilled; before that, and in archive files,
+        the created_at text it mirrors, which sorts the same way. bound()
+        turns epoch seconds into a value to compare the column with.
+        """
+        if schema == "main" and cls.created_ts_ready(conn):
+            return "created_ts", int
+        return "created_at", utc_text
+
+    @classmethod
+    def _filter_clause(cls, filters, schema="main", conn=None):
+        """Translate UI filters into WHERE conditions and parameters.
+
+        'from' and 'to' are YYYY-MM-DD days in the site's time zone.
+        """
+        conditions, params = [], []
+        if filters and filters.get('from') and filters.get('to'):
+            column, bound = cls._time_column(conn, schema)
+            start, end = SiteTime.day_range(filters['from'], filters['to'])
+            conditions.append(f"{column} >= ? AND {column} < ?")
+            params += [bound(start), bound(end)]
+        match = cls.fts_query(filters.get('search')) if filters else None
+        if match:
+            conditions.append(f"id IN (SELECT rowid FROM {schema}.visitors_fts WHERE visitors_fts MATCH ?)")
+            params.append(match)
+        return conditions, params
+
+    @staticmethod
+    def _where(conditions):
+        return (" WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    # Visits older than the retention window live in one SQLite file per
+    # month (see VisitorArchive). Reads attach only the months that overlap
+    # the requested range, one at a time; months never overlap, so their
+    # rows come out already in order and merge cheaply with the hot rows.
+    ARCHIVE_DIR = None  # default: "<database name>-archive" beside DB_NAME
+    SQL_ARCHIVES = "SELECT month, file FROM visitor_archives WHERE month BETWEEN ? AND ? ORDER BY month DESC"
+    SQL_ARCHIVED_TOTAL = "SELECT COALESCE(SUM(total), 0) FROM visitor_archives"
+
+    @classmethod
+    def archive_dir(cls):
+        return cls.ARCHIVE_DIR or os.path.splitext(cls.DB_NAME)[0] + "-archive"
+
+    @classmethod
+    def _archives(cls, conn, filters, before=None):
+        """[(month, path)] of archives that may hold rows for `filters`, newest first"""
+        first, last = "", "9999-99"
+        if filters and filters.get('from') and filters.get('to'):
+            # Archive months are UTC months
+            start, end = SiteTime.day_range(filters['from'], filters['to'])
+            first, last = utc_text(start)[:7], utc_text(end - 1)[:7]
+        if before is not None:
+            last = min(last, utc_text(before)[:7])
+        directory = cls.archive_dir()
+        return [(month, os.path.join(directory, name))
+                for month, name in conn.execute(cls.SQL_ARCHIVES, (first, last))]
+
+    @staticmethod
+    @contextmanager
+    def _attached(conn, path, schema="archive"):
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        try:
+            yield schema
+        finally:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+    @classmethod
+    def _archive_query(cls, schema, columns, filters, after=None):
+        """SELECT over one attached archive, skipping rows still present in
+        the hot database (an archive move copies before it deletes)."""
+        conditions, params = cls._filter_clause(filters, schema=schema)
+        if after is not None:
+            conditions.append("(created_at, id) < (?, ?)")
+            params += [utc_text(after[0]), after[1]]
+        conditions.append("NOT EXISTS (SELECT 1 FROM main.visitors hot WHERE hot.id = v.id)")
+        return f"SELECT {columns} FROM {schema}.visitors v" + cls._where(conditions), params
+
+    @classmethod
+    def _archive_rows(cls, conn, archives, columns, filters, after=None, limit=None, batch_size=1000):
+        """Yield matching rows from `archives` newest first, one file attached at a time"""
+        for month, path in archives:
+            with cls._attached(conn, path) as schema:
+                query, params = cls._archive_query(schema, columns, filters, after)
+                query += " ORDER BY created_at DESC, id DESC"
+                if limit:
+                    query += " LIMIT ?"
+                    params.append(limit)
+                cursor = conn.execute(query, params)
+                try:
+                    while True:
+                        batch = cursor.fetchmany(batch_size)
+                        if not batch:
+                            break
+                        yield from batch
+                finally:
+                    cursor.close()
+
+    @classmethod
+    def get_visitors(cls, filters=None):
+        def load():
+            with cls.connection() as conn:
+                column, _ = cls._time_column(conn)
+                conditions, params = cls._filter_clause(filters, conn=conn)
+                query = cls.SQL_LIST + cls._where(conditions) + f" ORDER BY {column} DESC, id DESC"
+                rows = conn.execute(query, params).fetchall()
+                archives = cls._archives(conn, filters)
+                if archives:
+                    archived = list(cls._archive_rows(conn, archives, cls.ARCHIVE_LIST_COLUMNS, filters))
+                    rows = list(heapq.merge(rows, archived, key=cls.page_key, reverse=True))
+                return rows
+
+        return list(cls._cached(cls._queries, ("list", cls._filters_key(filters)), load))
+
+    @classmethod
+    def get_visitors_page(cls, filters=None, after=None, limit=None):
+        """Return one page of get_visitors() using keyset pagination.
+
+        `after` is the page_key() of the last row of the previous page, or
+        None for the first page. Each page is an index seek, so
+        page N costs the same as page 1 however deep the range is.
+        """
+        limit = limit or cls.PAGE_SIZE
+
+        def load():
+            with cls.connection() as conn:
+                column, bound = cls._time_column(conn)
+                conditions, params = cls._filter_clause(filters, conn=conn)
+                if after is not None:
+                    conditions.append(f"({column}, id) < (?, ?)")
+                    params += [bound(after[0]), after[1]]
+                query = (cls.SQL_LIST + cls._where(conditions)
+                         + f" ORDER BY {column} DESC, id DESC LIMIT ?")
+                params.append(limit)
+
+                rows = conn.execute(query, params).fetchall()
+                archives = cls._archives(conn, filters, before=after and after[0])
+                # A full page newer than the newest archived month needs no archive
+                if archives and not (len(rows) == limit and utc_text(rows[-1][4]) > archives[0][0] + "-99"):
+                    source = cls._archive_rows(conn, archives, cls.ARCHIVE_LIST_COLUMNS, filters, after=after,
+                                                limit=limit)
+                    try:
+                        archived = list(itertools.islice(source, limit))
+                    finally:
+                        source.close()
+                    rows = list(itertools.islice(
+                        heapq.merge(rows, archived, key=cls.page_key, reverse=True), limit))
+                return rows
+
+        key = ("page", cls._filters_key(filters), tuple(after) if after else None, limit)
+        return list(cls._cached(cls._queries, key, load))
+
+    @classmethod
+    def search_visitors(cls, text, filters=None, limit=None):
+        """Best matches for `text` by relevance, capped at `limit` rows.
+
+        Archived months are searched too, as get_visitors() and
+        count_visitors() do with a search filter; each file's best matches
+        are merged with the hot ones by bm25() score.
+        """
+        match = cls.fts_query(text)
+        if not match:
+            return []
+        limit = limit or cls.SEARCH_LIMIT
+
+        def load():
+            with cls.connection() as conn:
+                conditions, params = cls._filter_clause(filters, conn=conn)
+                conditions = ["visitors_fts MATCH ?"] + conditions
+                query = f"""
+                    SELECT v.id, v.fullname, v.email, v.phone, COALESCE(v.created_ts, {epoch_sql('v.created_at')}),
+                           v.meeting_with, v.department,
+                           {epoch_sql('v.checked_out_at')}, bm25(visitors_fts)
+                    FROM visitors_fts JOIN visitors v ON v.id = visitors_fts.rowid
+                    {cls._where(conditions)}
+                    ORDER BY bm25(visitors_fts) LIMIT ?
+                """
+                found = [conn.execute(query, [match] + params + [limit]).fetchall()]
+                for month, path in cls._archives(conn, filters):
+                    with cls._attached(conn, path) as schema:
+                        score = (f"(SELECT bm25(visitors_fts) FROM {schema}.visitors_fts"
+                                 " WHERE visitors_fts MATCH ? AND rowid = v.id)")
+                        # Words are ANDed, so this also keeps a search filter
+                        searched = dict(filters or {}, search=f"{(filters or {}).get('search') or ''} {text}")
+                        query, params = cls._archive_query(schema, f"{cls.ARCHIVE_LIST_COLUMNS}, {score} AS score",
+                                                           searched)
+                        found.append(conn.execute(query + " ORDER BY score LIMIT ?",
+                                                  [match] + params + [limit]).fetchall())
+                best = itertools.islice(heapq.merge(*found, key=lambda row: row[-1]), limit)
+                return [row[:-1] for row in best]
+
+        return list(cls._cached(cls._queries, ("search", match, cls._filters_key(filters), limit), load))
+
+    EXPORT_COLUMNS = ("id, fullname, email, phone, address, meeting_with, department, purpose, created_at,"
+                      " checked_out_at")
+    SQL_EXPORT = f"SELECT {EXPORT_COLUMNS} FROM visitors"
+
+    @classmethod
+    def iter_visitors(cls, filters=None, batch_size=1000):
+        """Yield full visitor rows for `filters` in batches of `batch_size`.
+
+        Rows are pulled from a live cursor with fetchmany(), so memory use
+        does not depend on the size of the range. The pooled connection is
+        held until the generator is exhausted or closed.
+        """
+        yield from cls._iter_rows(cls.SQL_EXPORT, cls.EXPORT_COLUMNS, lambda row: (row[8], row[0]), filters, batch_size)
+
+    @classmethod
+    def iter_list_rows(cls, filters=None, batch_size=1000):
+        """iter_visitors() in get_visitors_page() layout, for the in-memory
+        result set; bypasses the read cache, as iter_visitors() does"""
+        yield from cls._iter_rows(cls.SQL_LIST, cls.ARCHIVE_LIST_COLUMNS, cls.page_key, filters, batch_size)
+
+    @classmethod
+    def _iter_rows(cls, select, columns, key, filters, batch_size):
+        """Batches of `select` rows newest first, archived months merged in by `key`"""
+        with cls.connection() as conn:
+            column, _ = cls._time_column(conn)
+            conditions, params = cls._filter_clause(filters, conn=conn)
+            query = select + cls._where(conditions) + f" ORDER BY {column} DESC, id DESC"
+            cursor = conn.execute(query, params)
+            archives = cls._archives(conn, filters)
+            try:
+                if archives:
+                    # Archived months are read one at a time, merged in order
+                    archived = cls._archive_rows(conn, archives, columns, filters, batch_size=batch_size)
+                    try:
+                        rows = heapq.merge(cursor, archived, key=key, reverse=True)
+                        while True:
+                            batch = list(itertools.islice(rows, batch_size))
+                            if not batch:
+                                break
+                            yield batch
+                    finally:
+                        archived.close()
+                    return
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    yield batch
+            finally:
+                cursor.close()
+
+    @staticmethod
+    def page_key(row):
+        """Keyset cursor for a row returned by get_visitors_page(): (created_ts, id)"""
+        return (row[4], row[0])
+
+    @classmethod
+    def count_visitors(cls, filters=None):
+        def load():
+            with cls.connection() as conn:
+                conditions, params = cls._filter_clause(filters, conn=conn)
+                total = conn.execute(cls.SQL_COUNT_ALL + cls._where(conditions), params).fetchone()[0]
+                if not conditions:
+                    return total + conn.execute(cls.SQL_ARCHIVED_TOTAL).fetchone()[0]
+                for month, path in cls._archives(conn, filters):
+                    with cls._attached(conn, path) as schema:
+                        query, params = cls._archive_query(schema, "COUNT(*)", filters)
+                        total += conn.execute(query, params).fetchone()[0]
+                return total
+
+        return cls._cached(cls._queries, ("count", cls._filters_key(filters)), load)
+
+    @classmethod
+    def get_visitor_by_id(cls, visitor_id):
+        def load():
+            with cls.connection() as conn:
+                return conn.execute(cls.SQL_BY_ID, (visitor_id,)).fetchone()
+
+        return cls._cached(cls._records, int(visitor_id), load)
+
+    # Latest visit per normalized key; one probe of the (key, created_at) index
+    # created_at comes back as UTC epoch seconds
+    RETURNING_FIELDS = ('fullname', 'email', 'phone', 'address', 'meeting_with', 'department', 'purpose',
+                        'created_at')
+    SQL_RETURNING = f"SELECT {', '.join(RETURNING_FIELDS[:-1])}, {CREATED_TS} FROM visitors"
+    SQL_LAST_VISIT = {
+        "phone_norm": SQL_RETURNING + " WHERE phone_norm = ? ORDER BY created_at DESC LIMIT 1",
+        "email_norm": SQL_RETURNING + " WHERE email_norm = ? ORDER BY created_at DESC LIMIT 1",
+    }
+
+    @classmethod
+    def find_returning_visitor(cls, phone=None, email=None):
+        """Details of the latest visit by `phone`, else by `email`, or None.
+
+        Input too partial to identify anyone returns None without a query.
+        Answers, including misses, are cached until the next write.
+        """
+        for column, key in (("phone_norm", normalize_phone(phone)), ("email_norm", normalize_email(email))):
+            if key is None:
+                continue
+
+            def load():
+                with cls.connection() as conn:
+                    row = conn.execute(cls.SQL_LAST_VISIT[column], (key,)).fetchone()
+                return dict(zip(cls.RETURNING_FIELDS, row)) if row else None
+
+            found = cls._cached(cls._queries, ("returning", column, key), load)
+            if found:
+                return dict(found)
+        return None
+
+    # Change feed. The log is trimmed to the newest CHANGE_LOG_KEEP entries
+    # at startup, keeping anything a replication target has not
+    # acknowledged; readers further behind than that, or more than
+    # CHANGE_FEED_LIMIT changes behind, reload instead.
+    CHANGE_LOG_KEEP = 10000
+    CHANGE_FEED_LIMIT = 500   # also keeps the id list under SQLite's variable limit
+    SQL_CHANGE_BOUNDS = "SELECT COALESCE(MAX(version), 0), MIN(version) FROM visitor_changes"
+    SQL_CHANGED_IDS = "SELECT DISTINCT visitor_id FROM visitor_changes WHERE version > ? AND version <= ?"
+    SQL_PRUNE_CHANGES = """
+        DELETE FROM visitor_changes
+        WHERE version <= (SELECT MAX(version) FROM visitor_changes) - ?
+          AND NOT EXISTS (SELECT 1 FROM replication_peers WHERE acked_seq < visitor_changes.version)
+    """
+
+    @classmethod
+    def change_version(cls):
+        """Latest change-log version; pass it to changes_since() later"""
+        with cls.connection() as conn:
+            return conn.execute(cls.SQL_CHANGE_BOUNDS).fetchone()[0]
+
+    @classmethod
+    def changes_since(cls, version, filters=None):
+        """Return (new_version, rows, removed_ids) for changes after `version`.
+
+        `rows` are the changed visitors that still match `filters`, in
+        get_visitors_page() format; `removed_ids` were deleted or no longer
+        match. Returns None when the log cannot bridge the gap and the
+        caller should reload from scratch.
+        """
+        with cls.connection() as conn:
+            latest, oldest = conn.execute(cls.SQL_CHANGE_BOUNDS).fetchone()
+            if latest - version > cls.CHANGE_FEED_LIMIT or (oldest is not None and oldest > version + 1):
+                return None
+            if latest == version:
+                return latest, [], []
+            ids = [row[0] for row in conn.execute(cls.SQL_CHANGED_IDS, (version, latest))]
+
+            conditions, params = cls._filter_clause(filters, conn=conn)
+            conditions.append(f"id IN ({', '.join('?' * len(ids))})")
+            rows = conn.execute(cls.SQL_LIST + cls._where(conditions), params + ids).fetchall()
+
+        found = {row[0] for row in rows}
+        return latest, rows, [visitor_id for visitor_id in ids if visitor_id not in found]
+
+    @classmethod
+    def data_version(cls):
+        """PRAGMA data_version as seen by a long-lived connection.
+
+        The value changes whenever another connection (our writer or
+        another kiosk) commits, so polling it is a cheap way to notice
+        writes without querying any table.
+        """
+        with cls._pool_lock:
+            if cls._monitor is None or cls._monitor[0] != cls.DB_NAME:
+                if cls._monitor is not None:
+                    cls._monitor[1].close()
+                cls._monitor = (cls.DB_NAME, ConnectionPool.open(cls.DB_NAME))
+            return cls._monitor[1].execute("PRAGMA data_version").fetchone()[0]
+
+    @classmethod
+    def get_traffic(cls, date_from, date_to):
+        return VisitorReports.traffic(date_from, date_to)
+
+    @classmethod
+    def get_stats(cls):
+        today = SiteTime.today()
+        generation = cls._write_generation
+        cached = cls._stats_cache
+        if (cached and cached[0] == generation and cached[1] == today
+                and cached[2] > time.monotonic()):
+            return dict(cached[3])
+
+        with cls.connection() as conn:
+            total = conn.execute(cls.SQL_STATS).fetchone()
+            start, end = SiteTime.day_range(today, today)
+            todays = conn.execute(cls.SQL_COUNT_QUARTERS,
+                                  (start // cls.COUNT_QUARTER, end // cls.COUNT_QUARTER)).fetchone()[0]
+        stats = {"total": total[0] if total else 0, "today": todays}
+
+        cls._stats_cache = (generation, today, time.monotonic() + cls.STATS_CACHE_TTL, stats)
+        return dict(stats)
+
+# ==========================================
+# ARCHIVE
+# ==========================================
+class VisitorArchive:
+    """Moves visits older than the retention window into monthly archive files.
+
+    Each month goes to its own SQLite file in DatabaseManager.archive_dir(),
+    listed in the visitor_archives table. Rows move in small chunks: a
+    chunk is first copied into the archive and committed there, then
+    deleted from the hot database in a second short transaction, so kiosk
+    writes are never locked out for longer than one chunk. A crash between
+    the two leaves the rows in both files; readers skip the archived copy
+    and the next run finishes the move.
+
+    Visitor counters and traffic rollups are left untouched, so stats and
+    reports keep covering the archived history.
+    """
+    RETENTION_DAYS = 365
+    CHUNK_SIZE = 2000
+
+    # Mirrors the visitors_fts definition in migration 4
+    ARCHIVE_SCHEMA = (
+        "CREATE INDEX IF NOT EXISTS archive.idx_visitors_created_at ON visitors(created_at)",
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS archive.visitors_fts USING fts5(
+            fullname, email, phone, meeting_with, department, purpose,
+            content='visitors', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS archive.visitors_fts_ai AFTER INSERT ON visitors BEGIN
+            INSERT INTO visitors_fts (rowid, fullname, email, phone, meeting_with, department, purpose)
+            VALUES (NEW.id, NEW.fullname, NEW.email, NEW.phone, NEW.meeting_with, NEW.department, NEW.purpose);
+        END
+        """,
+    )
+    # Archive files hold UTC months
+    SQL_EXPIRED = ("SELECT id, strftime('%Y-%m', created_at) FROM visitors"
+                   " WHERE {column} < ? ORDER BY {column} LIMIT ?")
+    SQL_RECORD = """
+        INSERT INTO visitor_archives (month, file, total) VALUES (?, ?, ?)
+        ON CONFLICT(month) DO UPDATE SET total = total + excluded.total
+    """
+
+    @staticmethod
+    def file_name(month):
+        return f"visitors-{month}.db"
+
+    @classmethod
+    def run(cls, retention_days=None, chunk_size=None, progress=None):
+        """Archive every visit that checked in before the retention window.
+
+        Returns the number of rows moved; progress(moved) is called after
+        each chunk.
+        """
+        retention_days = cls.RETENTION_DAYS if retention_days is None else retention_days
+        cutoff = SiteTime.day_start(datetime.strptime(SiteTime.today(), "%Y-%m-%d") - timedelta(days=retention_days))
+        os.makedirs(DatabaseManager.archive_dir(), exist_ok=True)
+
+        conn = ConnectionPool.open(DatabaseManager.DB_NAME)
+        conn.isolation_level = None  # transactions are managed explicitly below
+        moved = 0
+        try:
+            columns = [row[1] for row in conn.execute("PRAGMA main.table_info(visitors)")]
+            column, bound = DatabaseManager._time_column(conn)
+            expired_sql = cls.SQL_EXPIRED.format(column=column)
+            while True:
+                expired = conn.execute(expired_sql, (bound(cutoff), chunk_size or cls.CHUNK_SIZE)).fetchall()
+                if not expired:
+                    break
+                for month, rows in itertools.groupby(expired, key=lambda row: row[1]):
+                    moved += cls._move(conn, month, [row[0] for row in rows], columns)
+                if progress:
+                    progress(moved)
+        finally:
+            conn.close()
+
+        if moved:
+            DatabaseManager.invalidate_caches()
+            # Forgotten check-outs can be archived too; rebuild the on-site set
+            if DatabaseManager._active is not None:
+                DatabaseManager.reseed_active_visitors()
+        return moved
+
+    @classmethod
+    def _move(cls, conn, month, ids, columns):
+        name = cls.file_name(month)
+        path = os.path.join(DatabaseManager.archive_dir(), name)
+        column_list = ", ".join(columns)
+        id_list = ", ".join("?" * len(ids))
+
+        with DatabaseManager._attached(conn, path):
+            conn.execute("PRAGMA archive.journal_mode = WAL")
+            cls._ensure_schema(conn)
+
+            # 1. copy into the archive; only the archive file is written
+            conn.execute("BEGIN")
+            try:
+                conn.execute(f"INSERT OR IGNORE INTO archive.visitors ({column_list})"
+                             f" SELECT {column_list} FROM main.visitors WHERE id IN ({id_list})", ids)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            # 2. delete from the hot database without touching counters
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT INTO visitor_archiving (active) VALUES (1)")
+                deleted = conn.execute(f"DELETE FROM main.visitors WHERE id IN ({id_list})", ids).rowcount
+                conn.execute("DELETE FROM visitor_archiving")
+                conn.execute(cls.SQL_RECORD, (month, name, deleted))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    @classmethod
+    def _ensure_schema(cls, conn):
+        """Create the archive tables, adding columns the hot table gained since"""
+        hot = [(row[1], row[2]) for row in conn.execute("PRAGMA main.table_info(visitors)")]
+        existing = {row[1] for row in conn.execute("PRAGMA archive.table_info(visitors)")}
+        if not existing:
+            definitions = ", ".join("id INTEGER PRIMARY KEY" if column == "id" else f"{column} {kind}"
+                                    for column, kind in hot)
+            conn.execute(f"CREATE TABLE archive.visitors ({definitions})")
+        else:
+            for column, kind in hot:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE archive.visitors ADD COLUMN {column} {kind}")
+        for sql in cls.ARCHIVE_SCHEMA:
+            conn.execute(sql)
+
+# ==========================================
+# BACKFILL
+# ==========================================
+class TimestampBackfill:
+    """Fills in created_ts for visits recorded before migration 11.
+
+    Works in id order, CHUNK_SIZE rows per short write transaction with a
+    PAUSE in between, so kiosk writes never wait for more than one chunk;
+    init_db() and the API server start() it on a background thread. The
+    next id is saved in visitor_backfill in the same transaction as each
+    chunk: a run that is interrupted, or a kiosk
+    that is closed, resumes where it stopped. Rows inserted meanwhile are
+    stamped on insert. The last chunk deletes the cursor row, which
+    switches range queries to created_ts (DatabaseManager.created_ts_ready),
+    and drops the wider created_at index they used until then.
+    """
+    CHUNK_SIZE = 5000
+    PAUSE = 0.05  # seconds between chunks
+    SQL_PENDING = "SELECT next_id FROM visitor_backfill WHERE name = 'created_ts'"
+    SQL_CHUNK_END = "SELECT MAX(id) FROM (SELECT id FROM visitors WHERE id > ? ORDER BY id LIMIT ?)"
+    SQL_FILL = ("UPDATE visitors SET created_ts = CAST(strftime('%s', created_at) AS INTEGER)"
+                " WHERE id > ? AND id <= ? AND created_ts IS NULL")
+    SQL_ADVANCE = "UPDATE visitor_backfill SET next_id = ? WHERE name = 'created_ts'"
+    SQL_FINISH = (
+        "DELETE FROM visitor_backfill WHERE name = 'created_ts'",
+        "DROP INDEX IF EXISTS idx_visitors_created_at",
+    )
+
+    _thread = None
+    _stop = threading.Event()
+
+    @classmethod
+    def run(cls, chunk_size=None, pause=None, progress=None, stop=None):
+        """Backfill DatabaseManager.DB_NAME until done or `stop` is set.
+
+        Returns the number of rows filled in by this call; progress(filled)
+        is called after each chunk.
+        """
+        chunk_size = chunk_size or cls.CHUNK_SIZE
+        pause = cls.PAUSE if pause is None else pause
+        conn = ConnectionPool.open(DatabaseManager.DB_NAME)
+        conn.isolation_level = None  # transactions are managed explicitly below
+        filled = 0
+        try:
+            while not (stop and stop.is_set()):
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    pending = conn.execute(cls.SQL_PENDING).fetchone()
+                    if pending is None:
+                        conn.execute("ROLLBACK")
+                        break
+                    end = conn.execute(cls.SQL_CHUNK_END, (pending[0], chunk_size)).fetchone()[0]
+                    if end is None:
+                        for sql in cls.SQL_FINISH:
+                            conn.execute(sql)
+                    else:
+                        filled += conn.execute(cls.SQL_FILL, (pending[0], end)).rowcount
+                        conn.execute(cls.SQL_ADVANCE, (end,))
+                    conn.execute("COMMIT")
+                except sqlite3.OperationalError as e:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    if not WriteQueue._is_busy(e):
+                        raise
+                    time.sleep(pause)  # a long write elsewhere; try this chunk again
+                    continue
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+                if end is None:
+                    break
+                if progress:
+                    progress(filled)
+                time.sleep(pause)
+        finally:
+            conn.close()
+        return filled
+
+    @classmethod
+    def start(cls):
+        """Run the backfill on a daemon thread unless it is done or running"""
+        if DatabaseManager.created_ts_ready() or (cls._thread is not None and cls._thread.is_alive()):
+            return
+        cls._stop = threading.Event()
+        cls._thread = threading.Thread(target=cls.run, kwargs={"stop": cls._stop},
+                                       name="created_ts-backfill", daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    def stop(cls):
+        thread = cls._thread
+        if thread is not None:
+            cls._stop.set()
+            thread.join()
+            cls._thread = None
+
+# ==========================================
+# REPLICATION
+# ==========================================
+class Replicator:
+    """Ships a site's visitor changes to a central database.
+
+    A site sends everything after the last change sequence the target
+    acknowledged, as zlib-compressed JSON change sets covering at most
+    BATCH_SIZE log entries, each collapsed to the latest state per visit.
+    The target applies a change set and records its sequence in one
+    transaction, so a resent or interrupted batch is harmless.
+
+    Visits are matched by uuid, never by row id. Conflicts settle the same
+    way whatever order change sets arrive in: the later updated_at wins,
+    an exact tie goes to the larger row content, and a delete beats any
+    version that is not newer than it. Replication is one way; a target
+    should not sync the copies it holds back to their sites.
+    """
+    BATCH_SIZE = 500   # log entries per change set; also bounds the id list
+    FORMAT = 1
+
+    SQL_SITE = "SELECT site_id FROM replication_site"
+    SQL_CHANGES = ("SELECT version, visitor_id, op, uuid, changed_at FROM visitor_changes"
+                   " WHERE version > ? ORDER BY version LIMIT ?")
+    SQL_APPLIED = "SELECT applied_seq FROM replication_inbox WHERE site_id = ?"
+    SQL_RECORD_APPLIED = """
+        INSERT INTO replication_inbox (site_id, applied_seq, synced_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(site_id) DO UPDATE SET applied_seq = excluded.applied_seq, synced_at = excluded.synced_at
+    """
+    SQL_RECORD_ACK = """
+        INSERT INTO replication_peers (peer, acked_seq, synced_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(peer) DO UPDATE SET acked_seq = excluded.acked_seq, synced_at = excluded.synced_at
+    """
+    SQL_TOMBSTONE = """
+        INSERT INTO replication_tombstones (uuid, deleted_at) VALUES (?, ?)
+        ON CONFLICT(uuid) DO UPDATE SET deleted_at = MAX(deleted_at, excluded.deleted_at)
+    """
+    SQL_TOMBSTONED = "SELECT deleted_at FROM replication_tombstones WHERE uuid = ?"
+    SQL_FIND = "SELECT id, updated_at FROM visitors WHERE uuid = ?"
+
+    @classmethod
+    def site_id(cls, conn):
+        return conn.execute(cls.SQL_SITE).fetchone()[0]
+
+    @staticmethod
+    def _columns(conn):
+        # created_ts is derived from created_at on every site
+        return [row[1] for row in conn.execute("PRAGMA table_info(visitors)") if row[1] not in ("id", "created_ts")]
+
+    @staticmethod
+    def _version_key(values, updated_at):
+        return values[updated_at] or "", json.dumps(values, default=str)
+
+    @classmethod
+    def _payload(cls, site, after, seq, columns, upserts, deletes):
+        body = {"format": cls.FORMAT, "site": site, "after": after, "seq": seq,
+                "columns": columns, "upserts": upserts, "deletes": deletes}
+        return zlib.compress(json.dumps(body, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def change_sets(cls, conn, after, batch_size=None):
+        """Yield (seq, payload) for every change after sequence `after`.
+
+        A first sync, or one whose start has been trimmed from the log,
+        begins with a snapshot of every visit, archived months included.
+        Snapshot batches carry seq None except the last, which carries the
+        log position it started at.
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        site = cls.site_id(conn)
+        columns = cls._columns(conn)
+        select = f"SELECT id, {', '.join(columns)} FROM visitors"
+
+        latest, oldest = conn.execute(DatabaseManager.SQL_CHANGE_BOUNDS).fetchone()
+        if after == 0 or (oldest is not None and oldest > after + 1):
+            batches = cls._snapshot(conn, columns, batch_size)
+            upserts = next(batches, [])
+            for following in batches:
+                yield None, cls._payload(site, after, None, columns, upserts, [])
+                upserts = following
+            yield latest, cls._payload(site, after, latest, columns, upserts, [])
+            after = latest
+
+        while True:
+            changes = conn.execute(cls.SQL_CHANGES, (after, batch_size)).fetchall()
+            if not changes:
+                return
+            seq = changes[-1][0]
+            newest = {}
+            for version, visitor_id, op, uuid, changed_at in changes:
+                newest[visitor_id] = (op, uuid, changed_at)
+            # Entries logged before visits had a uuid cannot be replayed
+            deletes = [[uuid, changed_at] for op, uuid, changed_at in newest.values() if op == 'D' and uuid]
+            ids = [visitor_id for visitor_id, (op, _, _) in newest.items() if op != 'D']
+            upserts = []
+            if ids:
+                # A visit deleted since is missing here; its 'D' follows later
+                rows = conn.execute(f"{select} WHERE id IN ({', '.join('?' * len(ids))})", ids)
+                upserts = [list(row[1:]) for row in rows]
+            yield seq, cls._payload(site, after, seq, columns, upserts, deletes)
+            after = seq
+
+    @classmethod
+    def _snapshot(cls, conn, columns, batch_size):
+        """Yield every visit as lists of `columns` values, batch_size at a time.
+
+        Hot rows come first, then each archive file, attached one at a
+        time. Archived copies of rows still in the hot table (an
+        interrupted move) are skipped, and columns an older archive lacks
+        are sent as NULL.
+        """
+        yield from cls._snapshot_table(conn, "main", columns, batch_size)
+        for month, path in DatabaseManager._archives(conn, None):
+            with DatabaseManager._attached(conn, path) as schema:
+                yield from cls._snapshot_table(conn, schema, columns, batch_size)
+
+    @staticmethod
+    def _snapshot_table(conn, schema, columns, batch_size):
+        present = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(visitors)")}
+        values = ", ".join(column if column in present else "NULL" for column in columns)
+        conditions = ["id > ?"]
+        if schema != "main":
+            conditions.append("NOT EXISTS (SELECT 1 FROM main.visitors hot WHERE hot.id = v.id)")
+        query = (f"SELECT id, {values} FROM {schema}.visitors v WHERE {' AND '.join(conditions)}"
+                 " ORDER BY id LIMIT ?")
+        last_id = 0
+        while True:
+            rows = conn.execute(query, (last_id, batch_size)).fetchall()
+            if rows:
+                yield [list(row[1:]) for row in rows]
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    @classmethod
+    def apply(cls, conn, payload):
+        """Apply one change set to the database behind `conn`.
+
+        `conn` must be in autocommit mode (isolation_level None). Returns
+        counts of inserted, updated, deleted and skipped visits.
+        """
+        body = json.loads(zlib.decompress(payload))
+        if body.get("format") != cls.FORMAT:
+            raise ValueError(f"Unsupported change set format: {body.get('format')!r}")
+        site, after, seq = body["site"], body["after"], body["seq"]
+
+        # Columns this database does not have (yet) are dropped
+        available = set(cls._columns(conn))
+        keep = [i for i, column in enumerate(body["columns"]) if column in available]
+        columns = [body["columns"][i] for i in keep]
+        if "uuid" not in columns or "updated_at" not in columns:
+            raise ValueError("Change set rows lack uuid or updated_at")
+        uuid_at, updated_at = columns.index("uuid"), columns.index("updated_at")
+        column_list = ", ".join(columns)
+        insert = f"INSERT INTO visitors ({column_list}) VALUES ({', '.join('?' * len(columns))})"
+        update = f"UPDATE visitors SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?"
+        current = f"SELECT {column_list} FROM visitors WHERE id = ?"
+
+        stats = dict.fromkeys(("inserted", "updated", "deleted", "skipped"), 0)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(cls.SQL_APPLIED, (site,)).fetchone()
+            applied = row[0] if row else 0
+            if seq is not None and seq <= applied:
+                conn.execute("ROLLBACK")
+                stats["skipped"] = len(body["upserts"]) + len(body["deletes"])
+                return stats
+            if after > applied:
+                raise ValueError(f"Change set from {site} starts after {after}, only {applied} applied")
+
+            conn.execute("INSERT INTO replication_applying (active) VALUES (1)")
+            for values in body["upserts"]:
+                values = [values[i] for i in keep]
+                tombstone = conn.execute(cls.SQL_TOMBSTONED, (values[uuid_at],)).fetchone()
+                if tombstone and tombstone[0] >= (values[updated_at] or ""):
+                    stats["skipped"] += 1
+                    continue
+                existing = conn.execute(cls.SQL_FIND, (values[uuid_at],)).fetchone()
+                if existing is None:
+                    conn.execute(insert, values)
+                    stats["inserted"] += 1
+                    continue
+                mine = list(conn.execute(current, (existing[0],)).fetchone())
+                if cls._version_key(values, updated_at) <= cls._version_key(mine, updated_at):
+                    stats["skipped"] += 1
+                    continue
+                conn.execute(update, values + [existing[0]])
+                stats["updated"] += 1
+
+            for uuid, deleted_at in body["deletes"]:
+                conn.execute(cls.SQL_TOMBSTONE, (uuid, deleted_at))
+                existing = conn.execute(cls.SQL_FIND, (uuid,)).fetchone()
+                if existing is None or (existing[1] or "") > deleted_at:
+                    stats["skipped"] += 1
+                    continue
+                conn.execute("DELETE FROM visitors WHERE id = ?", (existing[0],))
+                stats["deleted"] += 1
+
+            conn.execute("DELETE FROM replication_applying")
+            if seq is not None:
+                conn.execute(cls.SQL_RECORD_APPLIED, (site, seq))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return stats
+
+    @classmethod
+    def sync(cls, source_db, target_db, batch_size=None, progress=None):
+        """Push every unacknowledged change in source_db to target_db.
+
+        Both are plain database files; the target is created or migrated
+        as needed. Returns the summed apply() counts plus the number of
+        change sets, their compressed size and the acknowledged sequence.
+        progress(totals) is called after each change set.
+        """
+        source = ConnectionPool.open(source_db)
+        target = ConnectionPool.open(target_db)
+        source.isolation_level = target.isolation_level = None
+        totals = dict.fromkeys(("inserted", "updated", "deleted", "skipped", "batches", "bytes"), 0)
+        try:
+            DatabaseManager.migrate(target)
+            site, peer = cls.site_id(source), cls.site_id(target)
+            if site == peer:
+                raise ValueError("Source and target databases belong to the same site")
+            row = target.execute(cls.SQL_APPLIED, (site,)).fetchone()
+            acked = row[0] if row else 0
+
+            for seq, payload in cls.change_sets(source, acked, batch_size):
+                for key, count in cls.apply(target, payload).items():
+                    totals[key] += count
+                totals["batches"] += 1
+                totals["bytes"] += len(payload)
+                if seq is not None:
+                    acked = seq
+                    source.execute(cls.SQL_RECORD_ACK, (peer, acked))
+                if progress:
+                    progress(totals)
+        finally:
+            source.close()
+            target.close()
+        totals["seq"] = acked
+        return totals
+
+# ==========================================
+# BULK IMPORT
+# ==========================================
+VISITOR_FIELDS = ('fullname', 'email', 'phone', 'address', 'meeting_with', 'department', 'purpose')
+
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+
+def parse_timestamp(value):
+    """Normalise an imported UTC timestamp to the stored format, None if blank"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    raise ValueError(f"Unrecognised created_at: {value!r}")
+
+
+def read_visitor_records(path):
+    """Yield (line_no, record) from a .csv or .jsonl file, one row at a time"""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    record = {'_raw': line.rstrip("\n"), '_error': f"Invalid JSON: {e}"}
+                yield line_no, record
+
+
+def import_visitors_file(path, rejects_path=None, chunk_size=5000, progress=None, defer_indexes=True):
+    """Stream a CSV/JSONL file into the database, writing rejects as JSONL"""
+    rejects = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+    unparsable = 0
+
+    def on_reject(line_no, record, error):
+        if rejects:
+            rejects.write(json.dumps({'line': line_no, 'error': error, 'record': record}) + "\n")
+
+    def records():
+        nonlocal unparsable
+        for line_no, record in read_visitor_records(path):
+            if '_error' in record:
+                unparsable += 1
+                on_reject(line_no, record.get('_raw'), record['_error'])
+                continue
+            yield line_no, record
+
+    try:
+        result = DatabaseManager.bulk_import(records(), chunk_size=chunk_size, progress=progress,
+                                             on_reject=on_reject, defer_indexes=defer_indexes)
+        result['rejected'] += unparsable
+        return result
+    finally:
+        if rejects:
+            rejects.close()
+
+# ==========================================
+# EXPORT
+# ==========================================
+EXPORT_COLUMNS = ('id', 'fullname', 'email', 'phone', 'address', 'meeting_with', 'department', 'purpose',
+                  'created_at', 'checked_out_at')
+
+# Characters XML 1.0 does not allow, even escaped
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        writer.writerows(rows)
+
+
+def _write_jsonl(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n")
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = html.escape(_XML_ILLEGAL.sub("", "" if value is None else str(value)), quote=False)
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _write_xlsx(path, rows):
+    """Minimal single-sheet workbook using inline strings.
+
+    The sheet XML is streamed straight into the zip entry, so no shared
+    string table or in-memory sheet is needed.
+    """
+    parts = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/>'
+            '</Relationships>'),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Visitors" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            'Target="worksheets/sheet1.xml"/>'
+            '</Relationships>'),
+    }
+    import zipfile  # only XLSX needs it, and it is slow to import for every command
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in parts.items():
+            zf.writestr(name, xml)
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as raw:
+            sheet = io.TextIOWrapper(raw, encoding="utf-8")
+            sheet.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        '<sheetData>')
+            for row in itertools.chain([EXPORT_COLUMNS], rows):
+                sheet.write("<row>" + "".join(_xlsx_cell(v) for v in row) + "</row>")
+            sheet.write("</sheetData></worksheet>")
+            sheet.flush()
+            sheet.detach()
+
+
+EXPORT_WRITERS = {'csv': _write_csv, 'jsonl': _write_jsonl, 'xlsx': _write_xlsx}
+
+
+def export_visitors(path, filters=None, fmt=None, progress=None, cancel_event=None, batch_size=1000,
+                    source=None):
+    """Stream visitors matching `filters` to `path`; returns the row count.
+
+    The format defaults to the file extension. progress(rows_written) is
+    called after every batch; setting `cancel_event` stops the export,
+    removes the partial file and raises ExportCancelled. Rows come from
+    `source`.iter_visitors(), DatabaseManager unless given.
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in EXPORT_WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt!r} (use csv, jsonl or xlsx)")
+
+    written = 0
+
+    def rows():
+        nonlocal written
+        batches = (source or DatabaseManager).iter_visitors(filters, batch_size=batch_size)
+        try:
+            for batch in batches:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                yield from batch
+                written += len(batch)
+                if progress:
+                    progress(written)
+        finally:
+            batches.close()
+
+    try:
+        EXPORT_WRITERS[fmt](path, rows())
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return written
+
+# ==========================================
+# REPORTING
+# ==========================================
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+class VisitorReports:
+    """Traffic reports summed from the visitor_rollups table.
+
+    The rollups hold one counter per check-in hour, department and host,
+    kept current by triggers on every write (and topped up in one pass
+    after a bulk import), so a report reads a few rows per hour of the range
+    instead of every visit in it.
+    """
+    TOP_HOSTS = 10
+
+    SQL_REBUILD = (
+        "DELETE FROM visitor_rollups",
+        "DELETE FROM visitor_rollups_hourly",
+        "DELETE FROM visitor_rollups_monthly",
+        """
+        INSERT INTO visitor_rollups (hour, department, host, total)
+        SELECT strftime('%Y-%m-%d %H:00:00', created_at), COALESCE(department, ''),
+               COALESCE(meeting_with, ''), COUNT(*)
+        FROM visitors WHERE created_at IS NOT NULL
+        GROUP BY 1, 2, 3
+        """,
+        """
+        INSERT INTO visitor_rollups_hourly (hour, total)
+        SELECT hour, SUM(total) FROM visitor_rollups GROUP BY hour
+        """,
+        """
+        INSERT INTO visitor_rollups_monthly (month, department, host, total)
+        SELECT substr(hour, 1, 7), department, host, SUM(total) FROM visitor_rollups GROUP BY 1, 2, 3
+        """,
+    )
+    # Add visitors with id > ? on top of the existing counters
+    SQL_ACCUMULATE = (
+        """
+        INSERT INTO visitor_rollups (hour, department, host, total)
+        SELECT strftime('%Y-%m-%d %H:00:00', created_at), COALESCE(department, ''),
+               COALESCE(meeting_with, ''), COUNT(*)
+        FROM visitors WHERE id > ? AND created_at IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON CONFLICT(hour, department, host) DO UPDATE SET total = total + excluded.total
+        """,
+        """
+        INSERT INTO visitor_rollups_hourly (hour, total)
+        SELECT strftime('%Y-%m-%d %H:00:00', created_at), COUNT(*)
+        FROM visitors WHERE id > ? AND created_at IS NOT NULL
+        GROUP BY 1
+        ON CONFLICT(hour) DO UPDATE SET total = total + excluded.total
+        """,
+        """
+        INSERT INTO visitor_rollups_monthly (month, department, host, total)
+        SELECT strftime('%Y-%m', created_at), COALESCE(department, ''), COALESCE(meeting_with, ''), COUNT(*)
+        FROM visitors WHERE id > ? AND created_at IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON CONFLICT(month, department, host) DO UPDATE SET total = total + excluded.total
+        """,
+    )
+    SQL_BY_HOUR = "SELECT hour, total FROM visitor_rollups_hourly WHERE hour >= ? AND hour < ?"
+    # Whole months come from the monthly grain, the partial months at
+    # either end of the range from the hourly one.
+    SQL_RANGE_ROWS = """
+        SELECT department, host, total FROM visitor_rollups_monthly WHERE month BETWEEN ? AND ?
+        UNION ALL
+        SELECT department, host, total FROM visitor_rollups WHERE hour >= ? AND hour < ?
+        UNION ALL
+        SELECT department, host, total FROM visitor_rollups WHERE hour >= ? AND hour < ?
+    """
+    SQL_BY_DEPARTMENT = ("SELECT department, SUM(total) AS n FROM (" + SQL_RANGE_ROWS + ")"
+                         " GROUP BY department HAVING n > 0 ORDER BY n DESC")
+    SQL_BY_HOST = ("SELECT host, SUM(total) AS n FROM (" + SQL_RANGE_ROWS + ")"
+                   " GROUP BY host HAVING n > 0 ORDER BY n DESC LIMIT ?")
+
+    @classmethod
+    def rebuild_rollups(cls, conn):
+        """Recompute every rollup from visitors (inside the caller's transaction)"""
+        for sql in cls.SQL_REBUILD:
+            conn.execute(sql)
+
+    @classmethod
+    def accumulate_rollups(cls, conn, after_id):
+        """Count visitors inserted after `after_id` into the rollups in one pass.
+
+        Used after a bulk import that ran without the rollup triggers; rows
+        already archived stay counted, unlike with a full rebuild.
+        """
+        for sql in cls.SQL_ACCUMULATE:
+            conn.execute(sql, (after_id,))
+
+    @staticmethod
+    def _range_params(first, after):
+        """SQL_RANGE_ROWS parameters covering the UTC hours first..after (exclusive)"""
+        month = first.replace(day=1, hour=0)
+        start = month if month == first else (month + timedelta(days=32)).replace(day=1)
+        end = after.replace(day=1, hour=0)
+        hour = lambda moment: moment.strftime("%Y-%m-%d %H:00:00")
+        if start >= end:
+            # No whole month inside the range: read it all at hourly grain
+            return ("", "", hour(first), hour(after), "", "")
+        last_month = (end - timedelta(days=1)).strftime("%Y-%m")
+        return (start.strftime("%Y-%m"), last_month,
+                hour(first), hour(start),
+                hour(end), hour(after))
+
+    @classmethod
+    def traffic(cls, date_from, date_to, top_hosts=None):
+        """Aggregate check-ins between two YYYY-MM-DD site days, inclusive.
+
+        Returns a dict with the range total and the breakdowns the
+        dashboard charts: by_hour (24 counts), by_weekday (7 counts,
+        Monday first), by_day ([(day, count)] with empty days as 0),
+        by_department and by_host ([(name, count)], busiest first).
+
+        Rollups are kept per UTC hour and placed on the site's clock by
+        the hour they start, so in zones with a half-hour offset the day
+        boundaries are approximate to that half hour.
+        """
+        first = datetime.strptime(date_from, "%Y-%m-%d").date()
+        last = datetime.strptime(date_to, "%Y-%m-%d").date()
+        start, end = SiteTime.day_range(date_from, date_to)
+        start, end = start - start % 3600, end - end % 3600  # whole UTC hours, like the rollups
+        ranges = cls._range_params(_EPOCH + start * _SECOND, _EPOCH + end * _SECOND)
+        with DatabaseManager.connection() as conn:
+            hours = conn.execute(cls.SQL_BY_HOUR, (utc_text(start), utc_text(end))).fetchall()
+            departments = conn.execute(cls.SQL_BY_DEPARTMENT, ranges).fetchall()
+            hosts = conn.execute(cls.SQL_BY_HOST, ranges + (top_hosts or cls.TOP_HOSTS,)).fetchall()
+
+        by_hour, by_weekday, per_day = [0] * 24, [0] * 7, {}
+        for hour, count in hours:
+            local = SiteTime.local(utc_seconds(hour))
+            by_hour[local.hour] += count
+            day = local.strftime("%Y-%m-%d")
+            per_day[day] = per_day.get(day, 0) + count
+
+        by_day, day = [], first
+        while day <= last:
+            count = per_day.get(day.isoformat(), 0)
+            by_weekday[day.weekday()] += count
+            by_day.append((day.isoformat(), count))
+            day += timedelta(days=1)
+
+        return {
+            "total": sum(by_hour),
+            "by_hour": by_hour,
+            "by_weekday": by_weekday,
+            "by_day": by_day,
+            "by_department": [(name or "(none)", count) for name, count in departments],
+            "by_host": [(name or "(none)", count) for name, count in hosts],
+        }
+
+# ==========================================
+# RESULT SET
+# ==========================================
+def _epoch(value):
+    """Epoch seconds for a list or export row time, 0 for NULL"""
+    return utc_seconds(value) or 0
+
+
+class _TextColumn:
+    """Dictionary-encoded strings: each distinct value is kept once,
+    interned, and rows hold its index in an unsigned int array"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = array('I')
+        self._index = {}
+        self._ranks = None  # code -> position in sorted order; reset when values grow
+
+    def encode(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(sys.intern(value) if isinstance(value, str) else value)
+            self._ranks = None
+        return code
+
+    def ranks(self):
+        """code -> sort rank, ignoring case: values equal under casefold() share a rank"""
+        if self._ranks is None:
+            folded = [(value or "").casefold() for value in self.values]
+            ranks = array('I', [0]) * len(folded)
+            rank, previous = -1, None
+            for code in sorted(range(len(folded)), key=folded.__getitem__):
+                if folded[code] != previous:
+                    rank, previous = rank + 1, folded[code]
+                ranks[code] = rank
+            self._ranks = ranks
+        return self._ranks
+
+    def matching(self, needle):
+        """Codes whose value contains `needle`, ignoring case"""
+        return {code for code, value in enumerate(self.values) if value and needle in value.casefold()}
+
+
+class ColumnarResultSet:
+    """The rows of a visitor list held column by column for sorting and
+    filtering in memory.
+
+    Only what the table shows is kept: the id, the text columns it sorts
+    and filters on, and both times. Ids and timestamps live in typed
+    arrays (epoch seconds, 0 for NULL) and text columns are
+    dictionary-encoded, so repeated departments are stored once and 100k
+    rows take a fraction of the memory of the equivalent tuples.
+
+    arrange() picks the sort column and quick filters and returns the row
+    indexes to display. Per-column orders are built once; update(),
+    remove() and set_value() then keep them and the arranged view in order
+    by binary search and report the view positions they touched, instead
+    of sorting again. All four return a new version and view and are
+    meant for a worker thread: they hold `lock`, while the UI thread only
+    calls row() and reads views it was handed, which are never changed in
+    place.
+    """
+    # get_visitors_page() layout, which rows come in and go out as
+    PAGE_COLUMNS = ("id", "fullname", "email", "phone", "created_at", "meeting_with", "department",
+                    "checked_out_at")
+    COLUMNS = ("id", "fullname", "email", "phone", "created_at", "department", "checked_out_at")
+    TEXT_COLUMNS = ("fullname", "email", "phone", "department")
+    TIME_COLUMNS = ("created_at", "checked_out_at")
+    # Newest check-in first, as the list pages; every order breaks ties this way
+    DEFAULT_ORDER = ("created_at", True)
+    # Bigger changes rebuild the view instead of reporting edits
+    INCREMENTAL_LIMIT = 1000
+
+    def __init__(self):
+        self.ids = array('q')
+        self.times = {name: array('q') for name in self.TIME_COLUMNS}
+        self.text = {name: _TextColumn() for name in self.TEXT_COLUMNS}
+        self.alive = bytearray()
+        self.size = 0
+        self.lock = threading.Lock()
+        # What arrange() last asked for, the view it gives and its version
+        self.column, self.descending = self.DEFAULT_ORDER
+        self.filters = {}
+        self.current = array('I')
+        self.version = 0
+        self._keys = {}    # column -> sort key per row, for building orders
+        self._orders = {}  # (column, descending) -> live row indexes in that order
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, rows, columns=PAGE_COLUMNS):
+        """Append rows whose fields are laid out as `columns`, while loading"""
+        at = {name: columns.index(name) for name in self.COLUMNS}
+        ids, id_at = self.ids, at["id"]
+        times = [(self.times[name], at[name]) for name in self.TIME_COLUMNS]
+        text = [(self.text[name], self.text[name].codes, at[name]) for name in self.TEXT_COLUMNS]
+        added = len(ids)
+        for row in rows:
+            ids.append(row[id_at])
+            for values, i in times:
+                values.append(_epoch(row[i]))
+            for column, codes, i in text:
+                codes.append(column.encode(row[i]))
+        added = len(ids) - added
+        self.alive.extend(b"\x01" * added)
+        self.size += added
+        self._keys.clear()
+        self._orders.clear()
+
+    def row(self, index):
+        """Row `index` in get_visitors_page() layout; meeting_with is not kept"""
+        text = {name: column.values[column.codes[index]] for name, column in self.text.items()}
+        return (self.ids[index], text["fullname"], text["email"], text["phone"],
+                self.times["created_at"][index] or None, None, text["department"],
+                self.times["checked_out_at"][index] or None)
+
+    def _store(self, index, row):
+        """Write page-layout `row` over row `index` (None: append it), or
+        drop the row if `row` is None; returns its index while it lives"""
+        if row is None:
+            if index is not None:
+                self.alive[index] = 0
+                self.size -= 1
+            return None
+        at = self.PAGE_COLUMNS.index
+        if index is None:
+            index = len(self.ids)
+            self.ids.append(row[0])
+            for name in self.TIME_COLUMNS:
+                self.times[name].append(_epoch(row[at(name)]))
+            for name, column in self.text.items():
+                column.codes.append(column.encode(row[at(name)]))
+            self.alive.append(1)
+            self.size += 1
+            return index
+        for name in self.TIME_COLUMNS:
+            self.times[name][index] = _epoch(row[at(name)])
+        for name, column in self.text.items():
+            column.codes[index] = column.encode(row[at(name)])
+        return index
+
+    def sort_keys(self, column):
+        keys = self._keys.get(column)
+        if keys is None:
+            if column == "id":
+                keys = self.ids
+            elif column in self.TIME_COLUMNS:
+                keys = self.times[column]
+            else:
+                text = self.text[column]
+                keys = array('I', map(text.ranks().__getitem__, text.codes))
+            self._keys[column] = keys
+        return keys
+
+    def order(self, column=None, descending=False):
+        """Live row indexes sorted by `column`; None is newest check-in first.
+
+        Column sorts are stable on top of the default order, so ties stay
+        newest first.
+        """
+        key = self.DEFAULT_ORDER if column is None else (column, descending)
+        order = self._orders.get(key)
+        if order is None:
+            if key == self.DEFAULT_ORDER:
+                alive = self.alive
+                order = sorted((index for index in range(len(self.ids)) if alive[index]),
+                               key=self.ids.__getitem__, reverse=True)
+                order.sort(key=self.times["created_at"].__getitem__, reverse=True)
+            else:
+                order = sorted(self.order(), key=self.sort_keys(column).__getitem__, reverse=descending)
+            order = self._orders[key] = array('I', order)
+        return order
+
+    def _sort_value(self, column):
+        """Row index -> the value order(column) compares, as sort_keys() ranks it"""
+        if column == "id":
+            return self.ids.__getitem__
+        if column in self.TIME_COLUMNS:
+            return self.times[column].__getitem__
+        text = self.text[column]
+        values, codes = text.values, text.codes
+        return lambda index: (values[codes[index]] or "").casefold()
+
+    def _position(self, rows, index, column, descending):
+        """Where row `index` goes in `rows`, a list in order(column, descending)"""
+        value = self._sort_value(column)
+        created, ids = self.times["created_at"], self.ids
+        key, tie = value(index), (-created[index], -ids[index])
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            other = rows[middle]
+            other_key = value(other)
+            if other_key == key:
+                before = (-created[other], -ids[other]) < tie
+            else:
+                before = other_key > key if descending else other_key < key
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _locate(self, ids):
+        """{visitor_id: row index} for the live rows among `ids`"""
+        by_id, values, found = self.order("id"), self.ids, {}
+        for visitor_id in ids:
+            low, high = 0, len(by_id)
+            while low < high:
+                middle = (low + high) // 2
+                if values[by_id[middle]] < visitor_id:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low < len(by_id) and values[by_id[low]] == visitor_id:
+                found[visitor_id] = by_id[low]
+        return found
+
+    def _filter(self, column, needle):
+        """(per-row values, accepted values) for a substring filter on `column`.
+
+        Text is matched against each distinct value once. Dates match on
+        the site's day (YYYY-MM-DD), worked out once per distinct quarter
+        hour (every zone offset is a whole number of those); ids match on
+        their digits.
+        """
+        needle = needle.strip().casefold()
+        if column == "id":
+            return self.ids, {visitor_id for visitor_id in self.ids if needle in str(visitor_id)}
+        if column in self.TIME_COLUMNS:
+            quarters = self._keys.get(column + ":day")
+            if quarters is None:
+                quarters = array('q', (seconds // 900 for seconds in self.times[column]))
+                self._keys[column + ":day"] = quarters
+            return quarters, {quarter for quarter in set(quarters)
+                              if quarter and needle in SiteTime.format(quarter * 900, "%Y-%m-%d")}
+        text = self.text[column]
+        return text.codes, text.matching(needle)
+
+    def _accepts(self, index):
+        """Whether row `index` passes the arranged quick filters; _filter() for one row"""
+        for column, needle in self.filters.items():
+            if column == "id":
+                value = str(self.ids[index])
+            elif column in self.TIME_COLUMNS:
+                seconds = self.times[column][index]
+                value = SiteTime.format(seconds, "%Y-%m-%d") if seconds else ""
+            else:
+                text = self.text[column]
+                value = (text.values[text.codes[index]] or "").casefold()
+            if needle not in value:
+                return False
+        return True
+
+    def view(self, column=None, descending=False, filters=None):
+        """Live row indexes sorted by `column`, narrowed by {column: text} filters"""
+        rows = self.order(column, descending)
+        for name, needle in (filters or {}).items():
+            if needle and needle.strip():
+                values, accepted = self._filter(name, needle)
+                rows = [index for index in rows if values[index] in accepted]
+        return array('I', rows)
+
+    def arrange(self, column=None, descending=False, filters=None):
+        """Sort by `column` and apply quick `filters`; returns (version, view)"""
+        with self.lock:
+            self.column, self.descending = self.DEFAULT_ORDER if column is None else (column, descending)
+            self.filters = {name: needle.strip().casefold() for name, needle in (filters or {}).items()
+                            if needle and needle.strip()}
+            self.current = self.view(self.column, self.descending, self.filters)
+            self.version += 1
+            return self.version, self.current
+
+    def _apply(self, changes):
+        """Apply [(visitor_id, page-layout row, or None to drop it)].
+
+        Returns (version, view, edits): edits are ("delete" | "insert" |
+        "update", position, row index) that turn the previous view into
+        this one, in order, or None if the view was rebuilt.
+        """
+        found = self._locate(visitor_id for visitor_id, _ in changes)
+        if len(changes) > self.INCREMENTAL_LIMIT:
+            for visitor_id, row in changes:
+                self._store(found.get(visitor_id), row)
+            self._keys.clear()
+            self._orders.clear()
+            self.current = self.view(self.column, self.descending, self.filters)
+            self.version += 1
+            return self.version, self.current, None
+
+        view, edits = array('I', self.current), []
+        arranged = (self.column, self.descending)
+        for visitor_id, row in changes:
+            index = found.pop(visitor_id, None)
+            if index is not None:
+                for key, order in self._orders.items():
+                    del order[self._position(order, index, *key)]
+                if self._accepts(index):
+                    position = self._position(view, index, *arranged)
+                    del view[position]
+                    edits.append(("delete", position, index))
+            index = self._store(index, row)
+            if index is None:
+                continue
+            found[visitor_id] = index
+            for key, order in self._orders.items():
+                order.insert(self._position(order, index, *key), index)
+            if self._accepts(index):
+                position = self._position(view, index, *arranged)
+                view.insert(position, index)
+                if edits and edits[-1] == ("delete", position, index):
+                    edits[-1] = ("update", position, index)
+                else:
+                    edits.append(("insert", position, index))
+        # Ranks and day keys are only for building new orders; they are redone then
+        self._keys.clear()
+        self.current = view
+        self.version += 1
+        return self.version, view, edits
+
+    def update(self, rows, removed=()):
+        """Apply a change-feed tick: drop `removed` ids, then replace or add
+        `rows` (get_visitors_page() layout)"""
+        with self.lock:
+            return self._apply([(visitor_id, None) for visitor_id in removed]
+                               + [(row[0], row) for row in rows])
+
+    def remove(self, ids):
+        """Drop the rows for `ids`"""
+        with self.lock:
+            return self._apply([(visitor_id, None) for visitor_id in ids])
+
+    def set_value(self, ids, column, value):
+        """Set one column on the rows for `ids`, as a bulk edit does.
+
+        Columns the set does not keep (meeting_with) change nothing.
+        """
+        with self.lock:
+            if column not in self.COLUMNS:
+                return self.version, self.current, []
+            at = self.PAGE_COLUMNS.index(column)
+            changes = []
+            for visitor_id, index in self._locate(ids).items():
+                row = list(self.row(index))
+                row[at] = value
+                changes.append((visitor_id, row))
+            return self._apply(changes)
+
+    def visitor_ids(self, indexes):
+        return [self.ids[index] for index in indexes]